@@ -1,4 +1,5 @@
 import os
+import re
 import time
 import uuid
 from flask import Flask, render_template, request, jsonify, send_from_directory, session, redirect, send_file
@@ -13,6 +14,14 @@ import io
 from modules.payment import payment_processor
 from modules.database import db
 from modules.whatsapp import whatsapp_processor
+from modules.cost_model import cost_model
+from modules.jobs import job_queue
+from modules.animation import ANIMATION_FORMATS
+from modules.style_dna import validate_dna
+from modules.quality import QUALITY_TIERS, resolve_quality
+from modules.quota import quota
+from modules.admin_analytics import admin_analytics
+from modules.activity_log import activity_log
 from utils.helpers import create_directories, get_temp_filepath
 from utils.validators import sanitize_filename
 import config.settings as settings
@@ -45,6 +54,39 @@ def is_premium_user(user: dict) -> bool:
     return user.get('role') == 'admin' or user.get('plan') in ['pro', 'elite', 'pro_member']
 
 
+def reserve_quota(user: dict, amount: int):
+    """
+    Reserve Starter-plan quota for amount units (admins and paid plans are not limited).
+    Returns: units reserved (0 when unlimited), or None if the daily limit would be exceeded
+    """
+    user_id = user.get('id', 0)
+    if not user_id or user.get('role', 'user') == 'admin' or user.get('plan', 'starter') != 'starter':
+        return 0
+    limit = int(getattr(settings, 'STARTER_DAILY_LIMIT', 5))
+    return amount if quota.try_reserve(user_id, amount, limit) else None
+
+
+def quota_exceeded_response(user_id, unit: str = "images", done: str = "images"):
+    limit = int(getattr(settings, 'STARTER_DAILY_LIMIT', 5))
+    usage_today = quota.usage(user_id)
+    return jsonify({
+        "success": False,
+        "message": f"Daily limit reached ({limit} {unit}/day for Starter). You have processed {usage_today} {done} today. Upgrade to Pro for unlimited access!",
+        "limit_reached": True
+    }), 402
+
+
+def request_quality(user: dict):
+    """
+    Quality tier for this request: the 'quality' form field (plan default when absent),
+    capped at the highest tier the user's plan allows. None if the field is not a tier.
+    """
+    try:
+        return resolve_quality(request.form.get('quality'), is_premium_user(user))
+    except ValueError:
+        return None
+
+
 def get_valid_session_user_id():
     """Return a DB-safe user_id from session, repairing legacy session payloads when possible."""
     user = session.get('user')
@@ -82,6 +124,17 @@ def get_valid_session_user_id():
     }
     return db_user['id']
 
+def peek_image_size(file) -> tuple:
+    """Read (width, height) from an uploaded image header without decoding pixels."""
+    try:
+        with Image.open(file.stream) as probe:
+            size = probe.size
+        return size
+    except Exception:
+        return 0, 0
+    finally:
+        file.stream.seek(0)
+
 # --- LIVE HEARTBEAT ---
 @app.before_request
 def update_user_heartbeat():
@@ -89,8 +142,9 @@ def update_user_heartbeat():
     if user_id:
         try:
             db.update_last_active(user_id)
-        except:
-            pass # Fail silently if DB is locked or busy during heartbeat
+        except Exception as e:
+            # Never fail the request over a heartbeat, but don't hide a struggling database either
+            print(f"HEARTBEAT ERROR: {str(e)}")
 
 # Ensure directories exist
 create_directories()
@@ -218,7 +272,7 @@ def get_user_performance():
         
         # Recalculate 24h usage precisely
         try:
-            full_stats['usage_24h'] = db.get_user_usage_24h(user_id)
+            full_stats['usage_24h'] = quota.usage(user_id)
         except:
             full_stats['usage_24h'] = 0
             
@@ -366,6 +420,37 @@ def get_advanced_history():
         
     return jsonify({"success": True, "data": history_data})
 
+@app.route('/api/user/gallery')
+def get_gallery():
+    """
+    Cursor-paginated gallery, newest first. Pass the previous response's next_cursor
+    as 'cursor' for the following page; 'total=1' adds a cached approximate count.
+    """
+    if 'user' not in session:
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+
+    user_id = session['user']['id']
+    try:
+        page = db.get_gallery_page(
+            user_id,
+            limit=request.args.get('limit', 24, type=int),
+            cursor_token=request.args.get('cursor') or None,
+            style=request.args.get('style'),
+            include_total=request.args.get('total', '').lower() in ('1', 'true')
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    for item in page['items']:
+        created_at = item.get('created_at')
+        if hasattr(created_at, 'isoformat'):
+            item['created_at'] = created_at.isoformat()
+        item['processing_time'] = float(item.get('processing_time') or 0)
+        item['is_paid'] = bool(item.get('is_paid'))
+        item['processed_url'] = f"/data/processed/{item['processed_filename']}"
+
+    return jsonify({"success": True, "data": page})
+
 @app.route('/api/user/history/delete', methods=['POST'])
 def delete_history():
     if 'user' not in session:
@@ -578,6 +663,11 @@ def process():
     user = session.get('user', {})
     file = request.files['image']
     style = request.form.get('style', 'cartoon')
+    progressive = request.form.get('progressive', '').lower()
+    vignette = min(max(request.form.get('vignette', 0.0, type=float), 0.0), 1.0)
+    quality = request_quality(user)
+    if quality is None:
+        return jsonify({"success": False, "message": f"Unknown quality. Use one of: {', '.join(QUALITY_TIERS)}"}), 400
     user_id = user.get('id', 0)
     
     # Load image
@@ -587,9 +677,18 @@ def process():
     if img is None:
         return jsonify({"success": False, "message": "Invalid image"}), 400
     
-    # Process
     is_premium = is_premium_user(user)
-    processed_img, proc_time = image_processor.process_image(img, style, is_premium=is_premium)
+
+    # Two-phase delivery: 'progressive=1' always, 'progressive=auto' when the cost
+    # model would route the full render to the background queue.
+    if progressive in ('1', 'true', 'auto'):
+        eta = cost_model.estimate_seconds(style, img.shape[1], img.shape[0], is_premium, quality)
+        if progressive != 'auto' or cost_model.route(eta) == 'background':
+            return process_progressive(img, file.filename, style, user_id, is_premium, eta, vignette, quality)
+
+    # Process
+    processed_img, proc_time = image_processor.process_image(img, style, is_premium=is_premium,
+                                                             vignette=vignette, quality=quality)
     
     # Save processed image
     filename = f"processed_{uuid.uuid4().hex}.jpg"
@@ -598,8 +697,10 @@ def process():
     
     # Log activity for admin
     if user_id:
-        db.add_processing_history(user_id, file.filename, filename, style, proc_time)
-        db.log_user_activity(user_id, "stylize", f"Created {style} art in {proc_time:.2f}s")
+        db.add_processing_history(user_id, file.filename, filename, style, proc_time,
+                                  pixels=processed_img.shape[0] * processed_img.shape[1], quality=quality)
+        activity_log.log(user_id, "stylize", f"Created {style} art in {proc_time:.2f}s")
+        quota.record(user_id)
     
     # Calculate Statistics (Task 13)
     original_stats = image_processor.get_image_statistics(img)
@@ -611,12 +712,148 @@ def process():
         "image_filename": filename,
         "proc_time": proc_time,
         "style": style,
+        "quality": quality,
         "stats": {
             "original": original_stats,
             "processed": processed_stats
         }
     })
 
+def discard_preview(job_id):
+    """Delete a progressive job's draft preview once the full render is done or the job is pruned"""
+    (settings.TEMP_FOLDER / f"preview_{job_id}.jpg").unlink(missing_ok=True)
+
+job_queue.on_discard = discard_preview
+
+def process_progressive(img, original_filename, style, user_id, is_premium, eta, vignette=0.0, quality=None):
+    """
+    Phase 1 of progressive delivery: render and return a small preview now, and queue
+    the full-resolution render under the final filename. Clients poll
+    /api/process/status/<job_id> and swap the preview for processed_url when done.
+    """
+    preview_img, preview_time = image_processor.render_preview(img, style)
+    if vignette > 0:
+        preview_img = image_processor.apply_vignette(preview_img, vignette)
+    token = uuid.uuid4().hex
+    preview_name = f"preview_{token}.jpg"
+    filename = f"processed_{token}.jpg"
+    cv2.imwrite(str(settings.TEMP_FOLDER / preview_name), preview_img, [cv2.IMWRITE_JPEG_QUALITY, 80])
+
+    def render_full():
+        processed_img, proc_time = image_processor.process_image(img, style, is_premium=is_premium,
+                                                                 vignette=vignette, quality=quality)
+        # Write under a temporary name and swap in, so readers never see a partial file
+        partial_path = settings.TEMP_FOLDER / f"partial_{filename}"
+        cv2.imwrite(str(partial_path), processed_img)
+        os.replace(partial_path, settings.TEMP_FOLDER / filename)
+
+        if user_id:
+            db.add_processing_history(user_id, original_filename, filename, style, proc_time,
+                                      pixels=processed_img.shape[0] * processed_img.shape[1], quality=quality)
+            activity_log.log(user_id, "stylize", f"Created {style} art in {proc_time:.2f}s")
+            quota.record(user_id)
+
+        return {
+            "processed_url": f"/data/processed/{filename}",
+            "image_filename": filename,
+            "proc_time": proc_time,
+            "stats": {
+                "original": image_processor.get_image_statistics(img),
+                "processed": image_processor.get_image_statistics(processed_img)
+            }
+        }
+
+    # The job id is the file token, so a poll can still find the output if the job record is gone
+    job_id = job_queue.submit(render_full, owner_id=user_id, job_id=token)
+
+    return jsonify({
+        "success": True,
+        "progressive": True,
+        "job_id": job_id,
+        "status_url": f"/api/process/status/{job_id}",
+        "preview_url": f"/data/processed/{preview_name}",
+        "preview_time": preview_time,
+        "image_filename": filename,
+        "style": style,
+        "quality": quality,
+        "eta_seconds": round(eta, 3)
+    }), 202
+
+@app.route('/api/process/status/<job_id>')
+def process_status(job_id):
+    """Poll a progressive render; includes the full result once status is 'done'."""
+    if 'user' not in session and not app.debug:
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+
+    if not re.fullmatch(r'[0-9a-f]{32}', job_id):
+        return jsonify({"success": False, "message": "Job not found"}), 404
+    job = job_queue.get(job_id)
+    user_id = session.get('user', {}).get('id', 0)
+    if not job:
+        # Record pruned or lost: the render finished if its output exists
+        filename = f"processed_{job_id}.jpg"
+        if (settings.TEMP_FOLDER / filename).exists():
+            return jsonify({"success": True, "job_id": job_id, "status": "done",
+                            "processed_url": f"/data/processed/{filename}", "image_filename": filename})
+        return jsonify({"success": False, "message": "Job not found"}), 404
+    if job['owner_id'] and job['owner_id'] != user_id:
+        return jsonify({"success": False, "message": "Job not found"}), 404
+
+    response = {"success": True, "job_id": job_id, "status": job['status']}
+    if job['status'] == 'done':
+        response.update(job['result'])
+    elif job['status'] == 'failed':
+        response.update({"success": False, "message": job['error']})
+    return jsonify(response)
+
+@app.route('/api/process/estimate', methods=['POST'])
+def process_estimate():
+    """
+    Pre-flight cost estimate for /api/process and /api/process/batch.
+    Accepts an uploaded 'image' or explicit width/height, plus 'style' or a
+    comma-separated 'styles' list and an optional image 'count'.
+    """
+    if 'user' not in session and not app.debug:
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+
+    data = request.get_json(silent=True) or request.form
+    user = session.get('user', {})
+    is_premium = is_premium_user(user)
+
+    if 'image' in request.files:
+        width, height = peek_image_size(request.files['image'])
+    else:
+        try:
+            width, height = int(data.get('width', 0)), int(data.get('height', 0))
+        except (TypeError, ValueError):
+            width, height = 0, 0
+    if width <= 0 or height <= 0:
+        return jsonify({"success": False, "message": "Image or width/height required"}), 400
+
+    styles = [s.strip() for s in str(data.get('styles') or data.get('style') or 'cartoon').split(',') if s.strip()]
+    try:
+        quality = resolve_quality(data.get('quality'), is_premium)
+    except ValueError:
+        return jsonify({"success": False, "message": f"Unknown quality. Use one of: {', '.join(QUALITY_TIERS)}"}), 400
+    try:
+        count = max(1, int(data.get('count', len(styles))))
+    except (TypeError, ValueError):
+        count = len(styles)
+
+    estimates = [cost_model.estimate(style, width, height, is_premium, quality) for style in styles]
+    costs = [estimates[i if i < len(estimates) else -1]['estimated_seconds'] for i in range(count)]
+    workers = min(max(1, int(getattr(settings, 'BATCH_MAX_WORKERS', 4))), os.cpu_count() or 4, count)
+    _, eta = cost_model.schedule(costs, workers)
+
+    return jsonify({
+        "success": True,
+        "width": width,
+        "height": height,
+        "estimates": estimates,
+        "eta_seconds": round(eta, 3),
+        "route": cost_model.route(eta)
+    })
+
 @app.route('/api/process/video', methods=['POST'])
 def process_video():
     if 'user' not in session and not app.debug:
@@ -629,20 +866,8 @@ def process_video():
     style = request.form.get('style', 'cartoon')
     user = session.get('user', {})
     user_id = user.get('id', 0)
-    user_plan = user.get('plan', 'starter')
-    user_role = user.get('role', 'user')
     is_premium = is_premium_user(user)
 
-    # Starter plan quota check (1 video counts as 1 processing unit)
-    if user_id and user_role != 'admin' and user_plan == 'starter':
-        usage_today = db.get_user_usage_24h(user_id)
-        if (usage_today + 1) > 5:
-            return jsonify({
-                "success": False,
-                "message": f"Daily limit reached (5 edits/day for Starter). You have processed {usage_today} items today. Upgrade to Pro for unlimited access!",
-                "limit_reached": True
-            }), 402
-
     raw_name = sanitize_filename(file.filename or 'uploaded_video.mp4')
     ext = Path(raw_name).suffix.lower()
     allowed_video_ext = {'.mp4', '.mov', '.avi', '.mkv', '.webm'}
@@ -662,6 +887,12 @@ def process_video():
     input_path = settings.TEMP_FOLDER / input_name
     output_path = settings.TEMP_FOLDER / output_name
 
+    # Starter plan quota (1 video counts as 1 processing unit), held until the render settles
+    reserved = reserve_quota(user, 1)
+    if reserved is None:
+        return quota_exceeded_response(user_id, "edits", "items")
+    used = 0
+
     try:
         file.save(str(input_path))
 
@@ -691,7 +922,8 @@ def process_video():
 
         if user_id:
             db.add_processing_history(user_id, raw_name, output_name, f"video_{style}", proc_time)
-            db.log_user_activity(user_id, "stylize_video", f"Created {style} video in {proc_time:.2f}s")
+            activity_log.log(user_id, "stylize_video", f"Created {style} video in {proc_time:.2f}s")
+            used = 1
 
         return jsonify({
             "success": True,
@@ -706,6 +938,7 @@ def process_video():
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
     finally:
+        quota.settle(user_id, reserved, used)
         try:
             if input_path.exists():
                 input_path.unlink()
@@ -726,18 +959,14 @@ def process_batch():
 
     user = session.get('user', {})
     user_id = user.get('id', 0)
-    user_plan = user.get('plan', 'starter')
-    user_role = user.get('role', 'user')
+    quality = request_quality(user)
+    if quality is None:
+        return jsonify({"success": False, "message": f"Unknown quality. Use one of: {', '.join(QUALITY_TIERS)}"}), 400
 
     # Quota check for Starter plan (Admins and Pro members are exempt)
-    if user_id and user_role != 'admin' and user_plan == 'starter':
-        usage_today = db.get_user_usage_24h(user_id)
-        if (usage_today + len(files)) > 5:
-            return jsonify({
-                "success": False, 
-                "message": f"Daily limit reached (5 images/day for Starter). You have processed {usage_today} images today. Upgrade to Pro for unlimited access!",
-                "limit_reached": True
-            }), 402
+    reserved = reserve_quota(user, len(files))
+    if reserved is None:
+        return quota_exceeded_response(user_id)
 
     results = [None] * len(files)
     
@@ -752,10 +981,8 @@ def process_batch():
                 return {"success": False, "original_filename": file.filename, "message": "Invalid image"}
                 
             # Stylize
-            user_plan = user.get('plan', 'starter')
-            user_role = user.get('role', 'user')
-            is_premium = is_premium_user(user)
-            processed_img, proc_time = image_processor.process_image(img, style, is_premium=is_premium)
+            processed_img, proc_time = image_processor.process_image(img, style, is_premium=is_premium,
+                                                                     quality=quality)
             
             # Sub-Task 13: Analysis Stats
             orig_stats = image_processor.get_image_stats(img)
@@ -766,9 +993,11 @@ def process_batch():
             temp_path = settings.TEMP_FOLDER / filename
             cv2.imwrite(str(temp_path), processed_img, [cv2.IMWRITE_JPEG_QUALITY, 90])
             
-            # Database tasks
+            # Database tasks (committed together once the pool finishes)
             if user_id:
-                db.add_processing_history(user_id, file.filename, filename, style, proc_time)
+                work.add_processing_history(user_id, file.filename, filename, style, proc_time,
+                                            pixels=processed_img.shape[0] * processed_img.shape[1],
+                                            quality=quality)
             
             return {
                 "success": True,
@@ -777,6 +1006,7 @@ def process_batch():
                 "image_filename": filename,
                 "proc_time": proc_time,
                 "style": style,
+                "quality": quality,
                 "stats": {
                     "original": orig_stats,
                     "processed": proc_stats
@@ -788,14 +1018,98 @@ def process_batch():
     # Launch parallel neural tasks with a cap to avoid CPU oversubscription.
     configured_workers = max(1, int(getattr(settings, 'BATCH_MAX_WORKERS', 4)))
     max_workers = min(configured_workers, os.cpu_count() or 4, len(files))
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = []
-        for i, file in enumerate(files):
-            style = style_list[i] if i < len(style_list) else style_list[-1]
-            futures.append(executor.submit(process_single_task, i, file, style))
-        
-        for i, future in enumerate(futures):
-            results[i] = future.result()
+    is_premium = is_premium_user(user)
+    task_styles = [style_list[i] if i < len(style_list) else style_list[-1] for i in range(len(files))]
+    costs = []
+    for file, style in zip(files, task_styles):
+        width, height = peek_image_size(file)
+        costs.append(cost_model.estimate_seconds(style, width, height, is_premium, quality) if width else 0.0)
+    # Longest jobs first keeps the pool busy and shortens the batch makespan.
+    order, _ = cost_model.schedule(costs, max_workers)
+    processed = 0
+    try:
+        with db.unit_of_work() as work:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {}
+                for i in order:
+                    futures[i] = executor.submit(process_single_task, i, files[i], task_styles[i])
+
+                for i, future in futures.items():
+                    results[i] = future.result()
+            processed = sum(1 for r in results if r and r.get("success"))
+            if user_id and processed:
+                work.log_user_activity(user_id, "stylize", f"Processed {processed} images in a batch")
+    finally:
+        # Failed images hand their reserved units back
+        quota.settle(user_id, reserved, processed)
+
+    return jsonify({
+        "success": True,
+        "quality": quality,
+        "results": results
+    })
+
+@app.route('/api/process/multi', methods=['POST'])
+def process_multi():
+    """
+    "Try all styles": render one uploaded image in several styles. Decode, resize and
+    the shared intermediates are computed once and fanned out to every style.
+    """
+    if 'user' not in session and not app.debug:
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+
+    if 'image' not in request.files:
+        return jsonify({"success": False, "message": "No image uploaded"}), 400
+
+    file = request.files['image']
+    style_list = [s.strip() for s in request.form.get('styles', 'cartoon').split(',') if s.strip()]
+    if not style_list:
+        return jsonify({"success": False, "message": "No styles requested"}), 400
+
+    user = session.get('user', {})
+    user_id = user.get('id', 0)
+
+    nparr = np.frombuffer(file.read(), np.uint8)
+    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    if img is None:
+        return jsonify({"success": False, "message": "Invalid image"}), 400
+
+    # Each style counts as one processed image for the Starter quota
+    reserved = reserve_quota(user, len(style_list))
+    if reserved is None:
+        return quota_exceeded_response(user_id)
+
+    results = []
+    try:
+        is_premium = is_premium_user(user)
+        quality = resolve_quality(None, is_premium)
+        rendered = image_processor.process_multi_style(img, style_list, is_premium=is_premium, quality=quality)
+        orig_stats = image_processor.get_image_stats(img)
+
+        with db.unit_of_work() as work:
+            for style, processed_img, proc_time in rendered:
+                filename = f"processed_{uuid.uuid4().hex}.jpg"
+                cv2.imwrite(str(settings.TEMP_FOLDER / filename), processed_img, [cv2.IMWRITE_JPEG_QUALITY, 90])
+                if user_id:
+                    work.add_processing_history(user_id, file.filename, filename, style, proc_time,
+                                                pixels=processed_img.shape[0] * processed_img.shape[1],
+                                                quality=quality)
+                results.append({
+                    "success": True,
+                    "original_filename": file.filename,
+                    "processed_url": f"/data/processed/{filename}",
+                    "image_filename": filename,
+                    "proc_time": proc_time,
+                    "style": style,
+                    "stats": {
+                        "original": orig_stats,
+                        "processed": image_processor.get_image_stats(processed_img)
+                    }
+                })
+            if user_id:
+                work.log_user_activity(user_id, "stylize", f"Created {len(results)} styles of one image")
+    finally:
+        quota.settle(user_id, reserved, len(results))
 
     return jsonify({
         "success": True,
@@ -846,7 +1160,7 @@ def verify_razorpay_payment():
         quality  = data.get('quality', 95)
         amount   = data.get('amount')
 
-        db.log_user_activity(user_id, "payment", "Successful Razorpay transaction")
+        activity_log.log(user_id, "payment", "Successful Razorpay transaction")
 
         # Also store a row keyed by payment_id (pay_XXXX) so permanent
         # download links (/api/download/<payment_id>) can resolve the file.
@@ -948,7 +1262,7 @@ def subscribe_plan():
         updated = db.update_user_plan(user_id, plan)
         if updated:
             session['user']['plan'] = plan
-            db.log_user_activity(user_id, "subscription", f"Upgraded to {plan}")
+            activity_log.log(user_id, "subscription", f"Upgraded to {plan}")
             return jsonify({"success": True, "plan": plan})
         else:
             return jsonify({"success": False, "message": "Plan update failed"}), 500
@@ -974,7 +1288,7 @@ def admin_panel():
 @app.route('/api/admin/stats')
 @admin_required
 def admin_stats():
-    stats = db.get_admin_dashboard_stats()
+    stats = admin_analytics.dashboard_stats()
     return jsonify({"success": True, "stats": stats})
 
 @app.route('/api/admin/logs')
@@ -986,8 +1300,15 @@ def admin_logs():
 @app.route('/api/admin/users')
 @admin_required
 def admin_users():
-    users = db.get_all_users_admin()
-    return jsonify({"success": True, "users": users})
+    """Users newest first; pass the previous response's next_cursor as 'cursor' for the next page"""
+    try:
+        page = db.list_users_admin(
+            limit=request.args.get('limit', 50, type=int),
+            cursor_token=request.args.get('cursor') or None
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    return jsonify({"success": True, "users": page['items'], "next_cursor": page['next_cursor']})
 
 @app.route('/api/admin/user/<int:user_id>/activities')
 @admin_required
@@ -1000,8 +1321,15 @@ def admin_user_activities(user_id):
 @app.route('/api/admin/transactions')
 @admin_required
 def admin_transactions():
-    transactions = db.get_all_transactions_admin()
-    return jsonify({"success": True, "transactions": transactions})
+    """Transactions newest first; pass the previous response's next_cursor as 'cursor' for the next page"""
+    try:
+        page = db.list_transactions_admin(
+            limit=request.args.get('limit', 50, type=int),
+            cursor_token=request.args.get('cursor') or None
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    return jsonify({"success": True, "transactions": page['items'], "next_cursor": page['next_cursor']})
 
 from itsdangerous import URLSafeTimedSerializer
 download_serializer = URLSafeTimedSerializer(app.secret_key)
@@ -1328,7 +1656,7 @@ def post_process_bg():
     if not file_path.exists(): return jsonify({"success": False, "message": "File not found"}), 404
     
     img = cv2.imread(str(file_path))
-    processed = image_processor.teleport_background(img, bg_type)
+    processed = image_processor.teleport_background(img, bg_type, cache_key=filename)
     
     new_filename = f"bg_{uuid.uuid4().hex}.jpg"
     cv2.imwrite(str(settings.TEMP_FOLDER / new_filename), processed)
@@ -1345,14 +1673,22 @@ def post_process_animate():
     file_path = settings.TEMP_FOLDER / filename
     if not file_path.exists(): return jsonify({"success": False, "message": "File not found"}), 404
     
+    fmt = (data.get('format') or 'gif').lower()
+    if fmt not in ANIMATION_FORMATS:
+        return jsonify({"success": False, "message": f"Unsupported format. Use one of: {', '.join(ANIMATION_FORMATS)}"}), 400
+    
     img = cv2.imread(str(file_path))
-    gif_bytes = image_processor.create_toon_mo(img)
+    try:
+        anim_bytes = image_processor.create_toon_mo(img, fmt)
+    except RuntimeError as e:
+        return jsonify({"success": False, "message": str(e)}), 500
     
-    gif_filename = f"anim_{uuid.uuid4().hex}.gif"
-    with open(settings.TEMP_FOLDER / gif_filename, "wb") as f:
-        f.write(gif_bytes)
+    extension, mimetype = ANIMATION_FORMATS[fmt]
+    anim_filename = f"anim_{uuid.uuid4().hex}.{extension}"
+    with open(settings.TEMP_FOLDER / anim_filename, "wb") as f:
+        f.write(anim_bytes)
         
-    return jsonify({"success": True, "filename": gif_filename})
+    return jsonify({"success": True, "filename": anim_filename, "format": fmt, "mimetype": mimetype})
 
 @app.route('/api/web3/mint', methods=['POST'])
 def mint_nft():
@@ -1375,30 +1711,84 @@ def mint_nft():
 def process_dna():
     if 'user' not in session: return jsonify({"success": False, "message": "Unauthorized"}), 401
     
-    if 'target' not in request.files or 'reference' not in request.files:
-        return jsonify({"success": False, "message": "Missing target or reference image"}), 400
+    preset_id = request.form.get('preset_id', type=int)
+    if 'target' not in request.files or ('reference' not in request.files and not preset_id):
+        return jsonify({"success": False, "message": "Missing target image and reference image or preset_id"}), 400
         
     target_file = request.files['target']
-    ref_file = request.files['reference']
     
-    # Load images
+    # Saved presets skip the reference entirely; uploaded reference DNA is cached
+    # by upload hash, so repeat references skip decoding
+    if preset_id:
+        preset = db.get_dna_preset(preset_id, get_valid_session_user_id())
+        if not preset:
+            return jsonify({"success": False, "message": "Preset not found"}), 404
+        dna = preset['dna']
+    else:
+        dna = image_processor.style_dna.from_bytes(request.files['reference'].read())
+    
     nparr_t = np.frombuffer(target_file.read(), np.uint8)
     img_t = cv2.imdecode(nparr_t, cv2.IMREAD_COLOR)
     
-    nparr_r = np.frombuffer(ref_file.read(), np.uint8)
-    img_r = cv2.imdecode(nparr_r, cv2.IMREAD_COLOR)
-    
-    if img_t is None or img_r is None:
+    if img_t is None or dna is None:
         return jsonify({"success": False, "message": "Invalid image data"}), 400
         
     # Apply DNA transfer
-    dna_result = image_processor.apply_style_dna(img_t, img_r)
+    dna_result = image_processor.apply_style_dna(img_t, dna)
     
     filename = f"dna_{uuid.uuid4().hex}.jpg"
     cv2.imwrite(str(settings.TEMP_FOLDER / filename), dna_result)
     
     return jsonify({"success": True, "filename": filename})
 
+@app.route('/api/dna/presets', methods=['GET'])
+def list_dna_presets():
+    """Own Style DNA presets plus public ones"""
+    user_id = get_valid_session_user_id()
+    if not user_id: return jsonify({"success": False, "message": "Unauthorized"}), 401
+    return jsonify({"success": True, "presets": db.list_dna_presets(user_id)})
+
+@app.route('/api/dna/presets', methods=['POST'])
+def create_dna_preset():
+    """
+    Save a Style DNA preset from an uploaded 'reference' image (multipart) or
+    explicit DNA values (JSON 'dna': mean/std plus optional clahe/chroma_boost).
+    """
+    user_id = get_valid_session_user_id()
+    if not user_id: return jsonify({"success": False, "message": "Unauthorized"}), 401
+    
+    data = request.form if request.files else (request.get_json(silent=True) or {})
+    name = (data.get('name') or '').strip()
+    if not name or len(name) > 100:
+        return jsonify({"success": False, "message": "Preset name is required (max 100 characters)"}), 400
+    is_public = str(data.get('is_public', '')).lower() in ('1', 'true')
+    
+    try:
+        if 'reference' in request.files:
+            dna = image_processor.style_dna.from_bytes(request.files['reference'].read())
+            if dna is None:
+                return jsonify({"success": False, "message": "Invalid image data"}), 400
+            dna = validate_dna(dna)
+        elif isinstance(data.get('dna'), dict):
+            dna = validate_dna(data['dna'])
+        else:
+            return jsonify({"success": False, "message": "Provide a reference image or dna values"}), 400
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    
+    preset_id = db.create_dna_preset(user_id, name, dna, is_public=is_public)
+    activity_log.log(user_id, "dna_preset", f"Saved Style DNA preset '{name}'")
+    return jsonify({"success": True, "preset": {"id": preset_id, "name": name, "dna": dna, "is_public": is_public}}), 201
+
+@app.route('/api/dna/presets/<int:preset_id>', methods=['DELETE'])
+def delete_dna_preset(preset_id):
+    user_id = get_valid_session_user_id()
+    if not user_id: return jsonify({"success": False, "message": "Unauthorized"}), 401
+    is_admin = session['user'].get('role') == 'admin'
+    if not db.delete_dna_preset(preset_id, user_id, is_admin=is_admin):
+        return jsonify({"success": False, "message": "Preset not found"}), 404
+    return jsonify({"success": True})
+
 
 def process_whatsapp_image(message_data):
     """
@@ -47,6 +47,79 @@ MAX_VIDEO_DURATION_SECONDS = int(os.getenv("MAX_VIDEO_DURATION_SECONDS", "90"))
 VIDEO_PROCESS_EVERY_N_FRAMES = int(os.getenv("VIDEO_PROCESS_EVERY_N_FRAMES", "2"))
 VIDEO_FREE_MAX_WIDTH = int(os.getenv("VIDEO_FREE_MAX_WIDTH", "854"))
 VIDEO_PREMIUM_MAX_WIDTH = int(os.getenv("VIDEO_PREMIUM_MAX_WIDTH", "1280"))
+# Segment-parallel video rendering (0 workers = auto: CPU count / OPENCV_NUM_THREADS, at most 4)
+VIDEO_SEGMENT_WORKERS = int(os.getenv("VIDEO_SEGMENT_WORKERS", "0"))
+VIDEO_MIN_SEGMENT_FRAMES = int(os.getenv("VIDEO_MIN_SEGMENT_FRAMES", "96"))
+VIDEO_SEGMENT_RETRIES = int(os.getenv("VIDEO_SEGMENT_RETRIES", "1"))
+# Declarative style definitions and per-node cost budget for the style graph
+# (0 disables per-node downscaling; otherwise cost-weighted pixels per node)
+STYLE_GRAPH_PATH = os.getenv("STYLE_GRAPH_PATH", str(BASE_DIR / "config" / "styles.json"))
+STYLE_GRAPH_NODE_BUDGET = float(os.getenv("STYLE_GRAPH_NODE_BUDGET", "0"))
+# Shared buffer arena for style graph temporaries (idle memory cap for the whole process)
+BUFFER_ARENA_MAX_MB = int(os.getenv("BUFFER_ARENA_MAX_MB", "256"))
+BUFFER_ARENA_MAX_PER_KEY = int(os.getenv("BUFFER_ARENA_MAX_PER_KEY", "8"))
+# Background teleport segmentation (longest side GrabCut runs at; 0 = full resolution)
+SEGMENTATION_MAX_SIDE = int(os.getenv("SEGMENTATION_MAX_SIDE", "512"))
+SEGMENTATION_MASK_CACHE_SIZE = int(os.getenv("SEGMENTATION_MASK_CACHE_SIZE", "32"))
+# Teleport background assets (extra directories are os.pathsep-separated)
+BACKGROUNDS_DIR = os.getenv("BACKGROUNDS_DIR", str(BASE_DIR.parent / "frontend" / "static" / "images" / "backgrounds"))
+BACKGROUND_EXTRA_DIRS = os.getenv("BACKGROUND_EXTRA_DIRS", "")
+BACKGROUND_VARIANT_CACHE_SIZE = int(os.getenv("BACKGROUND_VARIANT_CACHE_SIZE", "16"))
+BACKGROUND_RESCAN_SECONDS = float(os.getenv("BACKGROUND_RESCAN_SECONDS", "30"))  # min gap between rescans on unknown names
+# Toon-Mo animation (frames render in parallel; GIFs over the byte cap are re-rendered smaller)
+ANIMATION_FRAMES = int(os.getenv("ANIMATION_FRAMES", "15"))
+ANIMATION_FRAME_MS = int(os.getenv("ANIMATION_FRAME_MS", "80"))
+ANIMATION_MAX_WIDTH = int(os.getenv("ANIMATION_MAX_WIDTH", "720"))
+ANIMATION_GIF_MAX_BYTES = int(os.getenv("ANIMATION_GIF_MAX_BYTES", str(4 * 1024 * 1024)))
+ANIMATION_WORKERS = int(os.getenv("ANIMATION_WORKERS", "4"))
+# Style DNA: reference statistics are measured on a downsample and cached by content hash
+STYLE_DNA_SAMPLE_SIDE = int(os.getenv("STYLE_DNA_SAMPLE_SIDE", "256"))
+STYLE_DNA_CACHE_SIZE = int(os.getenv("STYLE_DNA_CACHE_SIZE", "128"))
+# Cached vignette masks (3-channel uint8, one per frame size/strength)
+VIGNETTE_CACHE_SIZE = int(os.getenv("VIGNETTE_CACHE_SIZE", "4"))
+# Per-request quality tiers (draft / standard / max): plan default and highest tier allowed
+QUALITY_FREE_DEFAULT = os.getenv("QUALITY_FREE_DEFAULT", "draft")
+QUALITY_FREE_MAX = os.getenv("QUALITY_FREE_MAX", "draft")
+QUALITY_PREMIUM_DEFAULT = os.getenv("QUALITY_PREMIUM_DEFAULT", "standard")
+QUALITY_PREMIUM_MAX = os.getenv("QUALITY_PREMIUM_MAX", "max")
+QUALITY_DRAFT_MAX_WIDTH = int(os.getenv("QUALITY_DRAFT_MAX_WIDTH", "640"))
+QUALITY_KMEANS_SAMPLE = int(os.getenv("QUALITY_KMEANS_SAMPLE", "65536"))
+# Progressive delivery: fast preview first, full render on the background queue
+PREVIEW_MAX_WIDTH = int(os.getenv("PREVIEW_MAX_WIDTH", "480"))
+BACKGROUND_MAX_WORKERS = int(os.getenv("BACKGROUND_MAX_WORKERS", "2"))
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "900"))  # unfinished this long = its worker died
+# Processing cost model (fitted from processing_history timings)
+COST_MODEL_REFIT_SECONDS = int(os.getenv("COST_MODEL_REFIT_SECONDS", "600"))
+COST_MODEL_MIN_SAMPLES = int(os.getenv("COST_MODEL_MIN_SAMPLES", "5"))
+COST_MODEL_SAMPLE_LIMIT = int(os.getenv("COST_MODEL_SAMPLE_LIMIT", "5000"))
+COST_MODEL_BACKGROUND_SECONDS = float(os.getenv("COST_MODEL_BACKGROUND_SECONDS", "3.0"))
+# Gallery API: approximate total counts are cached per user/style for this long
+GALLERY_TOTAL_TTL_SECONDS = int(os.getenv("GALLERY_TOTAL_TTL_SECONDS", "300"))
+# Starter plan quota: sliding window of hourly buckets, resynced from history periodically
+STARTER_DAILY_LIMIT = int(os.getenv("STARTER_DAILY_LIMIT", "5"))
+QUOTA_WINDOW_HOURS = int(os.getenv("QUOTA_WINDOW_HOURS", "24"))
+QUOTA_RESYNC_SECONDS = int(os.getenv("QUOTA_RESYNC_SECONDS", "300"))
+QUOTA_RESERVATION_TTL_SECONDS = int(os.getenv("QUOTA_RESERVATION_TTL_SECONDS", "600"))  # longer than any request
+# Admin analytics: rollups refreshed over the last few days, fully rebuilt daily
+ADMIN_ROLLUP_REFRESH_SECONDS = int(os.getenv("ADMIN_ROLLUP_REFRESH_SECONDS", "60"))
+ADMIN_ROLLUP_REBUILD_SECONDS = int(os.getenv("ADMIN_ROLLUP_REBUILD_SECONDS", "86400"))
+ADMIN_ROLLUP_LOOKBACK_DAYS = int(os.getenv("ADMIN_ROLLUP_LOOKBACK_DAYS", "2"))
+ADMIN_ROLLUP_SERIES_DAYS = int(os.getenv("ADMIN_ROLLUP_SERIES_DAYS", "30"))
+# Activity log pipeline: buffered user_logs writes and retention
+ACTIVITY_LOG_CAPACITY = int(os.getenv("ACTIVITY_LOG_CAPACITY", "10000"))
+ACTIVITY_LOG_BATCH_SIZE = int(os.getenv("ACTIVITY_LOG_BATCH_SIZE", "200"))
+ACTIVITY_LOG_FLUSH_SECONDS = float(os.getenv("ACTIVITY_LOG_FLUSH_SECONDS", "1.0"))
+ACTIVITY_LOG_OVERFLOW = os.getenv("ACTIVITY_LOG_OVERFLOW", "drop_oldest")  # drop_oldest | drop_newest | sync
+ACTIVITY_LOG_RETENTION_DAYS = int(os.getenv("ACTIVITY_LOG_RETENTION_DAYS", "90"))  # 0 = keep forever
+ACTIVITY_LOG_PRUNE_SECONDS = int(os.getenv("ACTIVITY_LOG_PRUNE_SECONDS", "3600"))
+# SQLite (no DATABASE_URL): "wal" = WAL journal, per-thread connections, single writer thread per process; "legacy" = connection per call
+SQLITE_MODE = os.getenv("SQLITE_MODE", "wal")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_WRITER_BATCH = int(os.getenv("SQLITE_WRITER_BATCH", "64"))  # max writes group-committed together
+SQLITE_WRITE_TIMEOUT_SECONDS = float(os.getenv("SQLITE_WRITE_TIMEOUT_SECONDS", "30"))  # caller gives up waiting on the writer
 
 # Create necessary directories
 TEMP_FOLDER.mkdir(parents=True, exist_ok=True)
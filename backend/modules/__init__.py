@@ -5,6 +5,7 @@ from .database import db
 from .authentication import auth, Authentication
 from .image_processing import image_processor, ImageProcessor
 from .payment import payment_processor, PaymentProcessor
+from .cost_model import cost_model, CostModel
 
 __all__ = [
     'db',
@@ -13,5 +14,7 @@ __all__ = [
     'image_processor',
     'ImageProcessor',
     'payment_processor',
-    'PaymentProcessor'
+    'PaymentProcessor',
+    'cost_model',
+    'CostModel'
 ]
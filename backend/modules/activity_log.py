@@ -0,0 +1,157 @@
+"""
+Activity log pipeline
+Non-blocking sink for user_logs: a bounded ring buffer drained by a background writer
+"""
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict
+import config.settings as settings
+from modules.database import db
+
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "sync")
+
+
+class ActivityLog:
+    """
+    Buffers (user_id, action, details) entries and writes them in batches from a
+    daemon thread, so logging costs the request a deque append.
+    When the buffer is full the overflow policy decides: "drop_oldest" (ring
+    buffer), "drop_newest", or "sync" (write the entry inline, as before).
+    The writer also prunes user_logs older than the retention period, and the
+    buffer is flushed at interpreter exit.
+    """
+
+    def __init__(self, database=None, capacity: int = None, batch_size: int = None,
+                 flush_seconds: float = None, overflow: str = None, retention_days: int = None):
+        """Initialize an empty buffer (the writer starts on first use)"""
+        self.db = database
+        self.capacity = max(1, int(capacity or getattr(settings, "ACTIVITY_LOG_CAPACITY", 10000)))
+        self.batch_size = max(1, int(batch_size or getattr(settings, "ACTIVITY_LOG_BATCH_SIZE", 200)))
+        self.flush_seconds = float(flush_seconds if flush_seconds is not None
+                                   else getattr(settings, "ACTIVITY_LOG_FLUSH_SECONDS", 1.0))
+        self.overflow = overflow or getattr(settings, "ACTIVITY_LOG_OVERFLOW", "drop_oldest")
+        if self.overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{self.overflow}'. Use one of: {', '.join(OVERFLOW_POLICIES)}")
+        self.retention_days = int(retention_days if retention_days is not None
+                                  else getattr(settings, "ACTIVITY_LOG_RETENTION_DAYS", 90))
+        self.prune_seconds = float(getattr(settings, "ACTIVITY_LOG_PRUNE_SECONDS", 3600))
+        self._buffer = deque()
+        self._cond = threading.Condition()
+        # Serializes writes so flush() and the writer never insert the same batch twice
+        self._write_lock = threading.Lock()
+        self._writer = None
+        self._writer_pid = None
+        self._closed = False
+        self.pruned_at = time.time()
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def log(self, user_id: int, action: str, details: str = None) -> bool:
+        """Queue an entry; returns False if the overflow policy dropped it"""
+        entry = (user_id, action, details)
+        with self._cond:
+            if len(self._buffer) >= self.capacity and not self._closed:
+                if self.overflow == "drop_newest":
+                    self.dropped += 1
+                    return False
+                if self.overflow == "drop_oldest":
+                    self._buffer.popleft()
+                    self.dropped += 1
+                elif self.overflow == "sync":
+                    entry = None
+            if entry is not None and not self._closed:
+                self._ensure_writer()
+                self._buffer.append(entry)
+                if len(self._buffer) >= self.batch_size:
+                    self._cond.notify()
+                return True
+        # Buffer full under "sync", or already closed: write inline
+        self._write([(user_id, action, details)])
+        return True
+
+    def _ensure_writer(self):
+        """Start the writer thread unless this process already runs one (caller holds the condition)"""
+        pid = os.getpid()
+        if self._writer_pid == pid and self._writer.is_alive():
+            return
+        if self._writer is None:
+            atexit.register(self.close)
+        elif self._writer_pid != pid:
+            # A forked worker (gunicorn --preload) inherits no threads: entries
+            # buffered before the fork are the parent's to write
+            self._buffer.clear()
+            self._write_lock = threading.Lock()
+        self._writer = threading.Thread(target=self._run, name="toonify-activity-log", daemon=True)
+        self._writer_pid = pid
+        self._writer.start()
+
+    def _take(self) -> list:
+        """Pop up to batch_size entries (caller holds the condition)"""
+        batch = []
+        while self._buffer and len(batch) < self.batch_size:
+            batch.append(self._buffer.popleft())
+        return batch
+
+    def _write(self, batch: list):
+        if not batch or self.db is None:
+            return
+        with self._write_lock:
+            try:
+                self.db.log_user_activity_bulk(batch)
+                self.written += len(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                print(f"Activity log write failed ({len(batch)} entries): {e}")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed and len(self._buffer) < self.batch_size:
+                    self._cond.wait(self.flush_seconds)
+                if self._closed and not self._buffer:
+                    return
+                batch = self._take()
+            self._write(batch)
+            self.maybe_prune()
+
+    def flush(self):
+        """Write everything buffered so far from the calling thread"""
+        while True:
+            with self._cond:
+                batch = self._take()
+            if not batch:
+                return
+            self._write(batch)
+
+    def close(self):
+        """Stop accepting buffered entries, drain the buffer and stop the writer"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self.flush()
+        if self._writer is not None and self._writer is not threading.current_thread():
+            self._writer.join(timeout=5)
+
+    def maybe_prune(self, now: float = None):
+        """Delete user_logs past the retention period, at most every prune_seconds"""
+        now = time.time() if now is None else now
+        if self.db is None or not self.retention_days or now - self.pruned_at < self.prune_seconds:
+            return
+        self.pruned_at = now
+        try:
+            self.db.prune_activity_logs(self.retention_days)
+        except Exception as e:
+            print(f"Activity log pruning failed: {e}")
+
+    def stats(self) -> Dict:
+        with self._cond:
+            queued = len(self._buffer)
+        return {"queued": queued, "written": self.written, "dropped": self.dropped, "failed": self.failed}
+
+
+# Global activity log sink
+activity_log = ActivityLog(db)
@@ -0,0 +1,83 @@
+"""
+Admin analytics
+Dashboard totals and daily series served from periodically refreshed rollups
+"""
+import threading
+import time
+from typing import Dict, Optional
+import config.settings as settings
+from modules.database import db
+
+
+class AdminAnalytics:
+    """
+    Keeps admin_daily_rollups fresh and caches the dashboard summary built from it.
+    Each refresh recomputes only the last few days (older days rarely change);
+    a full rebuild runs on first use and every rebuild_seconds after that, so
+    deleted history and late status changes are picked up eventually.
+    """
+
+    def __init__(self, database=None, refresh_seconds: int = None, rebuild_seconds: int = None):
+        """Initialize with no summary (refreshed on first use)"""
+        self.db = database
+        self.refresh_seconds = int(refresh_seconds if refresh_seconds is not None
+                                   else getattr(settings, "ADMIN_ROLLUP_REFRESH_SECONDS", 60))
+        self.rebuild_seconds = int(rebuild_seconds if rebuild_seconds is not None
+                                   else getattr(settings, "ADMIN_ROLLUP_REBUILD_SECONDS", 86400))
+        self.lookback_days = max(1, int(getattr(settings, "ADMIN_ROLLUP_LOOKBACK_DAYS", 2)))
+        self.series_days = max(1, int(getattr(settings, "ADMIN_ROLLUP_SERIES_DAYS", 30)))
+        self._summary: Optional[Dict] = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self.refreshed_at = 0.0
+        self.rebuilt_at = 0.0
+
+    def refresh(self):
+        """Refresh the rollups (incrementally unless a rebuild is due) and the cached summary"""
+        now = time.time()
+        try:
+            if not self.rebuilt_at or now - self.rebuilt_at >= self.rebuild_seconds:
+                self.db.refresh_admin_rollups()
+                self.rebuilt_at = now
+            else:
+                self.db.refresh_admin_rollups(self.lookback_days)
+            summary = self.db.get_admin_dashboard_stats()
+            summary["daily"] = self.db.get_admin_rollups(self.series_days)
+        except Exception as e:
+            print(f"Admin rollup refresh failed: {e}")
+            if self._summary is not None:
+                self.refreshed_at = now
+                return
+            raise
+        summary["refreshed_at"] = now
+        self._summary = summary
+        self.refreshed_at = now
+
+    def maybe_refresh(self):
+        """Refresh on first use, then in the background once the summary is stale"""
+        if not self.refreshed_at:
+            self.refresh()
+            return
+        if time.time() - self.refreshed_at < self.refresh_seconds:
+            return
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def _run():
+            try:
+                self.refresh()
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=_run, daemon=True).start()
+
+    def dashboard_stats(self) -> Dict:
+        """Totals plus the daily series, at most refresh_seconds (plus one refresh) old"""
+        self.maybe_refresh()
+        return dict(self._summary)
+
+
+# Global admin analytics
+admin_analytics = AdminAnalytics(db)
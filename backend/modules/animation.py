@@ -0,0 +1,152 @@
+"""
+Animation engine
+Renders the Toon-Mo "breathing" loop with affine warps and encodes it as GIF, WebP or MP4
+"""
+import io
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Tuple
+import cv2
+import numpy as np
+from PIL import Image
+import config.settings as settings
+
+# format -> (file extension, mimetype)
+ANIMATION_FORMATS = {
+    "gif": ("gif", "image/gif"),
+    "webp": ("webp", "image/webp"),
+    "mp4": ("mp4", "video/mp4"),
+}
+
+
+@lru_cache(maxsize=8)
+def breathing_curve(frame_count: int, zoom: float = 0.03, brightness: float = 0.05) -> Tuple[Tuple[float, float], ...]:
+    """(scale, brightness) per frame: one sine period of zoom and brightness pulse"""
+    phases = np.arange(frame_count) * (2.0 * np.pi / frame_count)
+    return tuple((1.0 + zoom * float(np.sin(p)), 1.0 + brightness * float(np.sin(p))) for p in phases)
+
+
+class Animator:
+    """Frame rendering and encoding for short looping animations"""
+
+    def __init__(self, frame_count: int = None, frame_ms: int = None, max_width: int = None,
+                 gif_max_bytes: int = None, workers: int = None):
+        """Initialize animation settings"""
+        self.frame_count = max(2, int(frame_count or getattr(settings, "ANIMATION_FRAMES", 15)))
+        self.frame_ms = max(20, int(frame_ms or getattr(settings, "ANIMATION_FRAME_MS", 80)))
+        self.max_width = int(max_width or getattr(settings, "ANIMATION_MAX_WIDTH", 720))
+        self.gif_max_bytes = int(gif_max_bytes or getattr(settings, "ANIMATION_GIF_MAX_BYTES", 4 * 1024 * 1024))
+        self.workers = max(1, int(workers or getattr(settings, "ANIMATION_WORKERS", 4)))
+
+    @staticmethod
+    def _render_frame(image: np.ndarray, scale: float, brightness: float) -> np.ndarray:
+        """Zoom about the centre (edges replicated) and scale brightness in one pass each"""
+        h, w = image.shape[:2]
+        matrix = cv2.getRotationMatrix2D((w / 2.0, h / 2.0), 0, scale)
+        frame = cv2.warpAffine(image, matrix, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+        return cv2.convertScaleAbs(frame, dst=frame, alpha=brightness)
+
+    def render_frames(self, image: np.ndarray) -> List[np.ndarray]:
+        """All frames of the loop, rendered in parallel"""
+        curve = breathing_curve(self.frame_count)
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(curve))) as executor:
+            return list(executor.map(lambda step: self._render_frame(image, *step), curve))
+
+    @staticmethod
+    def _shared_palette(frames: List[np.ndarray]) -> Image.Image:
+        """One 256-colour palette covering the darkest and brightest frames"""
+        brightness = [f.mean() for f in frames]
+        extremes = [frames[int(np.argmin(brightness))], frames[int(np.argmax(brightness))]]
+        samples = []
+        for frame in extremes:
+            h, w = frame.shape[:2]
+            factor = min(1.0, 256.0 / max(h, w))
+            samples.append(cv2.resize(frame, (max(1, int(w * factor)), max(1, int(h * factor))),
+                                      interpolation=cv2.INTER_AREA))
+        width = max(s.shape[1] for s in samples)
+        padded = [cv2.copyMakeBorder(s, 0, 0, 0, width - s.shape[1], cv2.BORDER_REPLICATE) for s in samples]
+        return Image.fromarray(np.vstack(padded)).quantize(colors=256, method=Image.Quantize.MEDIANCUT)
+
+    def _encode_gif(self, frames: List[np.ndarray]) -> bytes:
+        palette = self._shared_palette(frames)
+
+        def to_indexed(frame):
+            return Image.fromarray(frame).quantize(palette=palette, dither=Image.Dither.NONE)
+
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(frames))) as executor:
+            indexed = list(executor.map(to_indexed, frames))
+
+        byte_io = io.BytesIO()
+        indexed[0].save(byte_io, format="GIF", save_all=True, append_images=indexed[1:],
+                        duration=self.frame_ms, loop=0)
+        return byte_io.getvalue()
+
+    def _encode_webp(self, frames: List[np.ndarray]) -> bytes:
+        images = [Image.fromarray(frame) for frame in frames]
+        byte_io = io.BytesIO()
+        images[0].save(byte_io, format="WEBP", save_all=True, append_images=images[1:],
+                       duration=self.frame_ms, loop=0, quality=80, method=4)
+        return byte_io.getvalue()
+
+    def _encode_mp4(self, frames: List[np.ndarray]) -> bytes:
+        h, w = frames[0].shape[:2]
+        fd, path = tempfile.mkstemp(suffix=".mp4")
+        os.close(fd)
+        try:
+            writer = None
+            for codec in ("avc1", "mp4v"):
+                writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), 1000.0 / self.frame_ms, (w, h))
+                if writer.isOpened():
+                    break
+                writer.release()
+                writer = None
+            if writer is None:
+                raise RuntimeError("No MP4 encoder available")
+            # Two loops so players that do not loop still show the effect
+            for _ in range(2):
+                for frame in frames:
+                    writer.write(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+            writer.release()
+            with open(path, "rb") as f:
+                return f.read()
+        finally:
+            os.remove(path)
+
+    def _fit_width(self, image: np.ndarray, max_width: int) -> np.ndarray:
+        h, w = image.shape[:2]
+        if w <= max_width:
+            return image
+        return cv2.resize(image, (max_width, max(1, int(h * max_width / w))), interpolation=cv2.INTER_AREA)
+
+    def animate(self, image: np.ndarray, fmt: str = "gif") -> bytes:
+        """
+        Encode the breathing loop of a BGR image.
+        GIFs above the byte cap are re-rendered at a smaller size (up to three times).
+        """
+        if fmt not in ANIMATION_FORMATS:
+            raise ValueError(f"Unsupported animation format: {fmt}")
+
+        rgb = cv2.cvtColor(self._fit_width(image, self.max_width), cv2.COLOR_BGR2RGB)
+        if fmt == "mp4":
+            # Most H.264/MPEG-4 encoders need even dimensions
+            h, w = rgb.shape[:2]
+            rgb = np.ascontiguousarray(rgb[:h - h % 2, :w - w % 2])
+        if fmt == "webp":
+            return self._encode_webp(self.render_frames(rgb))
+        if fmt == "mp4":
+            return self._encode_mp4(self.render_frames(rgb))
+
+        data = self._encode_gif(self.render_frames(rgb))
+        for _ in range(3):
+            if len(data) <= self.gif_max_bytes:
+                break
+            width = int(rgb.shape[1] * np.sqrt(self.gif_max_bytes / len(data)) * 0.9)
+            rgb = self._fit_width(rgb, max(64, width))
+            data = self._encode_gif(self.render_frames(rgb))
+        return data
+
+
+# Global animator instance
+animator = Animator()
@@ -0,0 +1,131 @@
+"""
+Background asset registry
+Decoded teleport backgrounds held in memory, with an LRU of resized variants
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import cv2
+import numpy as np
+import config.settings as settings
+
+BACKGROUND_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp"}
+
+
+class BackgroundRegistry:
+    """Background images by name (file stem), decoded once and resized on demand"""
+
+    def __init__(self, directories: List = None, variant_cache_size: int = None, rescan_seconds: float = None):
+        """Preload every background found in the configured directories"""
+        self.variant_cache_size = int(variant_cache_size if variant_cache_size is not None
+                                      else getattr(settings, "BACKGROUND_VARIANT_CACHE_SIZE", 16))
+        # Unknown names (client input) are answered from the last scan for this long
+        self.rescan_seconds = float(rescan_seconds if rescan_seconds is not None
+                                    else getattr(settings, "BACKGROUND_RESCAN_SECONDS", 30))
+        self._originals: Dict[str, np.ndarray] = {}
+        self._sources: Dict[str, Path] = {}
+        self._directories: List[Path] = []
+        self._variants: "OrderedDict[Tuple[str, int, int], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Serializes directory scans so concurrent misses never decode a file twice
+        self._scan_lock = threading.Lock()
+        self.scanned_at = 0.0
+        for directory in directories or []:
+            self.register_directory(directory)
+
+    def register(self, name: str, image: np.ndarray, source: Path = None):
+        """Add or replace a background; stale resized variants are dropped"""
+        image.setflags(write=False)
+        with self._lock:
+            self._originals[name] = image
+            if source is not None:
+                self._sources[name] = source
+            for key in [key for key in self._variants if key[0] == name]:
+                del self._variants[key]
+
+    def register_directory(self, directory) -> List[str]:
+        """
+        Decode every image in directory that is not registered yet.
+        The directory is remembered so files dropped in later are picked up by
+        refresh(), or on lookup once rescan_seconds have passed since the last scan.
+        Returns: names added
+        """
+        directory = Path(directory)
+        with self._lock:
+            if directory not in self._directories:
+                self._directories.append(directory)
+        return self._scan([directory])
+
+    def _scan(self, directories: List[Path]) -> List[str]:
+        added = []
+        with self._scan_lock:
+            self.scanned_at = time.time()
+            for directory in directories:
+                if not directory.is_dir():
+                    continue
+                for entry in sorted(directory.iterdir()):
+                    name = entry.stem
+                    if entry.suffix.lower() not in BACKGROUND_EXTENSIONS or name in self._originals:
+                        continue
+                    image = cv2.imread(str(entry), cv2.IMREAD_COLOR)
+                    if image is None:
+                        print(f"Background asset could not be decoded: {entry}")
+                        continue
+                    self.register(name, image, source=entry)
+                    added.append(name)
+        return added
+
+    def refresh(self) -> List[str]:
+        """Pick up new files in the registered directories"""
+        with self._lock:
+            directories = list(self._directories)
+        return self._scan(directories)
+
+    def names(self) -> List[str]:
+        return sorted(self._originals)
+
+    def get(self, name: str, width: int, height: int) -> Optional[np.ndarray]:
+        """Read-only background resized to width x height, or None if unknown"""
+        key = (name, width, height)
+        with self._lock:
+            variant = self._variants.get(key)
+            if variant is not None:
+                self._variants.move_to_end(key)
+                return variant
+            original = self._originals.get(name)
+
+        if original is None:
+            # Misses are cached: the directories are rescanned at most once per rescan_seconds
+            if not name or time.time() - self.scanned_at < self.rescan_seconds:
+                return None
+            self.refresh()
+            original = self._originals.get(name)
+            if original is None:
+                return None
+
+        variant = original
+        if original.shape[:2] != (height, width):
+            variant = cv2.resize(original, (width, height))
+            variant.setflags(write=False)
+
+        if self.variant_cache_size > 0:
+            with self._lock:
+                self._variants[key] = variant
+                while len(self._variants) > self.variant_cache_size:
+                    self._variants.popitem(last=False)
+        return variant
+
+
+def _configured_directories() -> List[Path]:
+    directories = [Path(getattr(settings, "BACKGROUNDS_DIR",
+                                settings.BASE_DIR.parent / "frontend" / "static" / "images" / "backgrounds"))]
+    extra = getattr(settings, "BACKGROUND_EXTRA_DIRS", "")
+    directories.extend(Path(path) for path in extra.split(os.pathsep) if path)
+    return directories
+
+
+# Global background registry (preloaded at import)
+background_registry = BackgroundRegistry(_configured_directories())
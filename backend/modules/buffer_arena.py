@@ -0,0 +1,98 @@
+"""
+Shared buffer arena
+Recycles frame-sized numpy buffers between renders so the stylization hot path
+writes into existing memory (OpenCV dst=) instead of allocating fresh temporaries
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+import numpy as np
+import config.settings as settings
+
+
+class BufferArena:
+    """
+    Free lists of uninitialized buffers keyed by (shape, dtype), shared by every
+    thread. Request threads and the short-lived pools of the batch, video and
+    animation paths all draw from it, so buffers outlive the threads that made
+    them, and max_bytes caps idle memory for the whole process.
+    """
+
+    def __init__(self, max_bytes: int = None, max_per_key: int = None):
+        """Initialize an empty arena with a byte cap for idle buffers"""
+        self.max_bytes = int(max_bytes if max_bytes is not None
+                             else getattr(settings, "BUFFER_ARENA_MAX_MB", 256) * 1024 * 1024)
+        self.max_per_key = max(1, int(max_per_key or getattr(settings, "BUFFER_ARENA_MAX_PER_KEY", 8)))
+        self._free: "OrderedDict[Tuple[tuple, str], List[np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.idle_bytes = 0
+        self.allocations = 0
+        self.reuses = 0
+
+    @staticmethod
+    def _key(shape, dtype) -> Tuple[tuple, str]:
+        return tuple(shape), np.dtype(dtype).str
+
+    def acquire(self, shape, dtype=np.uint8) -> np.ndarray:
+        """A buffer of shape/dtype with undefined contents; callers must overwrite it fully"""
+        key = self._key(shape, dtype)
+        with self._lock:
+            free = self._free.get(key)
+            if free:
+                buffer = free.pop()
+                self.idle_bytes -= buffer.nbytes
+                self._free.move_to_end(key)
+                self.reuses += 1
+                return buffer
+            self.allocations += 1
+        return np.empty(key[0], dtype=dtype)
+
+    def release(self, buffer: np.ndarray):
+        """Return a buffer for reuse. Views and foreign arrays are ignored."""
+        if buffer is None or buffer.base is not None or not buffer.flags.c_contiguous:
+            return
+        if buffer.nbytes > self.max_bytes:
+            return
+        key = self._key(buffer.shape, buffer.dtype)
+        with self._lock:
+            free = self._free.setdefault(key, [])
+            if len(free) >= self.max_per_key or any(idle is buffer for idle in free):
+                return
+            free.append(buffer)
+            self._free.move_to_end(key)
+            self.idle_bytes += buffer.nbytes
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used sizes until idle memory fits the cap (lock held)"""
+        while self.idle_bytes > self.max_bytes and self._free:
+            key, free = next(iter(self._free.items()))
+            if free:
+                self.idle_bytes -= free.pop(0).nbytes
+            if not free:
+                del self._free[key]
+
+    def clear(self):
+        """Drop all idle buffers"""
+        with self._lock:
+            self._free.clear()
+            self.idle_bytes = 0
+
+    def stats(self) -> Dict:
+        """Allocation counters for monitoring"""
+        with self._lock:
+            return {
+                "allocations": self.allocations,
+                "reuses": self.reuses,
+                "idle_buffers": sum(len(free) for free in self._free.values()),
+                "idle_bytes": self.idle_bytes
+            }
+
+
+# Process-wide arena
+_arena = BufferArena()
+
+
+def get_arena() -> BufferArena:
+    """The process-wide arena"""
+    return _arena
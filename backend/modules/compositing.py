@@ -0,0 +1,75 @@
+"""
+Compositing primitives
+Alpha blending and vignetting of uint8 frames without float frame copies
+"""
+import threading
+from collections import OrderedDict
+from typing import Tuple
+import numpy as np
+import cv2
+import config.settings as settings
+from modules.buffer_arena import get_arena
+
+
+def composite(foreground: np.ndarray, background: np.ndarray, alpha: np.ndarray,
+              dst: np.ndarray = None) -> np.ndarray:
+    """
+    Blend foreground over background: fg * alpha + bg * (1 - alpha), rounded to uint8.
+    alpha is single-channel, either uint8 (255 = foreground) or float in [0, 1].
+    Only two single-channel float32 weight planes are needed; they come from the
+    shared buffer arena and are recycled.
+    """
+    if foreground.shape != background.shape:
+        raise ValueError(f"Cannot composite {foreground.shape} over {background.shape}")
+    if alpha.shape != foreground.shape[:2]:
+        raise ValueError(f"Alpha {alpha.shape} does not match frame {foreground.shape[:2]}")
+
+    arena = get_arena()
+    fg_weight = arena.acquire(alpha.shape, np.float32)
+    bg_weight = arena.acquire(alpha.shape, np.float32)
+    scale = np.float32(1.0 / 255.0) if alpha.dtype == np.uint8 else np.float32(1.0)
+    np.multiply(alpha, scale, out=fg_weight, casting="unsafe")
+    np.subtract(np.float32(1.0), fg_weight, out=bg_weight)
+
+    result = cv2.blendLinear(foreground, background, fg_weight, bg_weight, dst=dst)
+    arena.release(fg_weight)
+    arena.release(bg_weight)
+    return result
+
+
+_vignette_lock = threading.Lock()
+_vignettes: "OrderedDict[Tuple[int, int, float], np.ndarray]" = OrderedDict()
+
+
+def vignette_mask(height: int, width: int, strength: float = 1.0) -> np.ndarray:
+    """
+    Cached 3-channel uint8 vignette (255 = untouched) keyed by (height, width, strength).
+    Built separably as the outer product of two 1D Gaussians (sigma = half the side);
+    strength 1.0 is the full falloff, 0.0 no darkening.
+    """
+    key = (height, width, round(float(strength), 3))
+    with _vignette_lock:
+        mask = _vignettes.get(key)
+        if mask is not None:
+            _vignettes.move_to_end(key)
+            return mask
+
+    y_kernel = cv2.getGaussianKernel(height, height / 2, cv2.CV_32F)
+    x_kernel = cv2.getGaussianKernel(width, width / 2, cv2.CV_32F)
+    falloff = (y_kernel / y_kernel.max()) * (x_kernel / x_kernel.max()).T
+    weights = 1.0 - key[2] * (1.0 - falloff)
+    plane = np.clip(np.rint(weights * 255.0), 0, 255).astype(np.uint8)
+    mask = cv2.merge([plane, plane, plane])
+    mask.setflags(write=False)
+
+    with _vignette_lock:
+        _vignettes[key] = mask
+        while len(_vignettes) > max(1, int(getattr(settings, "VIGNETTE_CACHE_SIZE", 4))):
+            _vignettes.popitem(last=False)
+    return mask
+
+
+def apply_vignette(image: np.ndarray, strength: float = 1.0, dst: np.ndarray = None) -> np.ndarray:
+    """Darken the frame edges with one fixed-point multiply over all channels"""
+    h, w = image.shape[:2]
+    return cv2.multiply(image, vignette_mask(h, w, strength), dst=dst, scale=1.0 / 255.0)
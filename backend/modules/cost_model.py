@@ -0,0 +1,154 @@
+"""
+Processing cost model
+Predicts how long a stylization request will take from recorded processing times
+"""
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import config.settings as settings
+from modules.database import db
+from modules.image_processing import ImageProcessor, image_processor
+from modules.quality import resolve_quality
+
+
+class CostModel:
+    """
+    Linear model of processing time against megapixels processed, per
+    (style, quality tier). A tier without enough samples falls back to the
+    style's fit over every tier, then to a heavy/light prior.
+    """
+
+    # Seconds per megapixel used until a style has enough recorded samples
+    PRIOR_HEAVY = (0.05, 0.45)
+    PRIOR_LIGHT = (0.01, 0.06)
+
+    def __init__(self, database=None, processor: ImageProcessor = None):
+        """Initialize an unfitted model (priors only)"""
+        self.db = database
+        self.processor = processor or image_processor
+        self.refit_interval = int(getattr(settings, "COST_MODEL_REFIT_SECONDS", 600))
+        self.min_samples = max(2, int(getattr(settings, "COST_MODEL_MIN_SAMPLES", 5)))
+        self.background_seconds = float(getattr(settings, "COST_MODEL_BACKGROUND_SECONDS", 3.0))
+        # (style, quality) -> (intercept, slope, samples); quality None is the style-wide fit
+        self.coefficients: Dict[Tuple[str, Optional[str]], Tuple[float, float, int]] = {}
+        self.fitted_at = 0.0
+        self._lock = threading.Lock()
+        self._refitting = False
+
+    def fit(self, samples: List[Dict]):
+        """
+        Fit (intercept, seconds_per_megapixel) per (style, quality) and per style.
+        Groups whose samples all share one size fall back to a zero-intercept ratio.
+        Samples recorded without a tier only count towards the style-wide fit.
+        """
+        grouped: Dict[Tuple[str, Optional[str]], List[Tuple[float, float]]] = {}
+        for row in samples:
+            pixels, seconds = row.get('pixels'), row.get('processing_time')
+            if not pixels or seconds is None:
+                continue
+            point = (pixels / 1e6, float(seconds))
+            grouped.setdefault((row['style'], None), []).append(point)
+            if row.get('quality'):
+                grouped.setdefault((row['style'], row['quality']), []).append(point)
+
+        coefficients = {}
+        for key, points in grouped.items():
+            if len(points) < self.min_samples:
+                continue
+            mp = np.array([p[0] for p in points])
+            secs = np.array([p[1] for p in points])
+            if np.ptp(mp) > 1e-3:
+                slope, intercept = np.polyfit(mp, secs, 1)
+                if slope <= 0:
+                    slope, intercept = float(secs.sum() / mp.sum()), 0.0
+            else:
+                slope, intercept = float(secs.sum() / mp.sum()), 0.0
+            coefficients[key] = (max(0.0, float(intercept)), float(slope), len(points))
+
+        with self._lock:
+            self.coefficients = coefficients
+            self.fitted_at = time.time()
+
+    def refit(self):
+        """Refit from the most recent processing_history samples"""
+        if self.db is None:
+            self.fitted_at = time.time()
+            return
+        limit = int(getattr(settings, "COST_MODEL_SAMPLE_LIMIT", 5000))
+        try:
+            self.fit(self.db.get_processing_time_samples(limit=limit))
+        except Exception as e:
+            print(f"Cost model refit failed: {e}")
+            self.fitted_at = time.time()
+
+    def maybe_refit(self):
+        """Fit on first use, then refresh in the background once the fit is stale"""
+        if not self.fitted_at:
+            self.refit()
+            return
+        if time.time() - self.fitted_at < self.refit_interval:
+            return
+        with self._lock:
+            if self._refitting:
+                return
+            self._refitting = True
+
+        def _run():
+            try:
+                self.refit()
+            finally:
+                self._refitting = False
+
+        threading.Thread(target=_run, daemon=True).start()
+
+    def _coefficients(self, style: str, quality: Optional[str]) -> Optional[Tuple[float, float, int]]:
+        return self.coefficients.get((style, quality)) or self.coefficients.get((style, None))
+
+    def estimate_seconds(self, style: str, width: int, height: int, is_premium: bool = False,
+                         quality: str = None) -> float:
+        """Predicted processing_time for one image (quality defaults to the plan's tier)"""
+        self.maybe_refit()
+        out_w, out_h = self.processor.plan_output_size(width, height, is_premium)
+        megapixels = (out_w * out_h) / 1e6
+        coefficients = self._coefficients(style, resolve_quality(quality, is_premium))
+        if coefficients:
+            intercept, slope, _ = coefficients
+        else:
+            intercept, slope = self.PRIOR_HEAVY if style in ImageProcessor.HEAVY_STYLES else self.PRIOR_LIGHT
+        return intercept + slope * megapixels
+
+    def estimate(self, style: str, width: int, height: int, is_premium: bool = False,
+                 quality: str = None) -> Dict:
+        """Estimate plus the scheduling route for one image"""
+        quality = resolve_quality(quality, is_premium)
+        seconds = self.estimate_seconds(style, width, height, is_premium, quality)
+        coefficients = self._coefficients(style, quality)
+        return {
+            "style": style,
+            "quality": quality,
+            "estimated_seconds": round(seconds, 3),
+            "route": self.route(seconds),
+            "samples": coefficients[2] if coefficients else 0
+        }
+
+    def route(self, seconds: float) -> str:
+        """'background' for jobs too slow to hold a request open, else 'inline'"""
+        return "background" if seconds >= self.background_seconds else "inline"
+
+    @staticmethod
+    def schedule(costs: List[float], workers: int) -> Tuple[List[int], float]:
+        """
+        Longest-processing-time-first order for a worker pool.
+        Returns: (submission order as indexes into costs, estimated makespan)
+        """
+        order = sorted(range(len(costs)), key=lambda i: costs[i], reverse=True)
+        loads = [0.0] * max(1, workers)
+        for i in order:
+            slot = loads.index(min(loads))
+            loads[slot] += costs[i]
+        return order, max(loads) if costs else 0.0
+
+
+# Global cost model instance
+cost_model = CostModel(db)
@@ -1,27 +1,90 @@
 """
 Database operations for user management
 """
+import base64
+import json
+from collections import Counter
+from contextlib import contextmanager
+import functools
+import inspect
 import sqlite3
 import os
-from datetime import datetime
+import threading
+import time
+from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Optional, Dict, List
 import config.settings as settings
+from modules.migrations import migrate
+from modules.sqlite_engine import SQLiteEngine
 
 # Attempt PostgreSQL Import for Production
 try:
     import psycopg2
-    from psycopg2.extras import RealDictCursor
+    from psycopg2.extras import RealDictCursor, execute_values
     HAS_POSTGRES = True
 except ImportError:
     HAS_POSTGRES = False
 
+# Width of a quota_buckets bucket (epoch hours)
+QUOTA_BUCKET_SECONDS = 3600
+
+# Postgres advisory lock class serializing materialized stats writes per user
+USER_STATS_LOCK_KEY = 7_402_042
+
+
+def _writes(method):
+    """
+    Mark a Database method as a write. In SQLite WAL mode it runs on the
+    engine's writer thread; Postgres, legacy SQLite and calls that pass the
+    caller's cursor run it in place.
+    """
+    signature = inspect.signature(method)
+    takes_cursor = "cursor" in signature.parameters
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.sqlite_engine is None or (
+                takes_cursor and signature.bind(self, *args, **kwargs).arguments.get("cursor") is not None):
+            return method(self, *args, **kwargs)
+        return self.sqlite_engine.write(method, self, *args, **kwargs)
+    return wrapper
+
+
+class UnitOfWork:
+    """
+    History and activity-log writes queued during a `with db.unit_of_work()` block
+    and flushed in one transaction when it exits. Queuing is thread-safe, so pool
+    workers can add their results directly.
+    """
+
+    def __init__(self):
+        self.history: List[tuple] = []
+        self.activity: List[tuple] = []
+        self._lock = threading.Lock()
+
+    def add_processing_history(self, user_id: int, original_filename: str, processed_filename: str,
+                               style: str, processing_time: float = None, pixels: int = None,
+                               quality: str = None):
+        with self._lock:
+            self.history.append((user_id, original_filename, processed_filename, style, processing_time, pixels,
+                                 quality))
+
+    def log_user_activity(self, user_id: int, action: str, details: str = None):
+        with self._lock:
+            self.activity.append((user_id, action, details))
+
 
 class Database:
     """Handle all database operations"""
     
-    def __init__(self, db_path: str = None):
-        """Initialize database connection"""
+    def __init__(self, db_path: str = None, sqlite_mode: str = None):
+        """
+        Initialize database connection.
+        sqlite_mode (SQLite only): "wal" for WAL journaling, per-thread connections
+        and a single writer thread (see modules/sqlite_engine.py), "legacy" for a
+        rollback-journal connection per call.
+        """
         self.db_path = db_path or settings.DATABASE_PATH
         # Render may inject either DATABASE_URL or DATABASE_URI depending on the integration type.
         # Support both so the app works regardless of which one is set in the dashboard.
@@ -30,11 +93,21 @@ class Database:
         self.placeholder = "%s" if self.is_postgres else "?"
         self.bool_true = "TRUE" if self.is_postgres else "1"
         self.bool_false = "FALSE" if self.is_postgres else "0"
+        # Approximate gallery totals: (user_id, style) -> (count, computed_at)
+        self._gallery_totals: Dict[tuple, tuple] = {}
+        self._gallery_lock = threading.Lock()
         if self.is_postgres:
             print(f"✅ Database: PostgreSQL (Render)")
         else:
             # Ensure the SQLite data directory exists before connecting
             Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.sqlite_mode = (sqlite_mode or getattr(settings, "SQLITE_MODE", "wal")).lower()
+        if self.sqlite_mode not in ("wal", "legacy"):
+            raise ValueError(f"Unknown SQLite mode '{self.sqlite_mode}'. Use 'wal' or 'legacy'")
+        self.sqlite_engine = None
+        if not self.is_postgres:
+            if self.sqlite_mode == "wal":
+                self.sqlite_engine = SQLiteEngine(self.db_path)
             print(f"⚠️  Database: SQLite fallback at {self.db_path} — set DATABASE_URL or DATABASE_URI for production!")
         self.init_database()
 
@@ -85,103 +158,22 @@ class Database:
             
             # Final attempt without SSL tweak if nothing else worked
             return psycopg2.connect(url, cursor_factory=RealDictCursor)
+        elif self.sqlite_engine is not None:
+            return self.sqlite_engine.connection()
         else:
             conn = sqlite3.connect(self.db_path)
             conn.row_factory = sqlite3.Row
             return conn
     
-    def init_database(self):
-        """Initialize database tables"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Determine ID syntax
-        id_serial = "SERIAL PRIMARY KEY" if self.is_postgres else "INTEGER PRIMARY KEY AUTOINCREMENT"
-        
-        # Tables will be created if they don't exist below.
-        # Removed DROP TABLE logic to prevent production data loss.
-
-        # Users table
-        cursor.execute(f"""
-            CREATE TABLE IF NOT EXISTS users (
-                id {id_serial},
-                username VARCHAR(50) UNIQUE NOT NULL,
-                email VARCHAR(100) UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                full_name VARCHAR(100),
-                role VARCHAR(20) DEFAULT 'user',
-                created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-                last_login TIMESTAMP WITH TIME ZONE,
-                is_active BOOLEAN DEFAULT {self.bool_true},
-                is_verified BOOLEAN DEFAULT {self.bool_false},
-                last_logout TIMESTAMP WITH TIME ZONE,
-                last_active TIMESTAMP WITH TIME ZONE
-            )
-        """)
-        # Commit CREATE TABLE before running add_column migrations.
-        # Without this, a rollback() inside add_column (triggered by a missing
-        # column SELECT) would undo the CREATE TABLE on a fresh database.
-        conn.commit()
-
-        # Migration Helper
-        def add_column(table, column, type_def):
-            try:
-                cursor.execute(f"SELECT {column} FROM {table} LIMIT 1")
-            except Exception:
-                # Need a rollback if the select failed in Postgres
-                if self.is_postgres:
-                    conn.rollback()
-                print(f"🚀 Migrating {table}: Adding '{column}'...")
-                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {type_def}")
-                conn.commit()
-
-        add_column("users", "role", "VARCHAR(20) DEFAULT 'user'")
-        add_column("users", "last_logout", "TIMESTAMP WITH TIME ZONE")
-        add_column("users", "last_active", "TIMESTAMP WITH TIME ZONE")
-        add_column("users", "is_verified", f"BOOLEAN DEFAULT {self.bool_false}")
-        add_column("users", "auto_delete_days", "INTEGER DEFAULT 0") # 0 = Never
-        add_column("users", "failed_attempts", "INTEGER DEFAULT 0")
-        add_column("users", "lockout_until", "TIMESTAMP WITH TIME ZONE")
-        add_column("users", "plan", "VARCHAR(20) DEFAULT 'starter'")
-
-        # Create Default Admin User
-        try:
-            cursor.execute("SELECT id FROM users WHERE username = 'admin'")
-            admin_user = cursor.fetchone()
-            
-            if not admin_user:
-                import bcrypt
-                print("👤 Initializing System: Creating default administrator...")
-                pw = bcrypt.hashpw("admin123".encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-                cursor.execute(f"""
-                    INSERT INTO users (username, email, password_hash, full_name, role, is_verified)
-                    VALUES ({self.placeholder}, {self.placeholder}, {self.placeholder}, {self.placeholder}, {self.placeholder}, {self.placeholder})
-                """, ("admin", "admin@toonify.ai", pw, "System Admin", "admin", True if self.is_postgres else 1))
-                conn.commit()
-        except Exception as e:
-            print(f"⚠️ Admin creation skipped or failed: {e}")
-            if self.is_postgres: conn.rollback()
-        
-        # Other Tables with correct Postgres types
-        cursor.execute(f"CREATE TABLE IF NOT EXISTS verification_codes (id {id_serial}, email VARCHAR(100) NOT NULL, code VARCHAR(10) NOT NULL, created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP, expires_at TIMESTAMP WITH TIME ZONE NOT NULL)")
-        cursor.execute(f"CREATE TABLE IF NOT EXISTS transactions (id {id_serial}, user_id INTEGER NOT NULL, transaction_id VARCHAR(100) UNIQUE NOT NULL, amount DOUBLE PRECISION NOT NULL, currency VARCHAR(10) DEFAULT 'usd', status VARCHAR(30) DEFAULT 'pending', payment_method VARCHAR(50), image_filename TEXT, created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP)")
-        cursor.execute(f"CREATE TABLE IF NOT EXISTS processing_history (id {id_serial}, user_id INTEGER NOT NULL, original_filename TEXT NOT NULL, processed_filename TEXT NOT NULL, style VARCHAR(50) NOT NULL, processing_time DOUBLE PRECISION, created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP)")
-        cursor.execute(f"CREATE TABLE IF NOT EXISTS user_logs (id {id_serial}, user_id INTEGER NOT NULL, action VARCHAR(50) NOT NULL, details TEXT, created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP)")
-
-        conn.commit()
-
-        # Create Indexes for performance (Milestone 3 optimization)
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_history_user_id ON processing_history(user_id)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_history_filename ON processing_history(processed_filename)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_filename ON transactions(image_filename)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_user_id ON transactions(user_id)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_history_user_style ON processing_history(user_id, style)")
-
-        conn.commit()
-        conn.close()
+    def init_database(self) -> int:
+        """
+        Bring the schema up to date (see modules/migrations.py).
+        An up-to-date database costs one version read at startup.
+        """
+        return migrate(self)
     
     # User Operations
+    @_writes
     def create_user(self, username: str, email: str, password_hash: str, 
                    full_name: str = None) -> Optional[int]:
         """Create a new user"""
@@ -244,6 +236,7 @@ class Database:
         conn.close()
         return dict(user) if user else None
     
+    @_writes
     def update_last_login(self, user_id: int):
         """Update user's last login timestamp and log it"""
         conn = self.get_connection()
@@ -256,6 +249,7 @@ class Database:
         conn.close()
         self.log_user_activity(user_id, "login", "User signed into the platform")
 
+    @_writes
     def update_last_logout(self, user_id: int):
         """Update user's last logout timestamp and log it"""
         conn = self.get_connection()
@@ -268,6 +262,7 @@ class Database:
         conn.close()
         self.log_user_activity(user_id, "logout", "User signed out (Time-out)")
 
+    @_writes
     def update_last_active(self, user_id: int):
         """Silently update user's last activity heartbeat"""
         conn = self.get_connection()
@@ -279,6 +274,7 @@ class Database:
         conn.commit()
         conn.close()
 
+    @_writes
     def update_user_lockout(self, user_id: int, attempts: int, lockout_until: datetime = None):
         """Update failed login attempts and lockout timestamp"""
         conn = self.get_connection()
@@ -290,6 +286,7 @@ class Database:
         conn.commit()
         conn.close()
     
+    @_writes
     def log_user_activity(self, user_id: int, action: str, details: str = None):
         """Log user activity for admin monitoring"""
         conn = self.get_connection()
@@ -300,7 +297,58 @@ class Database:
         """, (user_id, action, details))
         conn.commit()
         conn.close()
+
+    def _insert_many(self, cursor, table: str, columns: tuple, rows: List[tuple]):
+        """Multi-row INSERT: execute_values on Postgres, executemany on SQLite"""
+        if not rows:
+            return
+        if self.is_postgres:
+            execute_values(cursor, f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s", rows)
+        else:
+            marks = ", ".join([self.placeholder] * len(columns))
+            cursor.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({marks})", rows)
+
+    @_writes
+    def log_user_activity_bulk(self, rows: List[tuple], cursor=None):
+        """Insert (user_id, action, details) rows in one statement (inside the caller's transaction when a cursor is given)"""
+        if cursor is None:
+            conn = self.get_connection()
+            try:
+                self.log_user_activity_bulk(rows, conn.cursor())
+                conn.commit()
+            finally:
+                conn.close()
+            return
+        self._insert_many(cursor, "user_logs", ("user_id", "action", "details"), rows)
+
+    @contextmanager
+    def unit_of_work(self):
+        """
+        Queue history and activity writes, then commit them together on exit:
+            with db.unit_of_work() as work:
+                work.add_processing_history(...)
+        Nothing is written if the block raises.
+        """
+        work = UnitOfWork()
+        yield work
+        if work.history or work.activity:
+            self._commit_unit_of_work(work)
+
+    @_writes
+    def _commit_unit_of_work(self, work: UnitOfWork):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            self.add_processing_history_bulk(work.history, cursor)
+            self.log_user_activity_bulk(work.activity, cursor)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
     
+    @_writes
     def update_user_profile(self, user_id: int, **kwargs):
         """Update user profile information"""
         allowed_fields = ['full_name', 'email']
@@ -309,7 +357,7 @@ class Database:
         if not updates:
             return False
         
-        set_clause = ", ".join([f"{k} = ?" for k in updates.keys()])
+        set_clause = ", ".join([f"{k} = {self.placeholder}" for k in updates.keys()])
         values = list(updates.values()) + [user_id]
         
         conn = self.get_connection()
@@ -319,6 +367,7 @@ class Database:
         conn.close()
         return True
     
+    @_writes
     def update_user_plan(self, user_id: int, plan: str) -> bool:
         """Update the subscription plan for a user"""
         allowed_plans = ['starter', 'pro', 'elite']
@@ -343,6 +392,7 @@ class Database:
             if conn:
                 conn.close()
 
+    @_writes
     def update_user_settings(self, user_id: int, auto_delete_days: int):
         """Update user privacy settings"""
         conn = self.get_connection()
@@ -353,6 +403,7 @@ class Database:
         conn.close()
         return True
 
+    @_writes
     def change_password(self, user_id: int, new_password_hash: str):
         """Update user password"""
         conn = self.get_connection()
@@ -364,32 +415,36 @@ class Database:
         return True
     
     # Transaction Operations
+    @_writes
     def create_transaction(self, user_id: int, transaction_id: str, 
                           amount: float, image_filename: str = None, 
                           payment_method: str = None) -> int:
-        """Create a new transaction record"""
+        """Create a new transaction record (Razorpay charges are in INR)"""
+        currency = 'inr' if payment_method == 'razorpay' else 'usd'
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute(f"""
             INSERT INTO transactions 
-            (user_id, transaction_id, amount, image_filename, payment_method)
-            VALUES ({self.placeholder}, {self.placeholder}, {self.placeholder}, {self.placeholder}, {self.placeholder})
-        """, (user_id, transaction_id, amount, image_filename, payment_method))
+            (user_id, transaction_id, amount, currency, image_filename, payment_method)
+            VALUES ({self.placeholder}, {self.placeholder}, {self.placeholder}, {self.placeholder}, {self.placeholder}, {self.placeholder})
+        """, (user_id, transaction_id, amount, currency, image_filename, payment_method))
         conn.commit()
         trans_id = cursor.lastrowid
         conn.close()
         return trans_id
 
-    def repair_legacy_razorpay_amounts(self) -> Dict:
+    @_writes
+    def repair_legacy_razorpay_amounts(self, cursor=None) -> Dict:
         """
         Repair legacy Razorpay rows saved with 0.33 and normalize currency.
-        Safe to call repeatedly.
+        Applied once as a schema migration (inside its transaction when a cursor
+        is given); safe to call repeatedly.
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        conn = None
+        if cursor is None:
+            conn = self.get_connection()
+            cursor = conn.cursor()
 
-        fixed_amount = 0
-        fixed_currency = 0
         try:
             cursor.execute(f"""
                 UPDATE transactions
@@ -408,29 +463,62 @@ class Database:
             """)
             fixed_currency = cursor.rowcount if cursor.rowcount is not None else 0
 
-            conn.commit()
+            if fixed_amount:
+                # Spend totals were materialized from the old amounts
+                self._drop_user_stats(cursor)
+            if conn is not None:
+                conn.commit()
         finally:
-            conn.close()
+            if conn is not None:
+                conn.close()
 
         return {
             "fixed_amount_rows": fixed_amount,
             "fixed_currency_rows": fixed_currency
         }
     
+    @_writes
     def update_transaction_status(self, transaction_id: str, status: str):
-        """Update transaction status"""
+        """
+        Update transaction status. Moving into or out of 'completed' adjusts the
+        owner's materialized spend; the conditional UPDATE makes repeated
+        completions (webhook plus client verify) count once.
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute(f"""
-            UPDATE transactions SET status = {self.placeholder}
-            WHERE transaction_id = {self.placeholder}
-        """, (status, transaction_id))
+        p = self.placeholder
+        if status == 'completed':
+            cursor.execute(f"""
+                UPDATE transactions SET status = {p}
+                WHERE transaction_id = {p} AND (status IS NULL OR status != 'completed')
+            """, (status, transaction_id))
+            direction = 1 if cursor.rowcount > 0 else 0
+        else:
+            cursor.execute(f"""
+                UPDATE transactions SET status = {p}
+                WHERE transaction_id = {p} AND status = 'completed'
+            """, (status, transaction_id))
+            direction = -1 if cursor.rowcount > 0 else 0
+            if not direction:
+                cursor.execute(f"UPDATE transactions SET status = {p} WHERE transaction_id = {p}",
+                               (status, transaction_id))
+        if direction:
+            cursor.execute(f"SELECT user_id, amount FROM transactions WHERE transaction_id = {p}", (transaction_id,))
+            row = cursor.fetchone()
+            self._lock_user_stats(cursor, row['user_id'])
+            cursor.execute(f"""
+                UPDATE user_stats
+                SET total_transactions = total_transactions + {p}, total_spent = total_spent + {p},
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE user_id = {p}
+            """, (direction, direction * float(row['amount']), row['user_id']))
+            if cursor.rowcount == 0:
+                self._rebuild_user_stats(cursor, row['user_id'])
         conn.commit()
         conn.close()
     
     def get_user_transactions(self, user_id: int) -> List[Dict]:
         """Get all transactions for a user"""
-        self.repair_legacy_razorpay_amounts()
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute(f"""
@@ -469,22 +557,67 @@ class Database:
         return dict(transaction) if transaction else None
     
     # Processing History Operations
+    @_writes
     def add_processing_history(self, user_id: int, original_filename: str,
                                processed_filename: str, style: str,
-                               processing_time: float = None) -> int:
-        """Add image processing history record"""
+                               processing_time: float = None, pixels: int = None,
+                               quality: str = None) -> int:
+        """Add image processing history record (quality is the render tier, for the cost model)"""
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute(f"""
             INSERT INTO processing_history 
-            (user_id, original_filename, processed_filename, style, processing_time)
-            VALUES ({self.placeholder}, {self.placeholder}, {self.placeholder}, {self.placeholder}, {self.placeholder})
-        """, (user_id, original_filename, processed_filename, style, processing_time))
-        conn.commit()
+            (user_id, original_filename, processed_filename, style, processing_time, pixels, quality)
+            VALUES ({self.placeholder}, {self.placeholder}, {self.placeholder}, {self.placeholder}, {self.placeholder}, {self.placeholder}, {self.placeholder})
+        """, (user_id, original_filename, processed_filename, style, processing_time, pixels, quality))
         history_id = cursor.lastrowid
+        self._count_style(cursor, user_id, style, 1)
+        self._count_quota(cursor, user_id, 1)
+        conn.commit()
         conn.close()
         return history_id
+
+    @_writes
+    def add_processing_history_bulk(self, rows: List[tuple], cursor=None):
+        """
+        Insert (user_id, original_filename, processed_filename, style, processing_time, pixels,
+        quality) rows in one statement, with one stats update per (user, style). Runs inside
+        the caller's transaction when a cursor is given.
+        """
+        if cursor is None:
+            conn = self.get_connection()
+            try:
+                self.add_processing_history_bulk(rows, conn.cursor())
+                conn.commit()
+            finally:
+                conn.close()
+            return
+        self._insert_many(cursor, "processing_history",
+                          ("user_id", "original_filename", "processed_filename", "style", "processing_time", "pixels",
+                           "quality"),
+                          rows)
+        # Sorted, so concurrent bulk inserts take the per-user stats locks in the same order
+        rebuilt = set()
+        for (user_id, style), count in sorted(Counter((row[0], row[3]) for row in rows).items()):
+            if user_id not in rebuilt and not self._count_style(cursor, user_id, style, count):
+                rebuilt.add(user_id)
+        for user_id, count in Counter(row[0] for row in rows).items():
+            self._count_quota(cursor, user_id, count)
     
+    def get_processing_time_samples(self, limit: int = 5000) -> List[Dict]:
+        """Get recent (style, quality, pixels, processing_time) samples for the cost model"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT style, quality, pixels, processing_time FROM processing_history
+            WHERE pixels IS NOT NULL AND processing_time IS NOT NULL
+            ORDER BY id DESC
+            LIMIT {self.placeholder}
+        """, (limit,))
+        samples = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        return samples
+
     def get_user_history(self, user_id: int, limit: int = 10) -> List[Dict]:
         """Get user's processing history"""
         conn = self.get_connection()
@@ -505,12 +638,10 @@ class Database:
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        # Base query with JOIN to check payment status
+        # Base query with the user's own payment status
         query = f"""
-            SELECT ph.*, 
-                   CASE WHEN t.status = 'completed' THEN 1 ELSE 0 END as is_paid
+            SELECT ph.*, {self._PAID_SQL} as is_paid
             FROM processing_history ph
-            LEFT JOIN transactions t ON ph.processed_filename = t.image_filename
             WHERE ph.user_id = {self.placeholder}
         """
         params = [user_id]
@@ -549,6 +680,106 @@ class Database:
             "offset": offset
         }
 
+    # Completed payment by the same user for a history row (one index probe per row)
+    _PAID_SQL = """CASE WHEN EXISTS (
+                SELECT 1 FROM transactions t
+                WHERE t.user_id = ph.user_id AND t.image_filename = ph.processed_filename
+                  AND t.status = 'completed'
+            ) THEN 1 ELSE 0 END"""
+
+    @staticmethod
+    def encode_cursor(created_at, row_id: int) -> str:
+        """Opaque keyset cursor for the (created_at, id) position of a row"""
+        if hasattr(created_at, 'isoformat'):
+            created_at = created_at.isoformat()
+        raw = f"{created_at}|{int(row_id)}".encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor_token: str) -> tuple:
+        """(created_at, id) of a keyset cursor; raises ValueError if malformed"""
+        try:
+            padded = cursor_token + '=' * (-len(cursor_token) % 4)
+            created_at, row_id = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8').rsplit('|', 1)
+            return created_at, int(row_id)
+        except Exception:
+            raise ValueError("Invalid cursor")
+
+    def _keyset_page(self, rows: List[Dict], limit: int) -> Dict:
+        """Page dict from limit + 1 rows ordered by (created_at DESC, id DESC)"""
+        page = {"items": rows[:limit], "next_cursor": None, "limit": limit}
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            page["next_cursor"] = self.encode_cursor(last['created_at'], last['id'])
+        return page
+
+    def _gallery_total(self, cursor, user_id: int, style: str = None) -> int:
+        """History count for the gallery, cached for GALLERY_TOTAL_TTL_SECONDS (approximate)"""
+        key = (user_id, style)
+        ttl = float(getattr(settings, "GALLERY_TOTAL_TTL_SECONDS", 300))
+        with self._gallery_lock:
+            cached = self._gallery_totals.get(key)
+        if cached and time.time() - cached[1] < ttl:
+            return cached[0]
+
+        query = f"SELECT COUNT(*) as total FROM processing_history WHERE user_id = {self.placeholder}"
+        params = [user_id]
+        if style:
+            query += f" AND style = {self.placeholder}"
+            params.append(style)
+        cursor.execute(query, tuple(params))
+        total = cursor.fetchone()['total']
+        with self._gallery_lock:
+            self._gallery_totals[key] = (total, time.time())
+        return total
+
+    def _forget_gallery_totals(self, user_id: int):
+        with self._gallery_lock:
+            for key in [key for key in self._gallery_totals if key[0] == user_id]:
+                del self._gallery_totals[key]
+
+    def get_gallery_page(self, user_id: int, limit: int = 24, cursor_token: str = None,
+                         style: str = None, include_total: bool = False) -> Dict:
+        """
+        One gallery page, newest first, with keyset pagination.
+        Each page seeks past the previous page's last (created_at, id) on
+        idx_history_user_created, so page N costs the same as page 1.
+        Raises ValueError for a malformed cursor.
+        Returns: {"items", "next_cursor" (None on the last page), "total" (cached, approximate)}
+        """
+        limit = max(1, min(int(limit), 100))
+        style = style if style and style != 'all' else None
+        position = self.decode_cursor(cursor_token) if cursor_token else None
+
+        query = f"""
+            SELECT ph.id, ph.original_filename, ph.processed_filename, ph.style,
+                   ph.processing_time, ph.created_at, {self._PAID_SQL} as is_paid
+            FROM processing_history ph
+            WHERE ph.user_id = {self.placeholder}
+        """
+        params = [user_id]
+        if style:
+            query += f" AND ph.style = {self.placeholder}"
+            params.append(style)
+        if position:
+            query += f" AND (ph.created_at, ph.id) < ({self.placeholder}, {self.placeholder})"
+            params.extend(position)
+        # One extra row tells whether another page follows
+        query += f" ORDER BY ph.created_at DESC, ph.id DESC LIMIT {self.placeholder}"
+        params.append(limit + 1)
+
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, tuple(params))
+            page = self._keyset_page([dict(row) for row in cursor.fetchall()], limit)
+            if include_total:
+                page["total"] = self._gallery_total(cursor, user_id, style)
+            return page
+        finally:
+            conn.close()
+
+    @_writes
     def delete_user_history(self, user_id: int, history_id: int = None):
         """Delete specific image or all history for a user. Returns list of filenames to delete physically."""
         conn = self.get_connection()
@@ -564,60 +795,239 @@ class Database:
         
         # Delete from DB
         if history_id:
+            cursor.execute(f"SELECT style FROM processing_history WHERE id = {self.placeholder} AND user_id = {self.placeholder}", (history_id, user_id))
+            row = cursor.fetchone()
             cursor.execute(f"DELETE FROM processing_history WHERE id = {self.placeholder} AND user_id = {self.placeholder}", (history_id, user_id))
+            if row and cursor.rowcount > 0:
+                self._count_style(cursor, user_id, row['style'], -1)
         else:
             cursor.execute(f"DELETE FROM processing_history WHERE user_id = {self.placeholder}", (user_id,))
+            self._rebuild_user_stats(cursor, user_id)
             
         conn.commit()
         conn.close()
+        self._forget_gallery_totals(user_id)
         return files
     
-    # Statistics
-    def get_user_stats(self, user_id: int) -> Dict:
-        """Get user statistics (High precision aggregate version)"""
+    # Style DNA Presets
+    @staticmethod
+    def _preset_row(row) -> Dict:
+        preset = dict(row)
+        preset['dna'] = json.loads(preset['dna'])
+        preset['is_public'] = bool(preset['is_public'])
+        return preset
+
+    @_writes
+    def create_dna_preset(self, owner_id: int, name: str, dna: Dict, is_public: bool = False) -> Optional[int]:
+        """Save a Style DNA preset; returns its id"""
         conn = self.get_connection()
         cursor = conn.cursor()
-        
-        stats = {
-            'total_processed': 0,
-            'total_transactions': 0,
-            'total_spent': 0.0,
-            'favorite_style': "None"
-        }
-
+        params = (owner_id, name, json.dumps(dna), bool(is_public) if self.is_postgres else int(bool(is_public)))
         try:
-            # 1. Total Processed count
-            cursor.execute(f"SELECT COUNT(*) FROM processing_history WHERE user_id = {self.placeholder}", (user_id,))
-            res = cursor.fetchone()
-            stats['total_processed'] = (res['count'] if self.is_postgres else res[0]) if res else 0
+            if self.is_postgres:
+                cursor.execute("""
+                    INSERT INTO style_dna_presets (owner_id, name, dna, is_public)
+                    VALUES (%s, %s, %s, %s)
+                    RETURNING id
+                """, params)
+                preset_id = cursor.fetchone()['id']
+            else:
+                cursor.execute("""
+                    INSERT INTO style_dna_presets (owner_id, name, dna, is_public)
+                    VALUES (?, ?, ?, ?)
+                """, params)
+                preset_id = cursor.lastrowid
+            conn.commit()
+            return preset_id
+        finally:
+            conn.close()
+
+    def get_dna_preset(self, preset_id: int, user_id: int) -> Optional[Dict]:
+        """Get a preset visible to user_id (own or public)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT * FROM style_dna_presets
+            WHERE id = {self.placeholder} AND (owner_id = {self.placeholder} OR is_public = {self.bool_true})
+        """, (preset_id, user_id))
+        row = cursor.fetchone()
+        conn.close()
+        return self._preset_row(row) if row else None
+
+    def list_dna_presets(self, user_id: int) -> List[Dict]:
+        """User's own presets followed by public presets from others"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT * FROM style_dna_presets
+            WHERE owner_id = {self.placeholder} OR is_public = {self.bool_true}
+            ORDER BY CASE WHEN owner_id = {self.placeholder} THEN 0 ELSE 1 END, created_at DESC, id DESC
+        """, (user_id, user_id))
+        presets = [self._preset_row(row) for row in cursor.fetchall()]
+        conn.close()
+        return presets
 
-            # 2. Transaction Stats (Completed only)
+    @_writes
+    def delete_dna_preset(self, preset_id: int, user_id: int, is_admin: bool = False) -> bool:
+        """Delete a preset owned by user_id (admins may delete any)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        if is_admin:
+            cursor.execute(f"DELETE FROM style_dna_presets WHERE id = {self.placeholder}", (preset_id,))
+        else:
             cursor.execute(f"""
-                SELECT COUNT(*) as count, COALESCE(SUM(amount), 0) as total 
-                FROM transactions 
-                WHERE user_id = {self.placeholder} AND status = 'completed'
-            """, (user_id,))
-            res = cursor.fetchone()
-            if res:
-                stats['total_transactions'] = res['count'] if self.is_postgres else res[0]
-                stats['total_spent'] = float(res['total'] if self.is_postgres else res[1])
+                DELETE FROM style_dna_presets WHERE id = {self.placeholder} AND owner_id = {self.placeholder}
+            """, (preset_id, user_id))
+        deleted = cursor.rowcount > 0
+        conn.commit()
+        conn.close()
+        return deleted
 
-            # 3. Favorite Style
+    # Statistics
+    def _lock_user_stats(self, cursor, user_id: int):
+        """
+        Serialize materialized stats writes for one user until commit, so a
+        rebuild's counts and a concurrent increment cannot interleave. Postgres
+        takes a transaction-scoped advisory lock; SQLite writes already hold the
+        database write lock, which a connection not yet in a transaction takes here.
+        """
+        if self.is_postgres:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s, %s)", (USER_STATS_LOCK_KEY, user_id))
+        elif not cursor.connection.in_transaction:
+            cursor.execute("BEGIN IMMEDIATE")
+
+    def _count_style(self, cursor, user_id: int, style: str, delta: int) -> bool:
+        """
+        Apply history inserts (+n) or a delete (-1) to the materialized stats.
+        A user without a user_stats row gets one built from history instead,
+        which already includes this change; returns False in that case.
+        """
+        p = self.placeholder
+        self._lock_user_stats(cursor, user_id)
+        cursor.execute(f"""
+            UPDATE user_stats SET total_processed = total_processed + {p}, updated_at = CURRENT_TIMESTAMP
+            WHERE user_id = {p}
+        """, (delta, user_id))
+        if cursor.rowcount == 0:
+            self._rebuild_user_stats(cursor, user_id)
+            return False
+        cursor.execute(f"""
+            INSERT INTO user_style_counts (user_id, style, image_count) VALUES ({p}, {p}, {p})
+            ON CONFLICT (user_id, style) DO UPDATE SET image_count = user_style_counts.image_count + excluded.image_count
+        """, (user_id, style, delta))
+        if delta > 0:
+            cursor.execute(f"SELECT image_count FROM user_style_counts WHERE user_id = {p} AND style = {p}",
+                           (user_id, style))
+            count = cursor.fetchone()['image_count']
             cursor.execute(f"""
-                SELECT style FROM processing_history 
-                WHERE user_id = {self.placeholder} 
-                GROUP BY style ORDER BY COUNT(*) DESC LIMIT 1
+                UPDATE user_stats SET favorite_style = {p}, favorite_count = {p}
+                WHERE user_id = {p} AND (favorite_count < {p} OR favorite_style = {p})
+            """, (style, count, user_id, count, style))
+        else:
+            cursor.execute(f"""
+                SELECT style, image_count FROM user_style_counts
+                WHERE user_id = {p} AND image_count > 0
+                ORDER BY image_count DESC, style LIMIT 1
             """, (user_id,))
-            res = cursor.fetchone()
-            if res:
-                stats['favorite_style'] = res['style'] if self.is_postgres else res[0]
+            row = cursor.fetchone()
+            cursor.execute(f"UPDATE user_stats SET favorite_style = {p}, favorite_count = {p} WHERE user_id = {p}",
+                           (row['style'] if row else None, row['image_count'] if row else 0, user_id))
+        return True
+
+    def _drop_user_stats(self, cursor):
+        """Forget every user's materialized stats; each row is rebuilt on that user's next write"""
+        for table in ("user_stats", "user_style_counts"):
+            cursor.execute(f"DELETE FROM {table}")
+
+    def _aggregate_user_stats(self, cursor, user_id: int):
+        """Stats computed from history and transactions: (per-style counts, user_stats row)"""
+        p = self.placeholder
+        cursor.execute(f"""
+            SELECT style, COUNT(*) as image_count FROM processing_history
+            WHERE user_id = {p} GROUP BY style
+        """, (user_id,))
+        styles = [(row['style'], row['image_count']) for row in cursor.fetchall()]
+        cursor.execute(f"""
+            SELECT COUNT(*) as count, COALESCE(SUM(amount), 0) as total
+            FROM transactions
+            WHERE user_id = {p} AND status = 'completed'
+        """, (user_id,))
+        spend = cursor.fetchone()
+        favorite = min(styles, key=lambda item: (-item[1], item[0])) if styles else (None, 0)
+        return styles, (user_id, sum(count for _, count in styles), spend['count'], float(spend['total']),
+                        favorite[0], favorite[1])
+
+    def _rebuild_user_stats(self, cursor, user_id: int) -> tuple:
+        """Recompute a user's materialized stats inside the caller's transaction"""
+        p = self.placeholder
+        # Counted under the lock, so no concurrent increment is lost between the count and the write
+        self._lock_user_stats(cursor, user_id)
+        styles, row = self._aggregate_user_stats(cursor, user_id)
+        cursor.execute(f"DELETE FROM user_style_counts WHERE user_id = {p}", (user_id,))
+        for style, count in styles:
+            cursor.execute(f"INSERT INTO user_style_counts (user_id, style, image_count) VALUES ({p}, {p}, {p})",
+                           (user_id, style, count))
+        cursor.execute(f"""
+            INSERT INTO user_stats
+            (user_id, total_processed, total_transactions, total_spent, favorite_style, favorite_count)
+            VALUES ({p}, {p}, {p}, {p}, {p}, {p})
+            ON CONFLICT (user_id) DO UPDATE SET
+                total_processed = excluded.total_processed,
+                total_transactions = excluded.total_transactions,
+                total_spent = excluded.total_spent,
+                favorite_style = excluded.favorite_style,
+                favorite_count = excluded.favorite_count,
+                updated_at = CURRENT_TIMESTAMP
+        """, row)
+        return row
+
+    @staticmethod
+    def _stats_dict(row) -> Dict:
+        return {
+            'total_processed': row[1],
+            'total_transactions': row[2],
+            'total_spent': row[3],
+            'favorite_style': row[4] or "None"
+        }
+
+    @_writes
+    def rebuild_user_stats(self, user_id: int) -> Dict:
+        """Recompute a user's materialized stats from history and transactions"""
+        conn = self.get_connection()
+        try:
+            row = self._rebuild_user_stats(conn.cursor(), user_id)
+            conn.commit()
+        finally:
+            conn.close()
+        return self._stats_dict(row)
 
+    def get_user_stats(self, user_id: int) -> Dict:
+        """
+        Get user statistics: one primary-key read of the materialized user_stats row.
+        A user without a row yet (it is built on their next write) gets stats
+        computed from history without storing them, so reads never write.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"""
+                SELECT total_processed, total_transactions, total_spent, favorite_style
+                FROM user_stats WHERE user_id = {self.placeholder}
+            """, (user_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return self._stats_dict(self._aggregate_user_stats(cursor, user_id)[1])
         except Exception as e:
             print(f"ERROR calculating user stats: {e}")
+            return {'total_processed': 0, 'total_transactions': 0, 'total_spent': 0.0, 'favorite_style': "None"}
         finally:
             conn.close()
-
-        return stats
+        return {
+            'total_processed': row['total_processed'],
+            'total_transactions': row['total_transactions'],
+            'total_spent': float(row['total_spent']),
+            'favorite_style': row['favorite_style'] or "None"
+        }
 
     def get_user_usage_24h(self, user_id: int) -> int:
         """Count how many images a user processed in the last 24 hours"""
@@ -633,7 +1043,102 @@ class Database:
         conn.close()
         return count
 
+    def get_hourly_usage(self, hours: int = 24) -> List[Dict]:
+        """Per-user processing counts in hourly (epoch hour) buckets over the last hours"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        oldest = int(time.time() // QUOTA_BUCKET_SECONDS) - int(hours) + 1
+        cursor.execute(f"SELECT user_id, bucket, uses FROM quota_buckets WHERE bucket >= {self.placeholder}",
+                       (oldest,))
+        rows = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        return rows
+
+    def _count_quota(self, cursor, user_id: int, uses: int):
+        """Add history inserts to the user's current quota bucket (in the insert's transaction)"""
+        p = self.placeholder
+        cursor.execute(f"""
+            INSERT INTO quota_buckets (user_id, bucket, uses) VALUES ({p}, {p}, {p})
+            ON CONFLICT (user_id, bucket) DO UPDATE SET uses = quota_buckets.uses + excluded.uses
+        """, (user_id, int(time.time() // QUOTA_BUCKET_SECONDS), uses))
+
+    @_writes
+    def prune_quota_buckets(self, hours: int = 24) -> int:
+        """Delete quota buckets that have left the window; returns rows deleted"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        oldest = int(time.time() // QUOTA_BUCKET_SECONDS) - int(hours) + 1
+        cursor.execute(f"DELETE FROM quota_buckets WHERE bucket < {self.placeholder}", (oldest,))
+        deleted = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return deleted
+
+    @_writes
+    def reserve_quota(self, user_id: int, amount: int, limit: int, window_hours: int = 24,
+                      stale_seconds: int = 600) -> bool:
+        """
+        Reserve amount units if usage in the window plus live reservations plus
+        amount stays within limit. Usage is the sum of the user's hourly
+        quota_buckets (at most window_hours rows), read after the user's
+        quota_reservations row is locked, so reservations from every worker
+        process are serialized. Reservations untouched for stale_seconds (a
+        worker that died mid-request) no longer count.
+        """
+        now = datetime.utcnow()
+        fmt = '%Y-%m-%d %H:%M:%S'
+        oldest = int(time.time() // QUOTA_BUCKET_SECONDS) - int(window_hours) + 1
+        stale = (now - timedelta(seconds=int(stale_seconds))).strftime(fmt)
+        p = self.placeholder
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"""
+                INSERT INTO quota_reservations (user_id, reserved, reserved_at) VALUES ({p}, 0, {p})
+                ON CONFLICT (user_id) DO NOTHING
+            """, (user_id, now.strftime(fmt)))
+            # The insert already holds SQLite's write lock; Postgres needs the row lock
+            lock_sql = " FOR UPDATE" if self.is_postgres else ""
+            cursor.execute(f"""
+                SELECT CASE WHEN reserved_at < {p} THEN 0 ELSE reserved END as live
+                FROM quota_reservations WHERE user_id = {p}{lock_sql}
+            """, (stale, user_id))
+            live = cursor.fetchone()['live']
+            cursor.execute(f"DELETE FROM quota_buckets WHERE user_id = {p} AND bucket < {p}", (user_id, oldest))
+            cursor.execute(f"""
+                SELECT COALESCE(SUM(uses), 0) as used FROM quota_buckets
+                WHERE user_id = {p} AND bucket >= {p}
+            """, (user_id, oldest))
+            used = cursor.fetchone()['used']
+            if used + live + amount > limit:
+                conn.rollback()
+                return False
+            cursor.execute(f"""
+                UPDATE quota_reservations SET reserved = {p}, reserved_at = {p} WHERE user_id = {p}
+            """, (live + amount, now.strftime(fmt), user_id))
+            conn.commit()
+            return True
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    @_writes
+    def release_quota(self, user_id: int, amount: int):
+        """Hand back units reserved by reserve_quota (used units are in quota_buckets by now)"""
+        p = self.placeholder
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            UPDATE quota_reservations SET reserved = CASE WHEN reserved > {p} THEN reserved - {p} ELSE 0 END
+            WHERE user_id = {p}
+        """, (amount, amount, user_id))
+        conn.commit()
+        conn.close()
+
     # Verification Operations
+    @_writes
     def store_verification_code(self, email: str, code: str, expires_at: datetime):
         """Store a verification code for an email"""
         conn = self.get_connection()
@@ -660,6 +1165,7 @@ class Database:
         conn.close()
         return dict(row) if row else None
 
+    @_writes
     def verify_user_email(self, email: str):
         """Mark a user as verified"""
         conn = self.get_connection()
@@ -670,6 +1176,7 @@ class Database:
         conn.commit()
         conn.close()
 
+    @_writes
     def cleanup_old_history(self, user_id: int):
         """Delete history older than the user's auto_delete_days setting"""
         user = self.get_user_by_id(user_id)
@@ -691,44 +1198,215 @@ class Database:
         
         if files:
             cursor.execute(f"DELETE FROM processing_history WHERE user_id = {self.placeholder} AND created_at < {interval_sql}", (user_id,))
+            self._rebuild_user_stats(cursor, user_id)
             conn.commit()
+            self._forget_gallery_totals(user_id)
             
         conn.close()
         return files
 
+    # Background Job Operations
+    @_writes
+    def create_job(self, job_id: str, owner_id: int = None):
+        """Record a queued background job (visible to every worker process)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            INSERT INTO jobs (id, owner_id, status, created_at)
+            VALUES ({self.placeholder}, {self.placeholder}, 'queued', {self.placeholder})
+        """, (job_id, owner_id, time.time()))
+        conn.commit()
+        conn.close()
+
+    @_writes
+    def update_job(self, job_id: str, status: str, result: Dict = None, error: str = None,
+                   finished_at: float = None):
+        """Set a job's status, and its JSON result or error once it finishes"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            UPDATE jobs SET status = {self.placeholder}, result = {self.placeholder},
+                            error = {self.placeholder}, finished_at = {self.placeholder}
+            WHERE id = {self.placeholder}
+        """, (status, json.dumps(result) if result is not None else None, error, finished_at, job_id))
+        conn.commit()
+        conn.close()
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """A job's state with its result decoded, or None if unknown"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT * FROM jobs WHERE id = {self.placeholder}", (job_id,))
+        row = cursor.fetchone()
+        conn.close()
+        if not row:
+            return None
+        job = dict(row)
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    @_writes
+    def prune_jobs(self, retention_seconds: int) -> List[str]:
+        """
+        Delete jobs finished (or created, if never finished) more than retention_seconds ago.
+        Returns the deleted job ids.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT id FROM jobs WHERE COALESCE(finished_at, created_at) < {self.placeholder}",
+                       (time.time() - retention_seconds,))
+        expired = [row['id'] for row in cursor.fetchall()]
+        for start in range(0, len(expired), 500):
+            chunk = expired[start:start + 500]
+            cursor.execute(f"DELETE FROM jobs WHERE id IN ({', '.join([self.placeholder] * len(chunk))})", chunk)
+        conn.commit()
+        conn.close()
+        return expired
+
     # --- ADMIN DASHBOARD OPERATIONS ---
+    @_writes
+    def refresh_admin_rollups(self, lookback_days: int = None) -> int:
+        """
+        Recompute admin_daily_rollups (creations, revenue, active and new users per
+        UTC day) from the base tables. lookback_days limits the refresh to the
+        most recent days; None rebuilds every day.
+        user_logs is pruned, so for days up to the oldest remaining log the stored
+        active_users count is kept unless the logs now show more.
+        Returns the number of days written.
+        """
+        day_sql = "TO_CHAR(created_at AT TIME ZONE 'UTC', 'YYYY-MM-DD')" if self.is_postgres else "DATE(created_at)"
+        since = None
+        if lookback_days is not None:
+            since = (datetime.utcnow().date() - timedelta(days=max(0, int(lookback_days)))).isoformat()
+        revenue_filter = ("status = 'completed' AND (payment_method != 'razorpay' "
+                          "OR payment_method IS NULL OR transaction_id LIKE 'pay_%')")
+        sources = (
+            ("creations", "processing_history", "COUNT(*)", None),
+            ("revenue", "transactions", "COALESCE(SUM(amount), 0)", revenue_filter),
+            ("active_users", "user_logs", "COUNT(DISTINCT user_id)", None),
+            ("new_users", "users", "COUNT(*)", None),
+        )
+
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        days: Dict[str, Dict] = {}
+        try:
+            for column, table, value_sql, condition in sources:
+                conditions = [condition] if condition else []
+                if since:
+                    conditions.append(f"created_at >= {self.placeholder}")
+                where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+                cursor.execute(f"SELECT {day_sql} as day, {value_sql} as value FROM {table} {where} GROUP BY {day_sql}",
+                               (since,) if since else ())
+                for row in cursor.fetchall():
+                    if row['day']:
+                        days.setdefault(str(row['day']), {})[column] = row['value']
+
+            cursor.execute(f"SELECT {day_sql} as day FROM user_logs ORDER BY created_at LIMIT 1")
+            oldest_log = cursor.fetchone()
+            conditions, params = [], []
+            if oldest_log and oldest_log['day']:
+                conditions.append(f"day <= {self.placeholder}")
+                params.append(str(oldest_log['day']))
+            if since:
+                conditions.append(f"day >= {self.placeholder}")
+                params.append(since)
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            cursor.execute(f"SELECT day, active_users FROM admin_daily_rollups {where}", tuple(params))
+            for row in cursor.fetchall():
+                values = days.setdefault(str(row['day']), {})
+                values['active_users'] = max(values.get('active_users', 0), row['active_users'] or 0)
+
+            if since:
+                cursor.execute(f"DELETE FROM admin_daily_rollups WHERE day >= {self.placeholder}", (since,))
+            else:
+                cursor.execute("DELETE FROM admin_daily_rollups")
+            for day, values in sorted(days.items()):
+                cursor.execute(f"""
+                    INSERT INTO admin_daily_rollups (day, creations, revenue, active_users, new_users)
+                    VALUES ({self.placeholder}, {self.placeholder}, {self.placeholder}, {self.placeholder}, {self.placeholder})
+                """, (day, values.get('creations', 0), float(values.get('revenue', 0) or 0),
+                      values.get('active_users', 0), values.get('new_users', 0)))
+            conn.commit()
+        finally:
+            conn.close()
+        return len(days)
+
+    def get_admin_rollups(self, days: int = 30) -> List[Dict]:
+        """Daily rollup rows for the last `days` days, oldest first"""
+        since = (datetime.utcnow().date() - timedelta(days=max(0, int(days) - 1))).isoformat()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT day, creations, revenue, active_users, new_users
+            FROM admin_daily_rollups
+            WHERE day >= {self.placeholder}
+            ORDER BY day
+        """, (since,))
+        rows = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        return rows
+
     def get_admin_dashboard_stats(self) -> Dict:
-        """Get global stats for admin dashboard"""
-        self.repair_legacy_razorpay_amounts()
+        """Global totals for the admin dashboard, summed from the daily rollups"""
         conn = self.get_connection()
         cursor = conn.cursor()
-        
-        cursor.execute("SELECT COUNT(*) as total FROM users")
-        total_users = cursor.fetchone()['total']
-        
-        cursor.execute("SELECT COUNT(*) as total FROM processing_history")
-        total_creations = cursor.fetchone()['total']
+        cursor.execute("SELECT COUNT(*) as days FROM admin_daily_rollups")
+        if not cursor.fetchone()['days']:
+            # Built on first use; AdminAnalytics keeps them fresh afterwards
+            conn.close()
+            self.refresh_admin_rollups()
+            conn = self.get_connection()
+            cursor = conn.cursor()
 
         cursor.execute("""
-            SELECT COALESCE(SUM(amount), 0) as total
-            FROM transactions
-            WHERE status = 'completed'
-              AND (payment_method != 'razorpay' OR payment_method IS NULL OR transaction_id LIKE 'pay_%')
+            SELECT COALESCE(SUM(new_users), 0) as users,
+                   COALESCE(SUM(creations), 0) as creations,
+                   COALESCE(SUM(revenue), 0) as revenue
+            FROM admin_daily_rollups
         """)
-        total_revenue = cursor.fetchone()['total']
-        
+        totals = cursor.fetchone()
+
         interval_sql = "NOW() - INTERVAL '24 HOURS'" if self.is_postgres else "datetime('now', '-24 hours')"
         cursor.execute(f"SELECT COUNT(*) as total FROM users WHERE last_login >= {interval_sql}")
         active_today = cursor.fetchone()['total']
-        
+
         conn.close()
         return {
-            "total_users": total_users,
-            "total_creations": total_creations,
-            "total_revenue": total_revenue,
+            "total_users": int(totals['users']),
+            "total_creations": int(totals['creations']),
+            "total_revenue": float(totals['revenue']),
             "active_today": active_today
         }
 
+    def prune_activity_logs(self, retention_days: int, chunk_size: int = 5000) -> int:
+        """
+        Delete user_logs older than retention_days, chunk_size rows per transaction
+        so a large backlog never holds a long write lock. Returns rows deleted.
+        """
+        cutoff = (datetime.utcnow() - timedelta(days=int(retention_days))).strftime('%Y-%m-%d %H:%M:%S')
+        deleted = 0
+        while True:
+            count = self._prune_activity_logs_chunk(cutoff, chunk_size)
+            deleted += count
+            if count < chunk_size:
+                return deleted
+
+    @_writes
+    def _prune_activity_logs_chunk(self, cutoff: str, chunk_size: int) -> int:
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"""
+                DELETE FROM user_logs WHERE id IN (
+                    SELECT id FROM user_logs WHERE created_at < {self.placeholder} LIMIT {self.placeholder}
+                )
+            """, (cutoff, chunk_size))
+            conn.commit()
+            return cursor.rowcount or 0
+        finally:
+            conn.close()
+
     def get_recent_activity_logs(self, limit: int = 50) -> List[Dict]:
         """Get latest user logs for admin"""
         conn = self.get_connection()
@@ -760,37 +1438,84 @@ class Database:
         conn.close()
         return logs
 
-    def get_all_transactions_admin(self) -> List[Dict]:
-        """Get all transactions with user details"""
-        self.repair_legacy_razorpay_amounts()
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT t.*, u.username, u.email 
+    def list_transactions_admin(self, limit: int = 50, cursor_token: str = None) -> Dict:
+        """
+        One page of transactions with user details, newest first, keyset-paginated
+        on idx_transactions_created. Raises ValueError for a malformed cursor.
+        Returns: {"items", "next_cursor" (None on the last page), "limit"}
+        """
+        limit = max(1, min(int(limit), 200))
+        position = self.decode_cursor(cursor_token) if cursor_token else None
+        query = """
+            SELECT t.*, u.username, u.email
             FROM transactions t
             JOIN users u ON t.user_id = u.id
             WHERE (t.payment_method != 'razorpay' OR t.payment_method IS NULL OR t.transaction_id LIKE 'pay_%')
-            ORDER BY t.created_at DESC
-        """)
-        transactions = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return transactions
+        """
+        params = []
+        if position:
+            query += f" AND (t.created_at, t.id) < ({self.placeholder}, {self.placeholder})"
+            params.extend(position)
+        query += f" ORDER BY t.created_at DESC, t.id DESC LIMIT {self.placeholder}"
+        params.append(limit + 1)
 
-    def get_all_users_admin(self) -> List[Dict]:
-        """Get all users with their summary stats"""
-        self.repair_legacy_razorpay_amounts()
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT u.*, 
-                   (SELECT COUNT(*) FROM processing_history WHERE user_id = u.id) as total_creations,
-                   (SELECT COALESCE(SUM(amount), 0) FROM transactions WHERE user_id = u.id AND status = 'completed' AND (payment_method != 'razorpay' OR payment_method IS NULL OR transaction_id LIKE 'pay_%')) as total_spent
-            FROM users u
-            ORDER BY u.created_at DESC
-        """)
-        users = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return users
+        try:
+            cursor.execute(query, tuple(params))
+            return self._keyset_page([dict(row) for row in cursor.fetchall()], limit)
+        finally:
+            conn.close()
+
+    def list_users_admin(self, limit: int = 50, cursor_token: str = None) -> Dict:
+        """
+        One page of users with their creation count and spend, newest first,
+        keyset-paginated on idx_users_created. The totals are two grouped
+        queries over the page's user ids. Raises ValueError for a malformed cursor.
+        Returns: {"items", "next_cursor" (None on the last page), "limit"}
+        """
+        limit = max(1, min(int(limit), 200))
+        position = self.decode_cursor(cursor_token) if cursor_token else None
+        query = """
+            SELECT id, username, email, full_name, role, plan, is_active, is_verified,
+                   created_at, last_login, last_logout, last_active, auto_delete_days,
+                   failed_attempts, lockout_until
+            FROM users
+        """
+        params = []
+        if position:
+            query += f" WHERE (created_at, id) < ({self.placeholder}, {self.placeholder})"
+            params.extend(position)
+        query += f" ORDER BY created_at DESC, id DESC LIMIT {self.placeholder}"
+        params.append(limit + 1)
+
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, tuple(params))
+            page = self._keyset_page([dict(row) for row in cursor.fetchall()], limit)
+            user_ids = [user['id'] for user in page['items']]
+            creations, spent = {}, {}
+            if user_ids:
+                marks = ", ".join([self.placeholder] * len(user_ids))
+                cursor.execute(f"""
+                    SELECT user_id, COUNT(*) as total FROM processing_history
+                    WHERE user_id IN ({marks}) GROUP BY user_id
+                """, tuple(user_ids))
+                creations = {row['user_id']: row['total'] for row in cursor.fetchall()}
+                cursor.execute(f"""
+                    SELECT user_id, COALESCE(SUM(amount), 0) as total FROM transactions
+                    WHERE user_id IN ({marks}) AND status = 'completed'
+                      AND (payment_method != 'razorpay' OR payment_method IS NULL OR transaction_id LIKE 'pay_%')
+                    GROUP BY user_id
+                """, tuple(user_ids))
+                spent = {row['user_id']: row['total'] for row in cursor.fetchall()}
+            for user in page['items']:
+                user['total_creations'] = creations.get(user['id'], 0)
+                user['total_spent'] = float(spent.get(user['id'], 0))
+            return page
+        finally:
+            conn.close()
 
 
 # Global database instance
@@ -3,23 +3,56 @@ Image processing module using OpenCV
 Implements various cartoon and artistic effects
 """
 import os
+import shutil
+import subprocess
+import tempfile
 import cv2
 import numpy as np
 from PIL import Image
 import io
 from typing import Tuple, Optional
 import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 import config.settings as settings
+from modules.buffer_arena import get_arena
+from modules.compositing import apply_vignette, composite
+from modules.animation import animator
+from modules.backgrounds import background_registry
+from modules.quality import QUALITY_PRESETS, resolve_quality
+from modules.segmentation import segmenter
+from modules.style_dna import style_dna
+from modules.style_graph import RenderContext, style_graph
 
 
 class ImageProcessor:
     """Handle all image processing operations"""
+
+    # Styles expensive enough to run on a reduced internal frame in fast mode
+    HEAVY_STYLES = {"cartoon", "oil_painting", "watercolor", "anime", "ghibli", "comic_book"}
     
     def __init__(self):
         """Initialize image processor with default parameters"""
         self.params = settings.CARTOON_PARAMS
         self.fast_processing = getattr(settings, "FAST_PROCESSING", True)
         self.fast_style_max_width = max(480, int(getattr(settings, "FAST_STYLE_MAX_WIDTH", 960)))
+        self.style_graph = style_graph
+        self.segmenter = segmenter
+        self.backgrounds = background_registry
+        self.animator = animator
+        self.style_dna = style_dna
+        self.quality_presets = QUALITY_PRESETS
+        node_budget = float(getattr(settings, "STYLE_GRAPH_NODE_BUDGET", 0))
+        self.render_contexts = {
+            tier: RenderContext(
+                quantize=partial(self._quantize_colors, method=preset["quantizer"],
+                                 iterations=preset["kmeans_iterations"]),
+                node_budget=node_budget,
+                quality=tier
+            )
+            for tier, preset in self.quality_presets.items()
+        }
+        self.render_context = self.render_contexts["standard"]
         # OpenCV global runtime tuning for low-latency processing.
         cv2.setUseOptimized(True)
         cv2.setNumThreads(max(1, int(getattr(settings, "OPENCV_NUM_THREADS", 4))))
@@ -91,223 +124,81 @@ class ImageProcessor:
         except Exception:
             return {"brightness": 0, "contrast": 0, "colors": {"r": 33, "g": 33, "b": 34}}
     
+    def render_styles(self, image: np.ndarray, styles: list, quality: str = "standard") -> dict:
+        """
+        Render styles from one frame through the style graph at a quality tier.
+        Nodes shared between the styles (gray, blurs, smooths, edges) run once.
+        Unknown style keys fall back to Classic Cartoon.
+        Returns: {style: processed_image}
+        """
+        known = set(self.style_graph.styles)
+        graph_styles = {style: style if style in known else "cartoon" for style in styles}
+        rendered = self.style_graph.run(image, list(dict.fromkeys(graph_styles.values())),
+                                        self.render_contexts[quality])
+        return {style: rendered[graph_style] for style, graph_style in graph_styles.items()}
+
+    def _render_style(self, image: np.ndarray, style: str, quality: str = "standard") -> np.ndarray:
+        return self.render_styles(image, [style], quality)[style]
+
     def apply_classic_cartoon(self, image: np.ndarray) -> np.ndarray:
         """
         Apply high-fidelity cartoon effect with sharp edges
         Resolution-aware scaling for consistent results
         """
-        h, w = image.shape[:2]
-        # Base scale factor (standardized to 1280px width)
-        scale_factor = w / 1280.0
-        
-        # Step 1: Smoothing while preserving edges
-        smooth = cv2.edgePreservingFilter(image, flags=1, sigma_s=60, sigma_r=0.4)
-        
-        # Step 2: Edge detection (Resolution-Aware)
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        gray = cv2.medianBlur(gray, 5)
-        
-        # Scale blockSize for higher resolutions (must be odd)
-        block_size = int(9 * scale_factor)
-        if block_size % 2 == 0: block_size += 1
-        block_size = max(3, block_size)
-        
-        edges = cv2.adaptiveThreshold(
-            gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-            cv2.THRESH_BINARY, blockSize=block_size, C=2
-        )
-        
-        # Step 3: Color quantization (Reduced colors for stronger cartoon feel)
-        quantized = self._quantize_colors(smooth, num_colors=8)
-        
-        # Step 4: Merge edges
-        edges_colored = cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)
-        cartoon = cv2.bitwise_and(quantized, edges_colored)
-        
-        # Step 5: Boost saturation for that "Pixar" look
-        hsv = cv2.cvtColor(cartoon, cv2.COLOR_BGR2HSV)
-        hsv[:, :, 1] = np.clip(hsv[:, :, 1] * 1.2, 0, 255)
-        cartoon = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
-        
-        return cartoon
+        return self._render_style(image, "cartoon")
     
     def apply_sketch_effect(self, image: np.ndarray) -> np.ndarray:
         """
         Apply pencil sketch effect
         Creates a grayscale sketch-like image
         """
-        # Convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
-        # Invert the grayscale image
-        inverted = cv2.bitwise_not(gray)
-        
-        # Apply Gaussian blur
-        blurred = cv2.GaussianBlur(inverted, (21, 21), 0)
-        
-        # Invert the blurred image
-        inverted_blur = cv2.bitwise_not(blurred)
-        
-        # Create sketch by dividing grayscale by inverted blur
-        sketch = cv2.divide(gray, inverted_blur, scale=256.0)
-        
-        # Convert back to BGR for consistency
-        sketch_bgr = cv2.cvtColor(sketch, cv2.COLOR_GRAY2BGR)
-        
-        return sketch_bgr
+        return self._render_style(image, "sketch")
     
     def apply_pencil_color(self, image: np.ndarray) -> np.ndarray:
         """
         Apply colored pencil sketch effect
         Uses OpenCV's pencilSketch function
         """
-        # Apply pencil sketch (returns sketch and color sketch)
-        _, color_sketch = cv2.pencilSketch(
-            image,
-            sigma_s=60,
-            sigma_r=0.07,
-            shade_factor=0.05
-        )
-        
-        return color_sketch
+        return self._render_style(image, "pencil_color")
     
     def apply_oil_painting(self, image: np.ndarray) -> np.ndarray:
         """
         Apply a dramatic "Oil Master" painting effect
         """
-        # Step 1: Base stylization
-        stylized = cv2.stylization(image, sigma_s=100, sigma_r=0.45)
-        
-        # Step 2: Enhance textures with another pass
-        smooth = cv2.edgePreservingFilter(stylized, flags=1, sigma_s=60, sigma_r=0.4)
-        
-        # Step 3: Immersive Color Boost
-        hsv = cv2.cvtColor(smooth, cv2.COLOR_BGR2HSV)
-        hsv[:, :, 1] = np.clip(hsv[:, :, 1] * 1.3, 0, 255) # Deep Saturation
-        hsv[:, :, 2] = np.clip(hsv[:, :, 2] * 1.1, 0, 255) # Brightness
-        oil = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
-        
-        return oil
+        return self._render_style(image, "oil_painting")
     
     def apply_watercolor(self, image: np.ndarray) -> np.ndarray:
         """
         Apply watercolor painting effect with soft edges and vibrant colors
         """
-        # Step 1: Apply stylization for watercolor base
-        watercolor = cv2.stylization(image, sigma_s=60, sigma_r=0.6)
-        
-        # Step 2: Apply bilateral filter for smoothness (Switching to edgePreservingFilter)
-        smooth = cv2.edgePreservingFilter(watercolor, flags=1, sigma_s=50, sigma_r=0.3)
-        
-        # Step 3: Enhance colors
-        hsv = cv2.cvtColor(smooth, cv2.COLOR_BGR2HSV)
-        hsv[:, :, 1] = np.clip(hsv[:, :, 1] * 1.4, 0, 255)  # Increase saturation
-        hsv[:, :, 2] = np.clip(hsv[:, :, 2] * 1.05, 0, 255)  # Slight brightness boost
-        result = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
-        
-        return result
+        return self._render_style(image, "watercolor")
     
     def apply_pop_art(self, image: np.ndarray) -> np.ndarray:
         """
         Apply Andy Warhol-style pop art effect with bold colors
         """
-        # Step 1: Reduce to fewer colors (posterization)
-        quantized = self._quantize_colors(image, num_colors=6)
-        
-        # Step 2: Detect edges
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        edges = cv2.Canny(gray, 100, 200)
-        edges = cv2.dilate(edges, np.ones((2, 2), np.uint8), iterations=1)
-        
-        # Step 3: Boost saturation dramatically
-        hsv = cv2.cvtColor(quantized, cv2.COLOR_BGR2HSV)
-        hsv[:, :, 1] = np.clip(hsv[:, :, 1] * 1.8, 0, 255)  # High saturation
-        hsv[:, :, 2] = np.clip(hsv[:, :, 2] * 1.2, 0, 255)  # Brightness
-        pop = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
-        
-        # Step 4: Add black edges
-        edges_colored = cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)
-        edges_colored = cv2.bitwise_not(edges_colored)
-        result = cv2.bitwise_and(pop, edges_colored)
-        
-        return result
+        return self._render_style(image, "pop_art")
     
     def apply_vintage(self, image: np.ndarray) -> np.ndarray:
         """
         Apply vintage/retro photo effect with sepia tones and vignette
         """
-        # Step 1: Apply sepia tone
-        kernel = np.array([[0.272, 0.534, 0.131],
-                          [0.349, 0.686, 0.168],
-                          [0.393, 0.769, 0.189]])
-        sepia = cv2.transform(image, kernel)
-        sepia = np.clip(sepia, 0, 255).astype(np.uint8)
-        
-        # Step 2: Add slight blur for dreamy effect
-        vintage = cv2.GaussianBlur(sepia, (3, 3), 0)
-        
-        # Step 3: Create vignette effect
-        rows, cols = vintage.shape[:2]
-        X_resultant_kernel = cv2.getGaussianKernel(cols, cols/2)
-        Y_resultant_kernel = cv2.getGaussianKernel(rows, rows/2)
-        resultant_kernel = Y_resultant_kernel * X_resultant_kernel.T
-        mask = resultant_kernel / resultant_kernel.max()
-        
-        # Apply vignette
-        for i in range(3):
-            vintage[:, :, i] = vintage[:, :, i] * mask
-        
-        # Step 4: Reduce contrast slightly
-        vintage = cv2.convertScaleAbs(vintage, alpha=0.9, beta=10)
-        
-        return vintage
+        return self._render_style(image, "vintage")
     
+    @staticmethod
+    def apply_vignette(image: np.ndarray, strength: float = 1.0, dst: np.ndarray = None) -> np.ndarray:
+        """
+        Finishing stage: darken frame edges (cached separable mask, 0 = none, 1 = vintage)
+        Returns a new array unless dst is given (dst may be image itself to work in place)
+        """
+        return apply_vignette(image, min(max(strength, 0.0), 1.0), dst=dst)
+
     def apply_anime(self, image: np.ndarray) -> np.ndarray:
         """
         NEO-ANIME ENGINE (Gemini Style):
         Resolution-aware scaling for sharp character lines
         """
-        h, w = image.shape[:2]
-        scale_factor = w / 1280.0
-        
-        # Step 1: Smoothing
-        smooth = cv2.edgePreservingFilter(image, flags=1, sigma_s=60, sigma_r=0.45)
-        
-        # Step 2: Advanced Color Quantization
-        quantized = self._quantize_colors(smooth, num_colors=12)
-        
-        # Step 3: Ink Line Extraction (Resolution-Aware)
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        gray = cv2.medianBlur(gray, 5)
-        
-        # Scale blockSize
-        block_size = int(7 * scale_factor)
-        if block_size % 2 == 0: block_size += 1
-        block_size = max(3, block_size)
-        
-        mask = cv2.adaptiveThreshold(
-            gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-            cv2.THRESH_BINARY, blockSize=block_size, C=4
-        )
-        
-        # Merge
-        mask_colored = cv2.cvtColor(mask, cv2.COLOR_GRAY2BGR)
-        anime = cv2.bitwise_and(quantized, mask_colored)
-        
-        # Step 4: Add Glow / Bloom (Resolution-Aware blur)
-        blur_size = int(15 * scale_factor)
-        if blur_size % 2 == 0: blur_size += 1
-        blur_size = max(3, blur_size)
-        
-        glow = cv2.GaussianBlur(anime, (blur_size, blur_size), 0)
-        anime = cv2.addWeighted(anime, 0.8, glow, 0.4, 0)
-        
-        # Step 5: Final Grade
-        hsv = cv2.cvtColor(anime, cv2.COLOR_BGR2HSV)
-        hsv[:, :, 1] = np.clip(hsv[:, :, 1] * 1.6, 0, 255) 
-        result = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
-        
-        return result
+        return self._render_style(image, "anime")
 
     def apply_ghibli(self, image: np.ndarray) -> np.ndarray:
         """
@@ -316,137 +207,97 @@ class ImageProcessor:
         - Nature-inspired color balancing (warm skin, lush greens)
         - Diffusion glow
         """
-        # Step 1: Smooth image heavily but keep structure
-        smooth = cv2.edgePreservingFilter(image, flags=1, sigma_s=50, sigma_r=0.4)
-        
-        # Step 2: Painterly Quantization (Warm & Soft Palette)
-        # Ghibli style has higher color count but smoother gradients
-        quantized = self._quantize_colors(smooth, num_colors=16)
-        
-        # Step 3: "Diffusion" glow 
-        # This gives that hand-painted background feel
-        diffuse = cv2.GaussianBlur(quantized, (31, 31), 0)
-        ghibli = cv2.addWeighted(quantized, 0.85, diffuse, 0.15, 0)
-        
-        # Step 4: Soft Contrast & Gamma Correction
-        # This makes the image look like an animated film cell
-        invGamma = 1.0 / 1.2
-        table = np.array([((i / 255.0) ** invGamma) * 255 for i in np.arange(0, 256)]).astype("uint8")
-        ghibli = cv2.LUT(ghibli, table)
-        
-        # Step 5: Subtle Edge preservation (No thick lines for Ghibli)
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        edges = cv2.Canny(gray, 100, 200)
-        edges = cv2.GaussianBlur(edges, (3,3), 0)
-        edges_inv = cv2.bitwise_not(edges)
-        edges_color = cv2.cvtColor(edges_inv, cv2.COLOR_GRAY2BGR)
-        
-        result = cv2.multiply(ghibli, edges_color, scale=1/255)
-        return result
+        return self._render_style(image, "ghibli")
     
     def apply_comic_book(self, image: np.ndarray) -> np.ndarray:
         """
         Premium Comic Book Engine:
         Resolution-aware halftone and inking
         """
-        h, w = image.shape[:2]
-        scale_factor = w / 1280.0
-
-        # Step 1: Noise reduction
-        img_blur = cv2.medianBlur(image, 5)
-        quantized = self._quantize_colors(img_blur, num_colors=8)
-        
-        # Step 2: Clean Ink Edges
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        gray = cv2.GaussianBlur(gray, (5, 5), 0)
-        edges = cv2.Canny(gray, 50, 150)
-        edges = cv2.dilate(edges, np.ones((2, 2), np.uint8), iterations=1)
-        
-        # Step 3: Halftone Overlay (Resolution-Aware Dots)
-        halftone = np.zeros((h, w), dtype=np.uint8)
-        dot_spacing = max(4, int(6 * scale_factor))
-        dot_radius = max(1, int(2 * scale_factor))
-        
-        for i in range(0, h, dot_spacing):
-            for j in range(0, w, dot_spacing):
-                cv2.circle(halftone, (j, i), dot_radius, 255, -1)
-        
-        # Step 4: Color Grading
-        hsv = cv2.cvtColor(quantized, cv2.COLOR_BGR2HSV)
-        hsv[:, :, 1] = np.clip(hsv[:, :, 1] * 1.6, 0, 255)
-        comic = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
-        
-        # Mask dots into the shadows
-        mask = cv2.cvtColor(halftone, cv2.COLOR_GRAY2BGR)
-        comic = cv2.addWeighted(comic, 0.9, mask, 0.1, 0)
-        
-        # Step 5: Final Ink Layer
-        edges_colored = cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)
-        edges_colored = cv2.bitwise_not(edges_colored)
-        result = cv2.bitwise_and(comic, edges_colored)
-        
-        return result
+        return self._render_style(image, "comic_book")
     
-    def _quantize_colors(self, image: np.ndarray, num_colors: int = 8) -> np.ndarray:
+    @staticmethod
+    @lru_cache(maxsize=16)
+    def _posterize_table(num_colors: int) -> np.ndarray:
+        """Per-value channel posterization as a 256-entry lookup table"""
+        # Approximate palette size with evenly spaced channel bins.
+        levels = int(np.clip(round(num_colors ** (1.0 / 3.0)), 2, 8))
+        step = max(1, 256 // levels)
+        values = np.arange(256, dtype=np.uint8)
+        return np.clip((values // step) * step + step // 2, 0, 255).astype(np.uint8)
+
+    @staticmethod
+    @lru_cache(maxsize=1)
+    def _color_cells() -> np.ndarray:
+        """Centres of the 32x32x32 BGR cells (5 bits per channel), one float32 row each"""
+        levels = np.arange(4, 256, 8, dtype=np.float32)
+        b, g, r = np.meshgrid(levels, levels, levels, indexing="ij")
+        return np.stack([b.ravel(), g.ravel(), r.ravel()], axis=1)
+
+    def _kmeans_colors(self, image: np.ndarray, num_colors: int, iterations: int = 10,
+                       dst: np.ndarray = None) -> np.ndarray:
         """
-        Reduce colors for stylization.
-        In fast mode, use deterministic channel posterization (much faster than K-means).
+        K-means palette reduction. The palette is fitted on a strided sample of at most
+        QUALITY_KMEANS_SAMPLE pixels, then every pixel is mapped through a 32x32x32
+        nearest-centre table rather than measured against each centre.
         """
-        if self.fast_processing:
-            # Approximate palette size with evenly spaced channel bins.
-            levels = int(np.clip(round(num_colors ** (1.0 / 3.0)), 2, 8))
-            step = max(1, 256 // levels)
-            quantized = (image // step) * step + step // 2
-            return np.clip(quantized, 0, 255).astype(np.uint8)
-
         pixels = image.reshape((-1, 3))
-        pixels = np.float32(pixels)
-        
-        # Use a reasonable number of iterations for cartoons
-        # 10 is a good balance between speed and quality
-        criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 10, 1.0)
-        flags = cv2.KMEANS_RANDOM_CENTERS
-        
-        _, labels, centers = cv2.kmeans(pixels, num_colors, None, criteria, 1, flags)
-        
-        centers = np.uint8(centers)
-        quantized = centers[labels.flatten()]
-        return quantized.reshape(image.shape)
+        limit = max(1024, int(getattr(settings, "QUALITY_KMEANS_SAMPLE", 65536)))
+        sample = np.float32(pixels[::max(1, len(pixels) // limit)])
+        criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, max(1, iterations), 1.0)
+        _, _, centers = cv2.kmeans(sample, num_colors, None, criteria, 1, cv2.KMEANS_PP_CENTERS)
+
+        cells = self._color_cells()
+        distances = ((cells[:, np.newaxis, :] - centers[np.newaxis, :, :]) ** 2).sum(axis=2)
+        table = np.clip(np.rint(centers), 0, 255).astype(np.uint8)[distances.argmin(axis=1)]
+
+        cell = (image >> 3).astype(np.uint16)
+        index = (cell[..., 0] << 10) | (cell[..., 1] << 5) | cell[..., 2]
+        if dst is None:
+            dst = np.empty_like(image)
+        return np.take(table, index, axis=0, out=dst)
+
+    def _quantize_colors(self, image: np.ndarray, num_colors: int = 8,
+                         dst: np.ndarray = None, method: str = None,
+                         iterations: int = 10) -> np.ndarray:
+        """
+        Reduce colors for stylization, written through dst when given.
+        method "posterize" is a deterministic channel LUT (much faster than K-means);
+        "kmeans" fits a palette. None follows FAST_PROCESSING.
+        """
+        method = method or ("posterize" if self.fast_processing else "kmeans")
+        if method == "posterize":
+            return cv2.LUT(image, self._posterize_table(num_colors), dst=dst)
+        return self._kmeans_colors(image, num_colors, iterations, dst=dst)
+
+    def _internal_frame(self, image: np.ndarray, quality: str = "standard") -> np.ndarray:
+        """Frame heavy styles actually run on (downscaled per quality tier)"""
+        max_width = self.quality_presets[quality]["internal_max_width"]
+        if max_width is None:
+            max_width = self.fast_style_max_width if self.fast_processing else 0
+        if not max_width or image.shape[1] <= max_width:
+            return image
+        return self.resize_image(image, max_width=max_width, max_height=2160)
 
-    def _apply_with_internal_scaling(self, image: np.ndarray, style_func) -> np.ndarray:
+    def _apply_with_internal_scaling(self, image: np.ndarray, style_func,
+                                     quality: str = "standard") -> np.ndarray:
         """
         Speed optimization: run expensive style transforms on a smaller internal frame
         and upscale to the requested output size.
         """
         h, w = image.shape[:2]
-        if not self.fast_processing or w <= self.fast_style_max_width:
+        scaled = self._internal_frame(image, quality)
+        if scaled is image:
             return style_func(image)
-
-        scaled = self.resize_image(image, max_width=self.fast_style_max_width, max_height=2160)
         processed_small = style_func(scaled)
-        return cv2.resize(processed_small, (w, h), interpolation=cv2.INTER_LINEAR)
+        processed = cv2.resize(processed_small, (w, h), interpolation=cv2.INTER_LINEAR)
+        arena = get_arena()
+        arena.release(processed_small)
+        arena.release(scaled)
+        return processed
     
-    def process_image(self, image: np.ndarray, style: str, is_premium: bool = False) -> Tuple[np.ndarray, float]:
-        """
-        Process image with selected style
-        Returns: (processed_image, processing_time)
-        """
-        start_time = time.perf_counter()
-        
-        # Resize based on plan
-        if is_premium:
-            image = self.resize_image(
-                image,
-                max_width=int(getattr(settings, "PREMIUM_MAX_WIDTH", 2560)),
-                max_height=2160
-            )
-        else:
-            image = self.resize_image(
-                image,
-                max_width=int(getattr(settings, "FREE_MAX_WIDTH", 1024)),
-                max_height=720
-            )
-
+    def get_style_handler(self, style: str):
+        """Style function for a style key (Classic Cartoon for unknown keys)"""
         style_handlers = {
             "cartoon": self.apply_classic_cartoon,
             "sketch": self.apply_sketch_effect,
@@ -459,22 +310,242 @@ class ImageProcessor:
             "ghibli": self.apply_ghibli,
             "comic_book": self.apply_comic_book,
         }
-        heavy_styles = {"cartoon", "oil_painting", "watercolor", "anime", "ghibli", "comic_book"}
-        style_func = style_handlers.get(style, self.apply_classic_cartoon)
+        return style_handlers.get(style, self.apply_classic_cartoon)
+
+    @staticmethod
+    def plan_max_size(is_premium: bool = False) -> Tuple[int, int]:
+        """Maximum (width, height) a plan is processed at"""
+        if is_premium:
+            return int(getattr(settings, "PREMIUM_MAX_WIDTH", 2560)), 2160
+        return int(getattr(settings, "FREE_MAX_WIDTH", 1024)), 720
 
-        if style in heavy_styles:
-            processed = self._apply_with_internal_scaling(image, style_func)
+    def plan_output_size(self, width: int, height: int, is_premium: bool = False) -> Tuple[int, int]:
+        """Size process_image will produce for a width x height upload"""
+        max_width, max_height = self.plan_max_size(is_premium)
+        if width <= max_width and height <= max_height:
+            return width, height
+        scale = min(max_width / width, max_height / height)
+        return int(width * scale), int(height * scale)
+
+    def process_image(self, image: np.ndarray, style: str, is_premium: bool = False,
+                      vignette: float = 0.0, quality: str = None) -> Tuple[np.ndarray, float]:
+        """
+        Process image with selected style
+        vignette (0-1) adds an optional darkened-edge finishing stage
+        quality is a tier name (plan default when None, capped at the plan's highest tier)
+        Returns: (processed_image, processing_time)
+        """
+        start_time = time.perf_counter()
+        quality = resolve_quality(quality, is_premium)
+        
+        # Resize based on plan
+        max_width, max_height = self.plan_max_size(is_premium)
+        image = self.resize_image(image, max_width=max_width, max_height=max_height)
+
+        def style_func(frame):
+            return self._render_style(frame, style, quality)
+
+        if style in self.HEAVY_STYLES:
+            processed = self._apply_with_internal_scaling(image, style_func, quality)
         else:
             processed = style_func(image)
+
+        if vignette > 0:
+            # The rendered frame is ours to overwrite unless the style passed the input through
+            owned = processed.flags.writeable and not np.may_share_memory(processed, image)
+            processed = self.apply_vignette(processed, vignette, dst=processed if owned else None)
         
         processing_time = max(time.perf_counter() - start_time, 1e-6)
         
         return processed, processing_time
 
+    def process_multi_style(self, image: np.ndarray, styles: list,
+                            is_premium: bool = False, quality: str = None) -> list:
+        """
+        Render several styles of one image. The plan resize and the internal downscale
+        happen once, and the style graph runs each group (heavy styles on the internal
+        frame, light styles on the full frame) as one shared DAG.
+        Shared work is split evenly across the styles of a group for timing.
+        Returns: [(style, processed_image, processing_time), ...] in request order
+        """
+        quality = resolve_quality(quality, is_premium)
+        max_width, max_height = self.plan_max_size(is_premium)
+        image = self.resize_image(image, max_width=max_width, max_height=max_height)
+        h, w = image.shape[:2]
+        scaled = self._internal_frame(image, quality)
+
+        heavy = [style for style in dict.fromkeys(styles) if style in self.HEAVY_STYLES]
+        light = [style for style in dict.fromkeys(styles) if style not in self.HEAVY_STYLES]
+        rendered, timings = {}, {}
+        for group, frame in ((heavy, scaled), (light, image)):
+            if not group:
+                continue
+            start_time = time.perf_counter()
+            outputs = self.render_styles(frame, group, quality)
+            if frame is not image:
+                # Upscale each distinct output once, then recycle the small buffers
+                upscaled = {id(processed): cv2.resize(processed, (w, h), interpolation=cv2.INTER_LINEAR)
+                            for processed in outputs.values()}
+                arena = get_arena()
+                for processed in {id(p): p for p in outputs.values()}.values():
+                    arena.release(processed)
+                outputs = {style: upscaled[id(processed)] for style, processed in outputs.items()}
+            rendered.update(outputs)
+            elapsed = max(time.perf_counter() - start_time, 1e-6)
+            for style in group:
+                timings[style] = elapsed / len(group)
+
+        if scaled is not image:
+            get_arena().release(scaled)
+        return [(style, rendered[style], timings[style]) for style in styles]
+
+    @staticmethod
+    def _open_video_writer(output_path: str, fps: float, size: Tuple[int, int],
+                           codec_candidates) -> Optional[cv2.VideoWriter]:
+        """Open a VideoWriter using the first codec the local OpenCV build accepts."""
+        for codec in codec_candidates:
+            writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*codec), fps, size)
+            if writer.isOpened():
+                return writer
+            writer.release()
+        return None
+
+    @staticmethod
+    def _plan_video_segments(total_frames: int, cadence: int, workers: int,
+                             min_frames: int) -> list:
+        """
+        Split [0, total_frames) into contiguous segments for parallel rendering.
+        Boundaries are multiples of the key-frame cadence so every segment starts on a
+        stylized frame, exactly like the sequential path.
+        """
+        if total_frames <= 0 or workers <= 1 or total_frames < 2 * min_frames:
+            return [(0, total_frames)]
+
+        count = min(workers, total_frames // min_frames)
+        size = -(-total_frames // count)
+        size = -(-size // cadence) * cadence
+        segments = []
+        for begin in range(0, total_frames, size):
+            segments.append((begin, min(begin + size, total_frames)))
+        return segments
+
+    def _render_video_segment(self, input_path: str, writer: cv2.VideoWriter, style: str,
+                              is_premium: bool, size: Tuple[int, int], cadence: int,
+                              begin: int = 0, end: Optional[int] = None) -> int:
+        """
+        Stylize frames [begin, end) of the input into an already opened writer.
+        Key frames are stylized every `cadence` frames and reused in between.
+        Returns the number of frames written.
+        """
+        cap = cv2.VideoCapture(input_path)
+        if not cap.isOpened():
+            raise IOError("Unable to open uploaded video")
+
+        try:
+            # Skip to begin by decoding forward: CAP_PROP_POS_FRAMES seeks land on the
+            # nearest key frame for many codecs while still reporting the requested index.
+            for _ in range(begin):
+                if not cap.grab():
+                    return 0
+
+            out_w, out_h = size
+            frame_index = begin
+            written = 0
+            last_processed = None
+            while end is None or frame_index < end:
+                ok, frame = cap.read()
+                if not ok:
+                    break
+
+                if (frame.shape[1], frame.shape[0]) != (out_w, out_h):
+                    frame = cv2.resize(frame, (out_w, out_h), interpolation=cv2.INTER_AREA)
+
+                if frame_index % cadence == 0 or last_processed is None:
+                    last_processed, _ = self.process_image(frame, style, is_premium=is_premium)
+
+                writer.write(last_processed)
+                written += 1
+                frame_index += 1
+            return written
+        finally:
+            cap.release()
+
+    def _render_video_segment_file(self, input_path: str, segment_path: str, style: str,
+                                   is_premium: bool, fps: float, size: Tuple[int, int],
+                                   codec_candidates, cadence: int, begin: int, end: int) -> int:
+        """Render one segment into its own temporary file (one worker per segment)."""
+        writer = self._open_video_writer(segment_path, fps, size, codec_candidates)
+        if writer is None:
+            raise IOError(f"Unable to create video segment {segment_path}")
+        try:
+            return self._render_video_segment(
+                input_path, writer, style, is_premium, size, cadence, begin, end
+            )
+        finally:
+            writer.release()
+
+    @staticmethod
+    def _concat_video_segments(segment_paths: list, output_path: str, fps: float,
+                               size: Tuple[int, int], codec_candidates) -> bool:
+        """
+        Join rendered segments into the final output.
+        With an ffmpeg binary on PATH the segments are stream-copied (no re-encode).
+        Otherwise the segments are lossless FFV1 intermediates that are encoded once
+        into the requested container.
+        """
+        ffmpeg = shutil.which("ffmpeg")
+        if ffmpeg:
+            list_path = f"{output_path}.segments.txt"
+            try:
+                with open(list_path, "w") as f:
+                    for path in segment_paths:
+                        f.write(f"file '{os.path.abspath(path)}'\n")
+                result = subprocess.run(
+                    [ffmpeg, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+                     "-i", list_path, "-c", "copy", output_path],
+                    capture_output=True
+                )
+                return result.returncode == 0 and os.path.exists(output_path)
+            finally:
+                if os.path.exists(list_path):
+                    os.remove(list_path)
+
+        writer = ImageProcessor._open_video_writer(output_path, fps, size, codec_candidates)
+        if writer is None:
+            return False
+        try:
+            for path in segment_paths:
+                cap = cv2.VideoCapture(path)
+                while True:
+                    ok, frame = cap.read()
+                    if not ok:
+                        break
+                    writer.write(frame)
+                cap.release()
+        finally:
+            writer.release()
+        return True
+
+    def render_preview(self, image: np.ndarray, style: str,
+                       max_width: int = None) -> Tuple[np.ndarray, float]:
+        """
+        Fast low-resolution render for progressive delivery.
+        The style runs directly on a ~PREVIEW_MAX_WIDTH frame (no upscale back), always
+        at draft quality.
+        Returns: (preview_image, processing_time)
+        """
+        start_time = time.perf_counter()
+        max_width = int(max_width or getattr(settings, "PREVIEW_MAX_WIDTH", 480))
+        small = self.resize_image(image, max_width=max_width, max_height=max_width)
+        preview = self._render_style(small, style, "draft")
+        return preview, max(time.perf_counter() - start_time, 1e-6)
+
     def process_video_file(self, input_path: str, output_path: str, style: str,
                           is_premium: bool = False) -> Tuple[bool, float, int, str]:
         """
         Process a video by stylizing key frames and reusing them for intermediate frames.
+        Long clips are split into segments that are stylized and encoded in parallel,
+        then joined; a failed segment is re-rendered on its own.
         Returns: (success, processing_time, output_frames, message)
         """
         start_time = time.perf_counter()
@@ -488,8 +559,9 @@ class ImageProcessor:
 
         src_w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH) or 0)
         src_h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or 0)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        cap.release()
         if src_w <= 0 or src_h <= 0:
-            cap.release()
             return False, 0.0, 0, "Invalid video dimensions"
 
         max_w = int(getattr(settings, "VIDEO_PREMIUM_MAX_WIDTH", 1280) if is_premium
@@ -503,6 +575,7 @@ class ImageProcessor:
 
         out_w += out_w % 2
         out_h += out_h % 2
+        size = (out_w, out_h)
 
         out_ext = os.path.splitext(output_path)[1].lower()
         codec_candidates = ['mp4v']
@@ -511,49 +584,89 @@ class ImageProcessor:
         elif out_ext == '.mp4':
             codec_candidates = ['avc1', 'H264', 'mp4v']
 
-        writer = None
-        for codec in codec_candidates:
-            fourcc = cv2.VideoWriter_fourcc(*codec)
-            test_writer = cv2.VideoWriter(output_path, fourcc, fps, (out_w, out_h))
-            if test_writer.isOpened():
-                writer = test_writer
-                break
-            test_writer.release()
-
-        if writer is None:
-            writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (out_w, out_h))
-        if not writer.isOpened():
-            cap.release()
-            return False, 0.0, 0, "Unable to create output video"
-
         n = max(1, int(getattr(settings, "VIDEO_PROCESS_EVERY_N_FRAMES", 2)))
-        frame_index = 0
-        written = 0
-        last_processed = None
-
-        while True:
-            ok, frame = cap.read()
-            if not ok:
-                break
-
-            if (frame.shape[1], frame.shape[0]) != (out_w, out_h):
-                frame = cv2.resize(frame, (out_w, out_h), interpolation=cv2.INTER_AREA)
-
-            if frame_index % n == 0 or last_processed is None:
-                last_processed, _ = self.process_image(frame, style, is_premium=is_premium)
-
-            writer.write(last_processed)
-            written += 1
-            frame_index += 1
+        # Segment threads share OpenCV's process-wide thread pool, so by default run
+        # only as many as the cores can feed alongside it
+        workers = int(getattr(settings, "VIDEO_SEGMENT_WORKERS", 0)) or min(
+            max(1, (os.cpu_count() or 1) // max(1, cv2.getNumThreads())), 4)
+        segments = self._plan_video_segments(
+            total_frames, n, workers, max(1, int(getattr(settings, "VIDEO_MIN_SEGMENT_FRAMES", 96)))
+        )
 
-        cap.release()
-        writer.release()
+        if len(segments) == 1:
+            writer = self._open_video_writer(output_path, fps, size, codec_candidates)
+            if writer is None:
+                return False, 0.0, 0, "Unable to create output video"
+            try:
+                written = self._render_video_segment(input_path, writer, style, is_premium, size, n)
+            except IOError as e:
+                return False, 0.0, 0, str(e)
+            finally:
+                writer.release()
+        else:
+            written, message = self._process_video_segments(
+                input_path, output_path, style, is_premium, fps, size,
+                codec_candidates, n, segments
+            )
+            if message:
+                return False, 0.0, 0, message
 
         if written == 0:
             return False, 0.0, 0, "No frames were processed"
 
         return True, max(time.perf_counter() - start_time, 1e-6), written, "Video processed"
 
+    def _process_video_segments(self, input_path: str, output_path: str, style: str,
+                                is_premium: bool, fps: float, size: Tuple[int, int],
+                                codec_candidates, cadence: int, segments: list) -> Tuple[int, str]:
+        """
+        Render segments concurrently into a scratch directory and join them.
+        Returns: (frames_written, error_message) where error_message is empty on success.
+        """
+        use_copy_concat = shutil.which("ffmpeg") is not None
+        segment_ext = os.path.splitext(output_path)[1] if use_copy_concat else ".avi"
+        segment_codecs = codec_candidates if use_copy_concat else ['FFV1', 'HFYU', 'MJPG']
+        retries = max(0, int(getattr(settings, "VIDEO_SEGMENT_RETRIES", 1)))
+        scratch_dir = tempfile.mkdtemp(prefix="segments_", dir=os.path.dirname(output_path) or None)
+
+        try:
+            paths = [os.path.join(scratch_dir, f"segment_{i:04d}{segment_ext}") for i in range(len(segments))]
+            counts = [None] * len(segments)
+            pending = list(range(len(segments)))
+
+            for _attempt in range(retries + 1):
+                if not pending:
+                    break
+                with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+                    futures = {
+                        i: executor.submit(
+                            self._render_video_segment_file, input_path, paths[i], style,
+                            is_premium, fps, size, segment_codecs, cadence, *segments[i]
+                        )
+                        for i in pending
+                    }
+                    failed = []
+                    for i, future in futures.items():
+                        try:
+                            counts[i] = future.result()
+                        except Exception as e:
+                            print(f"Video segment {i} failed: {e}")
+                            failed.append(i)
+                pending = failed
+
+            if pending:
+                return 0, f"Video segments failed: {', '.join(str(i) for i in pending)}"
+
+            # CAP_PROP_FRAME_COUNT can overestimate; trailing segments past the real end are empty
+            paths = [path for path, count in zip(paths, counts) if count]
+            if not paths:
+                return 0, ""
+            if not self._concat_video_segments(paths, output_path, fps, size, codec_candidates):
+                return 0, "Unable to create output video"
+            return sum(counts), ""
+        finally:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
     def get_image_statistics(self, image: np.ndarray) -> dict:
         """
         Calculate image statistics: brightness, contrast, and color distribution.
@@ -602,164 +715,61 @@ class ImageProcessor:
             print(f"Error saving image: {e}")
             return False
     
-    def remove_background_mask(self, image: np.ndarray) -> np.ndarray:
+    def foreground_alpha(self, image: np.ndarray, cache_key: str = None) -> np.ndarray:
         """
         Advanced foreground segmentation using GrabCut with feathered edge blending.
+        Large images are segmented on a downscaled copy and the mask is upsampled
+        edge-aware; cache_key (the source filename) reuses a previous mask.
+        Returns: single-channel uint8 alpha (255 = foreground)
         """
         try:
-            mask = np.zeros(image.shape[:2], np.uint8)
-            bgdModel = np.zeros((1, 65), np.float64)
-            fgdModel = np.zeros((1, 65), np.float64)
-            h, w = image.shape[:2]
-            
-            # Use a slightly more conservative rect for primary subject
-            rect = (int(w*0.05), int(h*0.05), int(w*0.9), int(h*0.9))
-            cv2.grabCut(image, mask, rect, bgdModel, fgdModel, 5, cv2.GC_INIT_WITH_RECT)
-            
-            # Create a more nuanced mask (0=bg, 1=fg, 2=likely bg, 3=likely fg)
-            # We want both Definitely FG (1) and Likely FG (3)
-            mask2 = np.where((mask==1) | (mask==3), 255, 0).astype('uint8')
-            
-            # Feathering: Create a smooth transition boundary
-            # Expansion helps capture strands of hair/clothing
-            mask2 = cv2.dilate(mask2, np.ones((3,3), np.uint8), iterations=1)
-            # Heavy blur for alpha-blending feel
-            mask2 = cv2.GaussianBlur(mask2, (21, 21), 0)
-            
-            # Normalize to 0-1 for blending
-            return (mask2 / 255.0).astype(np.float32)
+            return self.segmenter.foreground_alpha(image, cache_key=cache_key)
         except Exception as e:
             print(f"Masking Error: {e}")
             h, w = image.shape[:2]
-            mask = np.zeros((h, w), np.float32)
-            cv2.circle(mask, (w//2, h//2), int(min(h, w)*0.4), 1.0, -1)
+            mask = np.zeros((h, w), np.uint8)
+            cv2.circle(mask, (w//2, h//2), int(min(h, w)*0.4), 255, -1)
             return cv2.GaussianBlur(mask, (51, 51), 0)
 
-    def teleport_background(self, image: np.ndarray, bg_type: str) -> np.ndarray:
+    def remove_background_mask(self, image: np.ndarray, cache_key: str = None) -> np.ndarray:
+        """
+        Foreground alpha normalized to 0-1 for float blending.
+        Returns: float32 alpha in [0, 1]
+        """
+        return (self.foreground_alpha(image, cache_key=cache_key) / 255.0).astype(np.float32)
+
+    def teleport_background(self, image: np.ndarray, bg_type: str, cache_key: str = None) -> np.ndarray:
         """
         Teleport user to a new world.
+        cache_key identifies the source image so switching backgrounds reuses its mask.
         """
-        bg_map = {
-            "tokyo": "frontend/static/images/backgrounds/tokyo.png",
-            "cyberpunk": "frontend/static/images/backgrounds/cyberpunk.png",
-            "forest": "frontend/static/images/backgrounds/forest.png"
-        }
-        
-        bg_path = bg_map.get(bg_type)
-        if not bg_path: return image
-        
-        if not os.path.exists(bg_path): return image
-        bg = cv2.imread(bg_path)
-        if bg is None: return image
-        
         h, w = image.shape[:2]
-        bg = cv2.resize(bg, (w, h))
-        
-        # Segment and Blend with float precision
-        mask_alpha = self.remove_background_mask(image)
-        mask_3d = cv2.merge([mask_alpha, mask_alpha, mask_alpha])
-        
-        fg = image.astype(np.float32) / 255.0
-        bg_float = bg.astype(np.float32) / 255.0
+        bg = self.backgrounds.get(bg_type, w, h)
+        if bg is None: return image
         
-        # Linear Interpolation Blending
-        result = (fg * mask_3d + bg_float * (1.0 - mask_3d)) * 255.0
-        return result.astype(np.uint8)
+        # Segment and blend with the single-channel alpha
+        alpha = self.foreground_alpha(image, cache_key=cache_key)
+        return composite(image, bg, alpha)
 
-    def create_toon_mo(self, image: np.ndarray) -> bytes:
+    def create_toon_mo(self, image: np.ndarray, fmt: str = "gif") -> bytes:
         """
-        Create a 2-second "breathing" animation (GIF)
+        Create a 2-second "breathing" animation (GIF, animated WebP or MP4)
         """
-        from PIL import Image as PILImage
-        frames = []
-        h, w = image.shape[:2]
-        
-        # Convert BGR to RGB for PIL
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        base_pil = PILImage.fromarray(image_rgb)
-        
-        # Generate 15 frames for a smooth pulse
-        for i in range(15):
-            # Scale follows a sine wave for "breathing" effect
-            # Amplitude is 3% zoom
-            scale = 1.0 + 0.03 * np.sin(i * np.pi / 7.5)
-            nw, nh = int(w * scale), int(h * scale)
-            
-            # Resize and crop to original dimensions
-            frame = base_pil.resize((nw, nh), PILImage.LANCZOS)
-            left = (nw - w) // 2
-            top = (nh - h) // 2
-            frame = frame.crop((left, top, left + w, top + h))
-            
-            # Add a subtle brightness pulse
-            from PIL import ImageEnhance
-            enhancer = ImageEnhance.Brightness(frame)
-            frame = enhancer.enhance(1.0 + 0.05 * np.sin(i * np.pi / 7.5))
-            
-            frames.append(frame)
-            
-        byte_io = io.BytesIO()
-        # Save as optimized GIF
-        frames[0].save(
-            byte_io, 
-            format='GIF', 
-            save_all=True, 
-            append_images=frames[1:], 
-            duration=80, 
-            loop=0,
-            optimize=True
-        )
-        return byte_io.getvalue()
+        return self.animator.animate(image, fmt)
 
-    def apply_style_dna(self, target: np.ndarray, reference: np.ndarray) -> np.ndarray:
+    def apply_style_dna(self, target: np.ndarray, reference) -> np.ndarray:
         """
         AI Style DNA Transfer: Extracts the color profile and 'vibe' from a reference 
         image and injects it into the target image using Lab color space shifting.
         Enhanced for more dramatic visual impact.
+        reference is either a BGR image or a DNA dict from extract_style_dna.
         """
-        # Resize reference to match target for stable stats calculation
-        h, w = target.shape[:2]
-        reference = cv2.resize(reference, (w, h))
+        dna = reference if isinstance(reference, dict) else self.extract_style_dna(reference)
+        return self.style_dna.apply(target, dna)
 
-        # Convert both to LAB space
-        target_lab = cv2.cvtColor(target, cv2.COLOR_BGR2LAB).astype("float32")
-        ref_lab = cv2.cvtColor(reference, cv2.COLOR_BGR2LAB).astype("float32")
-        
-        # Split channels
-        (l_t, a_t, b_t) = cv2.split(target_lab)
-        (l_r, a_r, b_r) = cv2.split(ref_lab)
-        
-        # Calculate stats
-        (l_t_mean, l_t_std) = (l_t.mean(), l_t.std())
-        (a_t_mean, a_t_std) = (a_t.mean(), a_t.std())
-        (b_t_mean, b_t_std) = (b_t.mean(), b_t.std())
-        
-        (l_r_mean, l_r_std) = (l_r.mean(), l_r.std())
-        (a_r_mean, a_r_std) = (a_r.mean(), a_r.std())
-        (b_r_mean, b_r_std) = (b_r.mean(), b_r.std())
-        
-        # Shift and scale channels (Reference DNA injection)
-        # We use a 1.2x boost on color channels for more POP
-        l_t = (((l_t - l_t_mean) / (l_t_std + 1e-5)) * l_r_std) + l_r_mean
-        a_t = (((a_t - a_t_mean) / (a_t_std + 1e-5)) * (a_r_std * 1.5)) + a_r_mean
-        b_t = (((b_t - b_t_mean) / (b_t_std + 1e-5)) * (b_r_std * 1.5)) + b_r_mean
-        
-        # Clip and merge
-        l_t = np.clip(l_t, 0, 255)
-        a_t = np.clip(a_t, 0, 255)
-        b_t = np.clip(b_t, 0, 255)
-        
-        transfer = cv2.merge([l_t, a_t, b_t])
-        transfer = cv2.cvtColor(transfer.astype("uint8"), cv2.COLOR_LAB2BGR)
-        
-        # Final Contrast Enhancement for the 'Wow' factor
-        lab = cv2.cvtColor(transfer, cv2.COLOR_BGR2LAB)
-        l, a, b = cv2.split(lab)
-        clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
-        l = clahe.apply(l)
-        transfer = cv2.cvtColor(cv2.merge([l, a, b]), cv2.COLOR_LAB2BGR)
-
-        return transfer
+    def extract_style_dna(self, reference: np.ndarray) -> dict:
+        """Lab mean/std and CLAHE settings of a reference (cached per reference content)"""
+        return self.style_dna.from_image(reference)
 
     @staticmethod
     def get_image_bytes(image: np.ndarray, format: str = 'JPEG', 
@@ -0,0 +1,135 @@
+"""
+Background job queue
+Runs slow work (e.g. full-resolution renders) after the request has returned
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+import config.settings as settings
+from modules.database import db
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class JobQueue:
+    """
+    Thread-pool backed job runner with pollable job status.
+    With a database, job state lives in the jobs table, so a poll that lands on
+    another worker process (or arrives after a restart) still finds the job;
+    without one it is kept in memory. A job still queued or running after
+    stale_seconds belonged to a process that died and is reported as failed.
+    on_discard(job_id), if set, runs when a job finishes and again when its record
+    is pruned, to remove the job's scratch files.
+    """
+
+    def __init__(self, max_workers: int = None, retention_seconds: int = None, database=None,
+                 stale_seconds: int = None, on_discard: Callable[[str], None] = None):
+        """Initialize the worker pool and job registry"""
+        self.db = database
+        self.on_discard = on_discard
+        self.max_workers = max(1, int(max_workers or getattr(settings, "BACKGROUND_MAX_WORKERS", 2)))
+        self.retention_seconds = int(retention_seconds or getattr(settings, "JOB_RETENTION_SECONDS", 3600))
+        self.stale_seconds = int(stale_seconds or getattr(settings, "JOB_STALE_SECONDS", 900))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="toonify-job")
+        self._jobs: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self.pruned_at = 0.0
+
+    def submit(self, func: Callable, *args, owner_id: int = None, job_id: str = None, **kwargs) -> str:
+        """
+        Queue func(*args, **kwargs) and return its job id (a new one unless given).
+        The function's return value (a dict) becomes the job result.
+        """
+        job_id = job_id or uuid.uuid4().hex
+        self._prune()
+        if self.db is not None:
+            self.db.create_job(job_id, owner_id)
+        else:
+            with self._lock:
+                self._jobs[job_id] = {
+                    "id": job_id,
+                    "owner_id": owner_id,
+                    "status": "queued",
+                    "result": None,
+                    "error": None,
+                    "created_at": time.time(),
+                    "finished_at": None
+                }
+        self._executor.submit(self._run, job_id, func, args, kwargs)
+        return job_id
+
+    def _run(self, job_id: str, func: Callable, args, kwargs):
+        self._update(job_id, status="running")
+        try:
+            result = func(*args, **kwargs)
+            self._update(job_id, status="done", result=result, finished_at=time.time())
+        except Exception as e:
+            print(f"Background job {job_id} failed: {e}")
+            self._update(job_id, status="failed", error=str(e), finished_at=time.time())
+        finally:
+            self._discard(job_id)
+
+    def _discard(self, job_id: str):
+        if self.on_discard is None:
+            return
+        try:
+            self.on_discard(job_id)
+        except Exception as e:
+            print(f"Background job {job_id} cleanup failed: {e}")
+
+    def _update(self, job_id: str, **fields):
+        if self.db is not None:
+            try:
+                self.db.update_job(job_id, **fields)
+            except Exception as e:
+                print(f"Background job {job_id} status update failed: {e}")
+            return
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                job.update(fields)
+
+    def _prune(self):
+        """Forget finished jobs older than the retention window (at most once a minute)"""
+        now = time.time()
+        if now - self.pruned_at < 60:
+            return
+        self.pruned_at = now
+        if self.db is not None:
+            try:
+                expired = self.db.prune_jobs(self.retention_seconds)
+            except Exception as e:
+                print(f"Background job prune failed: {e}")
+                return
+        else:
+            cutoff = now - self.retention_seconds
+            with self._lock:
+                expired = [job_id for job_id, job in self._jobs.items()
+                           if job["finished_at"] and job["finished_at"] < cutoff]
+                for job_id in expired:
+                    del self._jobs[job_id]
+        # Also reaches jobs whose process died before they finished
+        for job_id in expired:
+            self._discard(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Snapshot of a job's state, or None if unknown/expired"""
+        if self.db is not None:
+            job = self.db.get_job(job_id)
+        else:
+            with self._lock:
+                job = self._jobs.get(job_id)
+                job = dict(job) if job else None
+        if job and job["status"] in ACTIVE_STATUSES and time.time() - job["created_at"] > self.stale_seconds:
+            job.update(status="failed", error="Job was interrupted; please try again")
+        return job
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting jobs and optionally wait for running ones"""
+        self._executor.shutdown(wait=wait)
+
+
+# Global job queue instance, with state shared by every worker through the database
+job_queue = JobQueue(database=db)
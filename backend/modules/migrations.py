@@ -0,0 +1,268 @@
+"""
+Schema migrations
+Ordered, versioned schema changes applied once per database under an exclusive lock
+"""
+from typing import Callable, List, Tuple
+
+# Postgres advisory lock key shared by every process migrating this database
+MIGRATION_LOCK_KEY = 7_402_045
+
+SCHEMA_VERSION_SQL = ("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER PRIMARY KEY, "
+                      "name VARCHAR(100) NOT NULL, applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP)")
+
+
+def has_column(db, cursor, table: str, column: str) -> bool:
+    """Whether table has column (without a failing probe, which would abort a Postgres transaction)"""
+    if db.is_postgres:
+        cursor.execute("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = %s AND column_name = %s
+        """, (table, column))
+        return cursor.fetchone() is not None
+    cursor.execute(f"PRAGMA table_info({table})")
+    return any(row['name'] == column for row in cursor.fetchall())
+
+
+def add_column(db, cursor, table: str, column: str, type_def: str):
+    """ALTER TABLE ADD COLUMN unless the column exists (databases created before versioning)"""
+    if not has_column(db, cursor, table, column):
+        print(f"🚀 Migrating {table}: Adding '{column}'...")
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {type_def}")
+
+
+# Migrations take (db, cursor) and must be idempotent: databases created before
+# schema_version existed replay them all on top of the tables they already have.
+
+def _create_core_tables(db, cursor):
+    id_serial = "SERIAL PRIMARY KEY" if db.is_postgres else "INTEGER PRIMARY KEY AUTOINCREMENT"
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS users (
+            id {id_serial},
+            username VARCHAR(50) UNIQUE NOT NULL,
+            email VARCHAR(100) UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            full_name VARCHAR(100),
+            role VARCHAR(20) DEFAULT 'user',
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            last_login TIMESTAMP WITH TIME ZONE,
+            is_active BOOLEAN DEFAULT {db.bool_true},
+            is_verified BOOLEAN DEFAULT {db.bool_false},
+            last_logout TIMESTAMP WITH TIME ZONE,
+            last_active TIMESTAMP WITH TIME ZONE
+        )
+    """)
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS verification_codes (id {id_serial}, email VARCHAR(100) NOT NULL, code VARCHAR(10) NOT NULL, created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP, expires_at TIMESTAMP WITH TIME ZONE NOT NULL)")
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS transactions (id {id_serial}, user_id INTEGER NOT NULL, transaction_id VARCHAR(100) UNIQUE NOT NULL, amount DOUBLE PRECISION NOT NULL, currency VARCHAR(10) DEFAULT 'usd', status VARCHAR(30) DEFAULT 'pending', payment_method VARCHAR(50), image_filename TEXT, created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP)")
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS processing_history (id {id_serial}, user_id INTEGER NOT NULL, original_filename TEXT NOT NULL, processed_filename TEXT NOT NULL, style VARCHAR(50) NOT NULL, processing_time DOUBLE PRECISION, created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP)")
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS user_logs (id {id_serial}, user_id INTEGER NOT NULL, action VARCHAR(50) NOT NULL, details TEXT, created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP)")
+
+
+def _add_account_columns(db, cursor):
+    add_column(db, cursor, "users", "role", "VARCHAR(20) DEFAULT 'user'")
+    add_column(db, cursor, "users", "last_logout", "TIMESTAMP WITH TIME ZONE")
+    add_column(db, cursor, "users", "last_active", "TIMESTAMP WITH TIME ZONE")
+    add_column(db, cursor, "users", "is_verified", f"BOOLEAN DEFAULT {db.bool_false}")
+    add_column(db, cursor, "users", "auto_delete_days", "INTEGER DEFAULT 0")  # 0 = Never
+    add_column(db, cursor, "users", "failed_attempts", "INTEGER DEFAULT 0")
+    add_column(db, cursor, "users", "lockout_until", "TIMESTAMP WITH TIME ZONE")
+    add_column(db, cursor, "users", "plan", "VARCHAR(20) DEFAULT 'starter'")
+
+
+def _create_default_admin(db, cursor):
+    cursor.execute("SELECT id FROM users WHERE username = 'admin'")
+    if cursor.fetchone():
+        return
+    import bcrypt
+    print("👤 Initializing System: Creating default administrator...")
+    pw = bcrypt.hashpw("admin123".encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    cursor.execute(f"""
+        INSERT INTO users (username, email, password_hash, full_name, role, is_verified)
+        VALUES ({db.placeholder}, {db.placeholder}, {db.placeholder}, {db.placeholder}, {db.placeholder}, {db.placeholder})
+    """, ("admin", "admin@toonify.ai", pw, "System Admin", "admin", True if db.is_postgres else 1))
+
+
+def _create_base_indexes(db, cursor):
+    # Milestone 3 optimization
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_history_user_id ON processing_history(user_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_history_filename ON processing_history(processed_filename)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_filename ON transactions(image_filename)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_user_id ON transactions(user_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_history_user_style ON processing_history(user_id, style)")
+
+
+def _create_dna_presets(db, cursor):
+    # Saved Style DNA presets (reference Lab statistics + CLAHE settings as JSON)
+    id_serial = "SERIAL PRIMARY KEY" if db.is_postgres else "INTEGER PRIMARY KEY AUTOINCREMENT"
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS style_dna_presets (id {id_serial}, owner_id INTEGER NOT NULL, name VARCHAR(100) NOT NULL, dna TEXT NOT NULL, is_public BOOLEAN DEFAULT {db.bool_false}, created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_dna_presets_owner ON style_dna_presets(owner_id)")
+
+
+def _add_history_pixels(db, cursor):
+    # Pixel count of the processed frame, used by the processing cost model
+    add_column(db, cursor, "processing_history", "pixels", "INTEGER")
+
+
+def _create_gallery_indexes(db, cursor):
+    # Keyset gallery pagination (newest first) and the per-user paid-status lookup
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_history_user_created ON processing_history(user_id, created_at DESC, id DESC)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_history_user_style_created ON processing_history(user_id, style, created_at DESC, id DESC)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_user_filename ON transactions(user_id, image_filename)")
+
+
+def _create_user_stats(db, cursor):
+    # Materialized dashboard stats, maintained incrementally and rebuilt lazily per user
+    cursor.execute("CREATE TABLE IF NOT EXISTS user_stats (user_id INTEGER PRIMARY KEY, total_processed INTEGER NOT NULL DEFAULT 0, total_transactions INTEGER NOT NULL DEFAULT 0, total_spent DOUBLE PRECISION NOT NULL DEFAULT 0, favorite_style VARCHAR(50), favorite_count INTEGER NOT NULL DEFAULT 0, updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP)")
+    cursor.execute("CREATE TABLE IF NOT EXISTS user_style_counts (user_id INTEGER NOT NULL, style VARCHAR(50) NOT NULL, image_count INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (user_id, style))")
+
+
+def _create_history_created_index(db, cursor):
+    # Recent-window scans (quota rebuild)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_history_created ON processing_history(created_at)")
+
+
+def _create_admin_rollups(db, cursor):
+    # Admin analytics rollups, one row per UTC day, refreshed periodically
+    cursor.execute("CREATE TABLE IF NOT EXISTS admin_daily_rollups (day VARCHAR(10) PRIMARY KEY, creations INTEGER NOT NULL DEFAULT 0, revenue DOUBLE PRECISION NOT NULL DEFAULT 0, active_users INTEGER NOT NULL DEFAULT 0, new_users INTEGER NOT NULL DEFAULT 0, refreshed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP)")
+    # Keyset admin listings and the day-range scans of the rollup refresh
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_created ON users(created_at DESC, id DESC)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_created ON transactions(created_at DESC, id DESC)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_logs_created ON user_logs(created_at)")
+
+
+def _repair_legacy_razorpay(db, cursor):
+    result = db.repair_legacy_razorpay_amounts(cursor)
+    if result["fixed_amount_rows"] or result["fixed_currency_rows"]:
+        print(f"🔧 Repaired legacy Razorpay rows: {result}")
+
+
+def _create_jobs(db, cursor):
+    # Background job state (progressive renders), polled from any worker; times are epoch seconds
+    cursor.execute("CREATE TABLE IF NOT EXISTS jobs (id VARCHAR(64) PRIMARY KEY, owner_id INTEGER, status VARCHAR(20) NOT NULL, result TEXT, error TEXT, created_at DOUBLE PRECISION NOT NULL, finished_at DOUBLE PRECISION)")
+
+
+def _add_history_quality(db, cursor):
+    # Render tier of each history row, so the cost model can fit tiers separately
+    add_column(db, cursor, "processing_history", "quality", "VARCHAR(10)")
+
+
+def _create_quota_reservations(db, cursor):
+    # Starter quota units held by in-flight requests, shared by every worker process
+    cursor.execute("CREATE TABLE IF NOT EXISTS quota_reservations (user_id INTEGER PRIMARY KEY, reserved INTEGER NOT NULL DEFAULT 0, reserved_at TIMESTAMP)")
+
+
+def _create_quota_buckets(db, cursor):
+    # Hourly Starter usage per user, written with each history insert; seeded from the last day of history
+    cursor.execute("CREATE TABLE IF NOT EXISTS quota_buckets (user_id INTEGER NOT NULL, bucket BIGINT NOT NULL, uses INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (user_id, bucket))")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_quota_buckets_bucket ON quota_buckets(bucket)")
+    if db.is_postgres:
+        bucket_sql = "FLOOR(EXTRACT(EPOCH FROM created_at) / 3600)::BIGINT"
+        since_sql = "NOW() - INTERVAL '24 HOURS'"
+    else:
+        bucket_sql = "CAST(strftime('%s', created_at) AS INTEGER) / 3600"
+        since_sql = "datetime('now', '-24 hours')"
+    cursor.execute(f"""
+        INSERT INTO quota_buckets (user_id, bucket, uses)
+        SELECT user_id, {bucket_sql}, COUNT(*) FROM processing_history
+        WHERE created_at >= {since_sql}
+        GROUP BY user_id, {bucket_sql}
+        ON CONFLICT (user_id, bucket) DO NOTHING
+    """)
+
+
+def _create_logs_user_index(db, cursor):
+    # Per-user activity trail for the admin audit view (recent logs use idx_logs_created)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_logs_user_created ON user_logs(user_id, created_at DESC)")
+
+
+def _create_audit_indexes(db, cursor):
+    # Gaps found by scripts/query_plan_audit.py
+    # Paid check reads status from the index; supersedes (user_id, image_filename)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_user_file_status ON transactions(user_id, image_filename, status)")
+    cursor.execute("DROP INDEX IF EXISTS idx_transactions_user_filename")
+    # Per-user transaction list without a sort
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_user_created ON transactions(user_id, created_at DESC)")
+    # Latest verification code per email
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_verification_email_created ON verification_codes(email, created_at DESC)")
+    # Admin "active today" count
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_last_login ON users(last_login)")
+
+
+# (version, name, apply) in order; append new migrations, never edit applied ones
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, "core_tables", _create_core_tables),
+    (2, "account_columns", _add_account_columns),
+    (3, "default_admin", _create_default_admin),
+    (4, "base_indexes", _create_base_indexes),
+    (5, "style_dna_presets", _create_dna_presets),
+    (6, "history_pixels", _add_history_pixels),
+    (7, "gallery_indexes", _create_gallery_indexes),
+    (8, "user_stats", _create_user_stats),
+    (9, "history_created_index", _create_history_created_index),
+    (10, "admin_rollups", _create_admin_rollups),
+    (11, "repair_legacy_razorpay", _repair_legacy_razorpay),
+    (12, "jobs", _create_jobs),
+    (13, "history_quality", _add_history_quality),
+    (14, "quota_reservations", _create_quota_reservations),
+    (15, "quota_buckets", _create_quota_buckets),
+    (16, "logs_user_index", _create_logs_user_index),
+    (17, "audit_indexes", _create_audit_indexes),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(db, cursor) -> int:
+    """Highest applied migration (0 for a database created before versioning, or a new one)"""
+    try:
+        cursor.execute("SELECT MAX(version) as version FROM schema_version")
+        row = cursor.fetchone()
+        return int(row['version'] or 0) if row else 0
+    except Exception:
+        # No schema_version table yet; Postgres needs the failed statement rolled back
+        if db.is_postgres:
+            cursor.connection.rollback()
+        return 0
+
+
+def migrate(db, migrations: List[Tuple[int, str, Callable]] = None) -> int:
+    """
+    Apply pending migrations and return the resulting schema version.
+    The fast path is a single version read. Otherwise the runner takes an
+    exclusive lock (a transaction-scoped advisory lock on Postgres, BEGIN
+    IMMEDIATE on SQLite), re-reads the version so a process that waited on
+    another one's migration does nothing, and applies the rest in the same
+    transaction; a failure rolls back every step of this run.
+    """
+    migrations = MIGRATIONS if migrations is None else migrations
+    latest = migrations[-1][0] if migrations else 0
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        version = current_version(db, cursor)
+        if version >= latest:
+            return version
+
+        if db.is_postgres:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_KEY,))
+        else:
+            conn.commit()
+            cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute(SCHEMA_VERSION_SQL)
+        version = current_version(db, cursor)
+
+        for number, name, apply in migrations:
+            if number <= version:
+                continue
+            print(f"🚀 Applying migration {number}: {name}")
+            apply(db, cursor)
+            cursor.execute(f"INSERT INTO schema_version (version, name) VALUES ({db.placeholder}, {db.placeholder})",
+                           (number, name))
+            version = number
+        conn.commit()
+        return version
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
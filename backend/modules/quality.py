@@ -0,0 +1,54 @@
+"""
+Quality tiers
+Per-request render settings (draft / standard / max) and per-plan defaults
+"""
+from typing import Dict, Optional, Tuple
+import config.settings as settings
+
+# Ordered from fastest to best
+QUALITY_TIERS = ("draft", "standard", "max")
+
+# internal_max_width: width heavy styles run at (0 = the full output frame)
+# quantizer: "posterize" (LUT) or "kmeans" (sampled palette fit)
+# None defers to the process-wide FAST_PROCESSING / FAST_STYLE_MAX_WIDTH settings,
+# so "standard" renders exactly as before tiers existed.
+QUALITY_PRESETS: Dict[str, Dict] = {
+    "draft": {
+        "internal_max_width": max(320, int(getattr(settings, "QUALITY_DRAFT_MAX_WIDTH", 640))),
+        "quantizer": "posterize",
+        "kmeans_iterations": 0,
+    },
+    "standard": {
+        "internal_max_width": None,
+        "quantizer": None,
+        "kmeans_iterations": 10,
+    },
+    "max": {
+        "internal_max_width": 0,
+        "quantizer": "kmeans",
+        "kmeans_iterations": 20,
+    },
+}
+
+
+def plan_quality(is_premium: bool = False) -> Tuple[str, str]:
+    """(default, highest allowed) tier of a plan"""
+    if is_premium:
+        return (getattr(settings, "QUALITY_PREMIUM_DEFAULT", "standard"),
+                getattr(settings, "QUALITY_PREMIUM_MAX", "max"))
+    return (getattr(settings, "QUALITY_FREE_DEFAULT", "draft"),
+            getattr(settings, "QUALITY_FREE_MAX", "draft"))
+
+
+def resolve_quality(requested: Optional[str] = None, is_premium: bool = False) -> str:
+    """
+    Effective tier for a request: the plan default when none is requested, capped
+    at the plan's highest tier. Raises ValueError on an unknown tier name.
+    """
+    default, ceiling = plan_quality(is_premium)
+    tier = (requested or default).strip().lower()
+    if tier not in QUALITY_TIERS:
+        raise ValueError(f"Unknown quality tier: {requested}")
+    if ceiling not in QUALITY_TIERS:
+        ceiling = "standard"
+    return min(tier, ceiling, key=QUALITY_TIERS.index)
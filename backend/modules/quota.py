@@ -0,0 +1,168 @@
+"""
+Usage quota
+Per-user usage over a sliding window: hourly buckets and reservations kept in
+the database, with an in-memory copy of the buckets as a read cache
+"""
+import threading
+import time
+from typing import Dict, List, Optional
+import config.settings as settings
+from modules.database import db, QUOTA_BUCKET_SECONDS
+
+BUCKET_SECONDS = QUOTA_BUCKET_SECONDS
+
+
+class QuotaCounter:
+    """
+    Per-user usage over the last window_hours.
+    try_reserve decides in the database (Database.reserve_quota: the user's
+    hourly quota_buckets plus every worker's live reservations), so gunicorn
+    workers cannot each let a user reach the limit. Units reserved count
+    against the limit until settle() hands them back; the used ones are in
+    quota_buckets by then, written with their history rows.
+    The in-memory buckets are only a read cache for usage() (dashboard and
+    limit messages): loaded from quota_buckets on first use and resynced
+    periodically. Without a database they enforce the limit themselves.
+    """
+
+    def __init__(self, database=None, window_hours: int = None, resync_seconds: int = None,
+                 reservation_ttl: int = None):
+        """Initialize an empty counter (built from history on first use)"""
+        self.db = database
+        self.window_hours = max(1, int(window_hours or getattr(settings, "QUOTA_WINDOW_HOURS", 24)))
+        self.resync_seconds = int(resync_seconds if resync_seconds is not None
+                                  else getattr(settings, "QUOTA_RESYNC_SECONDS", 300))
+        self.reservation_ttl = int(reservation_ttl if reservation_ttl is not None
+                                   else getattr(settings, "QUOTA_RESERVATION_TTL_SECONDS", 600))
+        self._buckets: Dict[int, Dict[int, int]] = {}
+        self._reserved: Dict[int, int] = {}
+        # Usage recorded while a rebuild is reading history, re-applied on top of it
+        self._rebuild_log: Optional[List[tuple]] = None
+        self._lock = threading.Lock()
+        self._syncing = False
+        self.synced_at = 0.0
+
+    @staticmethod
+    def bucket(now: float = None) -> int:
+        """Hourly bucket index of a timestamp"""
+        return int((time.time() if now is None else now) // BUCKET_SECONDS)
+
+    def _used(self, user_id: int, now: float = None) -> int:
+        """Recorded usage in the window (caller holds the lock); expired buckets are dropped"""
+        buckets = self._buckets.get(user_id)
+        if not buckets:
+            return 0
+        oldest = self.bucket(now) - self.window_hours + 1
+        for stale in [b for b in buckets if b < oldest]:
+            del buckets[stale]
+        return sum(buckets.values())
+
+    def _add(self, user_id: int, amount: int, now: float = None):
+        key = self.bucket(now)
+        buckets = self._buckets.setdefault(user_id, {})
+        buckets[key] = buckets.get(key, 0) + amount
+        if self._rebuild_log is not None:
+            self._rebuild_log.append((user_id, key, amount))
+
+    def usage(self, user_id: int, now: float = None) -> int:
+        """Recorded plus reserved units in the window"""
+        self.maybe_resync()
+        with self._lock:
+            return self._used(user_id, now) + self._reserved.get(user_id, 0)
+
+    def try_reserve(self, user_id: int, amount: int, limit: int, now: float = None) -> bool:
+        """Reserve amount units if usage stays within limit; check and reserve are atomic"""
+        if self.db is not None:
+            if not self.db.reserve_quota(user_id, amount, limit, self.window_hours, self.reservation_ttl):
+                return False
+            with self._lock:
+                self._reserved[user_id] = self._reserved.get(user_id, 0) + amount
+            return True
+        self.maybe_resync()
+        with self._lock:
+            reserved = self._reserved.get(user_id, 0)
+            if self._used(user_id, now) + reserved + amount > limit:
+                return False
+            self._reserved[user_id] = reserved + amount
+            return True
+
+    def settle(self, user_id: int, reserved: int, used: int, now: float = None):
+        """
+        Finish a request: count used units and hand back the rest of the reservation.
+        reserved 0 records usage from requests that were not quota-checked.
+        """
+        if not user_id:
+            return
+        if reserved and self.db is not None:
+            try:
+                self.db.release_quota(user_id, reserved)
+            except Exception as e:
+                # The reservation goes stale after reservation_ttl instead
+                print(f"Quota release failed: {e}")
+        with self._lock:
+            if reserved:
+                remaining = self._reserved.get(user_id, 0) - reserved
+                if remaining > 0:
+                    self._reserved[user_id] = remaining
+                else:
+                    self._reserved.pop(user_id, None)
+            if used > 0:
+                self._add(user_id, used, now)
+
+    def record(self, user_id: int, amount: int = 1, now: float = None):
+        """Count usage that was not reserved"""
+        self.settle(user_id, 0, amount, now)
+
+    def rebuild(self):
+        """Reload recorded usage from quota_buckets; reservations in flight are kept"""
+        if self.db is None:
+            self.synced_at = time.time()
+            return
+        with self._lock:
+            self._rebuild_log = []
+        try:
+            self.db.prune_quota_buckets(self.window_hours)
+            rows = self.db.get_hourly_usage(self.window_hours)
+        except Exception as e:
+            print(f"Quota rebuild failed: {e}")
+            with self._lock:
+                self._rebuild_log = None
+            self.synced_at = time.time()
+            return
+
+        buckets: Dict[int, Dict[int, int]] = {}
+        for row in rows:
+            buckets.setdefault(row['user_id'], {})[int(row['bucket'])] = int(row['uses'])
+        with self._lock:
+            # Usage recorded during the read may or may not be in the rows; counting it
+            # again errs on the strict side until the next resync
+            for user_id, key, amount in self._rebuild_log:
+                user_buckets = buckets.setdefault(user_id, {})
+                user_buckets[key] = user_buckets.get(key, 0) + amount
+            self._rebuild_log = None
+            self._buckets = buckets
+            self.synced_at = time.time()
+
+    def maybe_resync(self):
+        """Build from history on first use, then refresh in the background once stale"""
+        if not self.synced_at:
+            self.rebuild()
+            return
+        if not self.resync_seconds or time.time() - self.synced_at < self.resync_seconds:
+            return
+        with self._lock:
+            if self._syncing:
+                return
+            self._syncing = True
+
+        def _run():
+            try:
+                self.rebuild()
+            finally:
+                self._syncing = False
+
+        threading.Thread(target=_run, daemon=True).start()
+
+
+# Global quota counter
+quota = QuotaCounter(db)
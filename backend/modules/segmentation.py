@@ -0,0 +1,118 @@
+"""
+Foreground segmentation
+Multi-resolution GrabCut with guided-filter mask upsampling and a per-source mask cache
+"""
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+import cv2
+import numpy as np
+import config.settings as settings
+
+
+def guided_upsample(guide: np.ndarray, mask_small: np.ndarray,
+                    radius: int = 4, eps: float = 1e-3) -> np.ndarray:
+    """
+    Edge-aware upsampling of a low-resolution mask (fast guided filter).
+    The local linear model mask ~ a * guide + b is fitted on the small grid and
+    applied to the full-resolution guide, so mask edges snap to image edges.
+    guide: full-resolution grayscale uint8; mask_small: float32 in [0, 1]
+    Returns: float32 mask in [0, 1] at the guide's resolution
+    """
+    h, w = guide.shape[:2]
+    small_h, small_w = mask_small.shape[:2]
+    guide_small = cv2.resize(guide, (small_w, small_h), interpolation=cv2.INTER_AREA).astype(np.float32) / 255.0
+
+    ksize = (2 * radius + 1, 2 * radius + 1)
+    mean_i = cv2.boxFilter(guide_small, -1, ksize)
+    mean_p = cv2.boxFilter(mask_small, -1, ksize)
+    var_i = cv2.boxFilter(guide_small * guide_small, -1, ksize) - mean_i * mean_i
+    cov_ip = cv2.boxFilter(guide_small * mask_small, -1, ksize) - mean_i * mean_p
+
+    a = cov_ip / (var_i + eps)
+    b = mean_p - a * mean_i
+    mean_a = cv2.resize(cv2.boxFilter(a, -1, ksize), (w, h), interpolation=cv2.INTER_LINEAR)
+    mean_b = cv2.resize(cv2.boxFilter(b, -1, ksize), (w, h), interpolation=cv2.INTER_LINEAR)
+
+    result = cv2.multiply(mean_a, guide, dtype=cv2.CV_32F, scale=1.0 / 255.0)
+    cv2.add(result, mean_b, dst=result)
+    return np.clip(result, 0.0, 1.0, out=result)
+
+
+class Segmenter:
+    """GrabCut foreground masks, computed on a downscaled copy for large images"""
+
+    def __init__(self, max_side: int = None, cache_size: int = None, iterations: int = 5):
+        """Initialize segmentation settings and an empty mask cache"""
+        self.max_side = int(max_side if max_side is not None
+                            else getattr(settings, "SEGMENTATION_MAX_SIDE", 512))
+        self.cache_size = int(cache_size if cache_size is not None
+                              else getattr(settings, "SEGMENTATION_MASK_CACHE_SIZE", 32))
+        self.iterations = iterations
+        self._cache: "OrderedDict[Tuple[str, int, int], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _grabcut(image: np.ndarray, iterations: int) -> np.ndarray:
+        """Binary foreground (255) / background (0) mask from a centred rectangle"""
+        mask = np.zeros(image.shape[:2], np.uint8)
+        bgd_model = np.zeros((1, 65), np.float64)
+        fgd_model = np.zeros((1, 65), np.float64)
+        h, w = image.shape[:2]
+
+        # Use a slightly more conservative rect for primary subject
+        rect = (int(w * 0.05), int(h * 0.05), int(w * 0.9), int(h * 0.9))
+        cv2.grabCut(image, mask, rect, bgd_model, fgd_model, iterations, cv2.GC_INIT_WITH_RECT)
+
+        # Keep both definite (1) and likely (3) foreground
+        return np.where((mask == 1) | (mask == 3), 255, 0).astype(np.uint8)
+
+    def _segment(self, image: np.ndarray) -> np.ndarray:
+        h, w = image.shape[:2]
+        scale = self.max_side / max(h, w) if self.max_side else 1.0
+        if scale >= 1.0:
+            mask = self._grabcut(image, self.iterations)
+        else:
+            small_size = (max(1, int(w * scale)), max(1, int(h * scale)))
+            small = cv2.resize(image, small_size, interpolation=cv2.INTER_AREA)
+            mask_small = self._grabcut(small, self.iterations).astype(np.float32) / 255.0
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            soft = guided_upsample(gray, mask_small)
+            mask = cv2.convertScaleAbs(soft, alpha=255.0)
+
+        # Feathering: dilate to catch hair/clothing strands, then blur for a soft alpha edge
+        mask = cv2.dilate(mask, np.ones((3, 3), np.uint8), iterations=1)
+        return cv2.GaussianBlur(mask, (21, 21), 0)
+
+    def foreground_alpha(self, image: np.ndarray, cache_key: Optional[str] = None) -> np.ndarray:
+        """
+        Feathered single-channel uint8 alpha (255 = foreground) for image.
+        cache_key (e.g. the source filename) lets repeat requests skip segmentation.
+        """
+        h, w = image.shape[:2]
+        key = (cache_key, h, w) if cache_key else None
+        if key:
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    return cached
+
+        alpha = self._segment(image)
+        alpha.setflags(write=False)
+
+        if key and self.cache_size > 0:
+            with self._lock:
+                self._cache[key] = alpha
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return alpha
+
+    def clear(self):
+        """Drop all cached masks"""
+        with self._lock:
+            self._cache.clear()
+
+
+# Global segmenter instance
+segmenter = Segmenter()
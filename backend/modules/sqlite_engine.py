@@ -0,0 +1,205 @@
+"""
+SQLite engine for the no-Postgres deployment
+WAL journaling, per-thread read connections and a single writer thread that
+serializes and group-commits writes
+"""
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from queue import Queue, Empty
+from typing import Dict
+import config.settings as settings
+
+SYNCHRONOUS_LEVELS = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+
+class _ThreadConnection:
+    """
+    A thread's long-lived connection. close() keeps it open for the next call,
+    rolling back anything the caller left uncommitted so no lock outlives the call.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def close(self):
+        if self._conn.in_transaction:
+            self._conn.rollback()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class _JobConnection:
+    """
+    The writer connection as one queued job sees it. The job runs inside a
+    savepoint of the batch transaction: commit() releases its work into the
+    batch, rollback() undoes only its own work, close() is a no-op.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def commit(self):
+        self._conn.execute("RELEASE job")
+        self._conn.execute("SAVEPOINT job")
+
+    def rollback(self):
+        self._conn.execute("ROLLBACK TO job")
+
+    def close(self):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class SQLiteEngine:
+    """
+    Connections for one SQLite file in WAL mode.
+    Readers get one connection per thread (WAL readers never block on the
+    writer). Writes are submitted as callables to a single writer thread, which
+    runs whatever is queued, up to batch_size jobs, in one BEGIN IMMEDIATE
+    transaction with a savepoint per job, so concurrent writers never see
+    "database is locked" and pay one commit between them. Callers block until
+    the batch holding their job has committed, or until write_timeout.
+    The writer is per process: gunicorn workers each run one and still take
+    turns on SQLite's write lock, waiting up to busy_timeout_ms for it; a batch
+    that cannot get the lock fails every job in it.
+    """
+
+    def __init__(self, path: str, busy_timeout_ms: int = None, mmap_size: int = None,
+                 synchronous: str = None, batch_size: int = None, write_timeout: float = None):
+        """Remember the settings (connections and the writer start on first use)"""
+        self.path = path
+        self.busy_timeout_ms = int(busy_timeout_ms if busy_timeout_ms is not None
+                                   else getattr(settings, "SQLITE_BUSY_TIMEOUT_MS", 5000))
+        self.mmap_size = int(mmap_size if mmap_size is not None
+                             else getattr(settings, "SQLITE_MMAP_SIZE", 268435456))
+        self.synchronous = (synchronous or getattr(settings, "SQLITE_SYNCHRONOUS", "NORMAL")).upper()
+        if self.synchronous not in SYNCHRONOUS_LEVELS:
+            raise ValueError(f"Unknown synchronous level '{self.synchronous}'. Use one of: {', '.join(SYNCHRONOUS_LEVELS)}")
+        self.batch_size = max(1, int(batch_size or getattr(settings, "SQLITE_WRITER_BATCH", 64)))
+        self.write_timeout = float(write_timeout or getattr(settings, "SQLITE_WRITE_TIMEOUT_SECONDS", 30))
+        self._local = threading.local()
+        self._queue = Queue()
+        self._writer = None
+        self._writer_pid = None
+        self._start_lock = threading.Lock()
+        self.jobs = 0
+        self.batches = 0
+
+    def _connect(self, **kwargs):
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, **kwargs)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+        conn.execute(f"PRAGMA mmap_size={self.mmap_size}")
+        return conn
+
+    def connection(self):
+        """The current job's connection on the writer thread, else this thread's read connection"""
+        job = getattr(self._local, "job", None)
+        if job is not None:
+            return job
+        # A forked worker must not reuse its parent's connection
+        pid = os.getpid()
+        if getattr(self._local, "pid", None) != pid:
+            self._local.conn, self._local.pid = _ThreadConnection(self._connect()), pid
+        return self._local.conn
+
+    def write(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on the writer thread and return its result (or raise its error)"""
+        if getattr(self._local, "job", None) is not None:
+            # Already inside a write job: join its transaction
+            return fn(*args, **kwargs)
+        future = Future()
+        self._ensure_writer()
+        self._queue.put((future, fn, args, kwargs))
+        try:
+            return future.result(timeout=self.write_timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise sqlite3.OperationalError(f"SQLite write not committed within {self.write_timeout:g}s")
+
+    def _ensure_writer(self):
+        pid = os.getpid()
+        if self._writer_pid == pid and self._writer.is_alive():
+            return
+        with self._start_lock:
+            if self._writer_pid != pid or not self._writer.is_alive():
+                if self._writer_pid != pid:
+                    self._queue = Queue()
+                self._writer = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+                self._writer_pid = pid
+                self._writer.start()
+
+    def _run(self):
+        conn = job_conn = None
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except Empty:
+                    break
+            if conn is None:
+                try:
+                    conn = self._connect(isolation_level=None)
+                except Exception as e:
+                    # Opening can need the write lock too; fail this batch and retry with the next
+                    self._deliver([(future, False, e) for future, *_ in batch])
+                    continue
+                job_conn = _JobConnection(conn)
+            self._run_batch(conn, job_conn, batch)
+
+    def _run_batch(self, conn, job_conn, batch):
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for future, fn, args, kwargs in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT job")
+                self._local.job = job_conn
+                try:
+                    results.append((future, True, fn(*args, **kwargs)))
+                except BaseException as e:
+                    conn.execute("ROLLBACK TO job")
+                    results.append((future, False, e))
+                finally:
+                    self._local.job = None
+                    conn.execute("RELEASE job")
+            conn.execute("COMMIT")
+        except BaseException as e:
+            # The batch itself failed (disk full, lock timeout): nothing in it was written,
+            # including jobs that never started because BEGIN IMMEDIATE did not get the lock
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            results = [(future, False, e) for future, *_ in batch if not future.done()]
+        self.jobs += len(batch)
+        self.batches += 1
+        # Results are delivered only once they are durable
+        self._deliver(results)
+
+    @staticmethod
+    def _deliver(results):
+        for future, ok, value in results:
+            if future.done():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def stats(self) -> Dict:
+        """Writer counters: jobs run, batches committed and the average batch size"""
+        return {
+            "jobs": self.jobs,
+            "batches": self.batches,
+            "avg_batch": round(self.jobs / self.batches, 2) if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+        }
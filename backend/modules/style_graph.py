@@ -0,0 +1,454 @@
+"""
+Declarative style graph engine
+Styles are DAGs of primitive OpenCV ops loaded from data (config/styles.json)
+"""
+import json
+import math
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+import cv2
+import numpy as np
+import config.settings as settings
+from modules.buffer_arena import BufferArena, get_arena
+from modules.compositing import apply_vignette
+from modules.edges import (apply_mask, canny_edges, multiply_mask, scaled_odd,
+                           thicken, threshold_lines, to_gray)
+
+
+class StyleGraphError(Exception):
+    """Raised for invalid style definitions"""
+    pass
+
+
+class Op:
+    """
+    A registered primitive: fn(ctx, params, *inputs, dst=None) -> ndarray.
+    out describes the result buffer the engine preallocates from the arena:
+    "same" (shape of the first input), "gray" (HxW uint8), "bgr" (HxWx3 uint8),
+    or None when the op allocates its own result.
+    """
+
+    def __init__(self, name: str, fn: Callable, arity: int, cost: float, scalable: bool, out: Optional[str]):
+        self.name = name
+        self.fn = fn
+        self.arity = arity
+        self.cost = cost
+        self.scalable = scalable
+        self.out = out
+
+    def output_spec(self, inputs: List[np.ndarray]) -> Optional[Tuple[tuple, np.dtype]]:
+        first = inputs[0]
+        if self.out == "same":
+            return first.shape, first.dtype
+        if self.out == "gray":
+            return first.shape[:2], np.uint8
+        if self.out == "bgr":
+            return first.shape[:2] + (3,), np.uint8
+        return None
+
+    def __call__(self, ctx, params: dict, inputs: List[np.ndarray]) -> np.ndarray:
+        """Run into an arena buffer; the buffer goes back if the op returned something else"""
+        spec = self.output_spec(inputs)
+        dst = ctx.arena.acquire(*spec) if spec else None
+        result = self.fn(ctx, params, *inputs, dst=dst)
+        if dst is not None and result is not dst:
+            ctx.arena.release(dst)
+        return result
+
+
+OPS: Dict[str, Op] = {}
+
+
+def op(name: str, arity: int = 1, cost: float = 1.0, scalable: bool = False, out: Optional[str] = "same"):
+    """
+    Register a primitive op.
+    cost is the relative per-pixel cost; scalable ops may run on a downscaled input
+    (and be upscaled back) when a node budget is configured.
+    """
+    def register(fn):
+        OPS[name] = Op(name, fn, arity, cost, scalable, out)
+        return fn
+    return register
+
+
+class RenderContext:
+    """Per-render settings passed to every op"""
+
+    def __init__(self, quantize: Callable, node_budget: float = 0, quality: Optional[str] = None,
+                 arena: Optional[BufferArena] = None):
+        self.quantize = quantize
+        self.node_budget = node_budget
+        # Quality tier whose per-node parameter overrides apply (None = base params)
+        self.quality = quality
+        self._arena = arena
+
+    @property
+    def arena(self) -> BufferArena:
+        """The arena given at construction, else the shared process-wide one"""
+        return self._arena or get_arena()
+
+
+# --- Primitive ops ---
+# Every op writes its result through OpenCV's dst= into the buffer the engine hands it.
+
+@op("gray", out="gray")
+def _gray(ctx, params, image, dst=None):
+    return to_gray(image, dst=dst)
+
+
+@op("gray_to_bgr", out="bgr")
+def _gray_to_bgr(ctx, params, image, dst=None):
+    return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR, dst=dst)
+
+
+@op("median_blur", cost=2.0)
+def _median_blur(ctx, params, image, dst=None):
+    return cv2.medianBlur(image, params["ksize"], dst=dst)
+
+
+@op("gaussian_blur", cost=2.0, scalable=True)
+def _gaussian_blur(ctx, params, image, dst=None):
+    ksize = params["ksize"]
+    if params.get("scale_with_width"):
+        ksize = scaled_odd(ksize, image.shape[1])
+    return cv2.GaussianBlur(image, (ksize, ksize), 0, dst=dst)
+
+
+@op("edge_preserving", cost=40.0, scalable=True)
+def _edge_preserving(ctx, params, image, dst=None):
+    return cv2.edgePreservingFilter(image, dst=dst, flags=1, sigma_s=params["sigma_s"], sigma_r=params["sigma_r"])
+
+
+@op("stylization", cost=60.0, scalable=True)
+def _stylization(ctx, params, image, dst=None):
+    return cv2.stylization(image, dst=dst, sigma_s=params["sigma_s"], sigma_r=params["sigma_r"])
+
+
+@op("pencil_sketch", cost=60.0, scalable=True)
+def _pencil_sketch(ctx, params, image, dst=None):
+    gray_sketch = ctx.arena.acquire(image.shape[:2], np.uint8)
+    _, color_sketch = cv2.pencilSketch(
+        image, dst1=gray_sketch, dst2=dst,
+        sigma_s=params["sigma_s"], sigma_r=params["sigma_r"], shade_factor=params["shade_factor"]
+    )
+    ctx.arena.release(gray_sketch)
+    return color_sketch
+
+
+@op("adaptive_threshold", cost=3.0)
+def _adaptive_threshold(ctx, params, gray, dst=None):
+    return threshold_lines(gray, params["block_size"], params["c"],
+                                 scale_with_width=params.get("scale_with_width", False), dst=dst)
+
+
+@op("canny", cost=3.0)
+def _canny(ctx, params, gray, dst=None):
+    return canny_edges(gray, params["low"], params["high"], dst=dst)
+
+
+@op("dilate")
+def _dilate(ctx, params, image, dst=None):
+    return thicken(image, params.get("ksize", 2), params.get("iterations", 1), dst=dst)
+
+
+@op("mask", arity=2)
+def _mask(ctx, params, image, mask, dst=None):
+    """Keep image where a binary single-channel mask is set (cleared with invert)"""
+    return apply_mask(image, mask, invert=params.get("invert", False), dst=dst)
+
+
+@op("mask_multiply", arity=2)
+def _mask_multiply(ctx, params, image, mask, dst=None):
+    """Scale all channels of image by a soft single-channel mask"""
+    return multiply_mask(image, mask, scale=params.get("scale", 1.0 / 255.0), dst=dst)
+
+
+@op("bitwise_not")
+def _bitwise_not(ctx, params, image, dst=None):
+    return cv2.bitwise_not(image, dst=dst)
+
+
+@op("bitwise_and", arity=2)
+def _bitwise_and(ctx, params, a, b, dst=None):
+    return cv2.bitwise_and(a, b, dst=dst)
+
+
+@op("add_weighted", arity=2)
+def _add_weighted(ctx, params, a, b, dst=None):
+    return cv2.addWeighted(a, params["alpha"], b, params["beta"], params.get("gamma", 0), dst=dst)
+
+
+@op("multiply", arity=2)
+def _multiply(ctx, params, a, b, dst=None):
+    return cv2.multiply(a, b, dst=dst, scale=params.get("scale", 1.0))
+
+
+@op("divide", arity=2)
+def _divide(ctx, params, a, b, dst=None):
+    return cv2.divide(a, b, dst=dst, scale=params.get("scale", 1.0))
+
+
+@op("quantize", cost=4.0)
+def _quantize(ctx, params, image, dst=None):
+    return ctx.quantize(image, num_colors=params["num_colors"], dst=dst)
+
+
+@op("hsv_scale")
+def _hsv_scale(ctx, params, image, dst=None):
+    """Scale saturation/value in HSV with one fused 3-channel lookup table"""
+    table = _hsv_table(params.get("s", 1.0), params.get("v", 1.0))
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV, dst=ctx.arena.acquire(image.shape, np.uint8))
+    cv2.LUT(hsv, table, dst=hsv)
+    result = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR, dst=dst)
+    ctx.arena.release(hsv)
+    return result
+
+
+_table_lock = threading.Lock()
+_hsv_tables: Dict[Tuple[float, float], np.ndarray] = {}
+_gamma_tables: Dict[float, np.ndarray] = {}
+
+
+def _hsv_table(s: float, v: float) -> np.ndarray:
+    key = (s, v)
+    table = _hsv_tables.get(key)
+    if table is None:
+        values = np.arange(256)
+        table = np.stack([
+            values.astype(np.uint8),
+            np.clip(values * s, 0, 255).astype(np.uint8),
+            np.clip(values * v, 0, 255).astype(np.uint8),
+        ], axis=-1).reshape(256, 1, 3)
+        with _table_lock:
+            _hsv_tables[key] = table
+    return table
+
+
+@op("gamma")
+def _gamma(ctx, params, image, dst=None):
+    gamma = params["gamma"]
+    table = _gamma_tables.get(gamma)
+    if table is None:
+        inv_gamma = 1.0 / gamma
+        table = np.array([((i / 255.0) ** inv_gamma) * 255 for i in np.arange(0, 256)]).astype("uint8")
+        with _table_lock:
+            _gamma_tables[gamma] = table
+    return cv2.LUT(image, table, dst=dst)
+
+
+SEPIA_KERNEL = np.array([[0.272, 0.534, 0.131],
+                         [0.349, 0.686, 0.168],
+                         [0.393, 0.769, 0.189]])
+
+
+@op("sepia")
+def _sepia(ctx, params, image, dst=None):
+    # cv2.transform saturates uint8 output, so no extra clip is needed
+    return cv2.transform(image, SEPIA_KERNEL, dst=dst)
+
+
+@op("vignette")
+def _vignette(ctx, params, image, dst=None):
+    return apply_vignette(image, params.get("strength", 1.0), dst=dst)
+
+
+@op("convert_scale_abs")
+def _convert_scale_abs(ctx, params, image, dst=None):
+    return cv2.convertScaleAbs(image, dst=dst, alpha=params["alpha"], beta=params["beta"])
+
+
+_halftones: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+HALFTONE_CACHE_SIZE = 8
+
+
+@op("halftone", out="gray")
+def _halftone(ctx, params, image, dst=None):
+    """Single-channel dot grid the size of the input (resolution-aware spacing)"""
+    h, w = image.shape[:2]
+    scale_factor = w / 1280.0
+    spacing = max(params.get("min_spacing", 4), int(params["spacing"] * scale_factor))
+    radius = max(1, int(params["radius"] * scale_factor))
+    key = (h, w, spacing, radius)
+    with _table_lock:
+        pattern = _halftones.get(key)
+        if pattern is not None:
+            _halftones.move_to_end(key)
+    if pattern is None:
+        pattern = np.zeros((h, w), dtype=np.uint8)
+        for i in range(0, h, spacing):
+            for j in range(0, w, spacing):
+                cv2.circle(pattern, (j, i), radius, 255, -1)
+        with _table_lock:
+            _halftones[key] = pattern
+            while len(_halftones) > HALFTONE_CACHE_SIZE:
+                _halftones.popitem(last=False)
+    np.copyto(dst, pattern)
+    return dst
+
+
+# --- Graph compilation and execution ---
+
+IMAGE_KEY = ("image",)
+PLAN_CACHE_SIZE = 32
+
+
+class Plan:
+    """A compiled, de-duplicated execution order for a set of styles"""
+
+    def __init__(self, steps: List[Tuple[tuple, Op, dict, List[tuple]]],
+                 outputs: Dict[str, tuple], consumers: Dict[tuple, int]):
+        self.steps = steps
+        self.outputs = outputs
+        self.consumers = consumers
+
+
+class StyleGraph:
+    """Compile style definitions into shared DAGs and execute them"""
+
+    def __init__(self, definitions: Dict[str, Dict]):
+        """Validate definitions; raises StyleGraphError on unknown ops or inputs"""
+        self.definitions = definitions
+        # (sorted styles, quality) -> Plan, least recently used first
+        self._plans: "OrderedDict[Tuple[Tuple[str, ...], Optional[str]], Plan]" = OrderedDict()
+        self._lock = threading.Lock()
+        for style in definitions:
+            self._compile_style(style, {}, [])
+
+    @classmethod
+    def from_file(cls, path) -> "StyleGraph":
+        """Load definitions from a JSON file"""
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @property
+    def styles(self) -> List[str]:
+        return list(self.definitions)
+
+    def _compile_style(self, style: str, keys: Dict[tuple, tuple],
+                       steps: List[Tuple[tuple, Op, dict, List[tuple]]], quality: str = None) -> tuple:
+        """
+        Add a style's nodes to steps (in dependency order), reusing any node whose
+        (op, params, inputs) key is already present. A node's "quality" entry maps
+        tier names to parameter overrides for that tier. Returns the output node key.
+        """
+        definition = self.definitions.get(style)
+        if not definition or "nodes" not in definition or "output" not in definition:
+            raise StyleGraphError(f"Style '{style}' needs 'nodes' and 'output'")
+        nodes = definition["nodes"]
+        resolved: Dict[str, tuple] = {"image": IMAGE_KEY}
+
+        def resolve(name: str, visiting: tuple) -> tuple:
+            if name in resolved:
+                return resolved[name]
+            if name in visiting:
+                raise StyleGraphError(f"Style '{style}' has a cycle through '{name}'")
+            node = nodes.get(name)
+            if node is None:
+                raise StyleGraphError(f"Style '{style}' references unknown node '{name}'")
+            primitive = OPS.get(node.get("op"))
+            if primitive is None:
+                raise StyleGraphError(f"Style '{style}' node '{name}' uses unknown op '{node.get('op')}'")
+            inputs = node.get("inputs", ["image"])
+            if len(inputs) != primitive.arity:
+                raise StyleGraphError(f"Style '{style}' node '{name}': '{primitive.name}' takes {primitive.arity} input(s)")
+
+            overrides = node.get("quality", {})
+            if not isinstance(overrides, dict) or not all(isinstance(v, dict) for v in overrides.values()):
+                raise StyleGraphError(f"Style '{style}' node '{name}': 'quality' maps tiers to parameter overrides")
+
+            input_keys = [resolve(i, visiting + (name,)) for i in inputs]
+            params = node.get("params", {})
+            if quality in overrides:
+                params = {**params, **overrides[quality]}
+            key = (primitive.name, json.dumps(params, sort_keys=True), tuple(input_keys))
+            if key not in keys:
+                keys[key] = key
+                steps.append((key, primitive, params, input_keys))
+            resolved[name] = key
+            return key
+
+        return resolve(definition["output"], ())
+
+    def compile(self, styles: List[str], quality: str = None) -> Plan:
+        """
+        Compile a shared plan for styles at a quality tier. The last PLAN_CACHE_SIZE
+        plans are kept, keyed by the set of styles so request order does not matter.
+        """
+        styles = tuple(sorted(set(styles)))
+        cache_key = (styles, quality)
+        with self._lock:
+            plan = self._plans.get(cache_key)
+            if plan is not None:
+                self._plans.move_to_end(cache_key)
+                return plan
+
+        keys: Dict[tuple, tuple] = {}
+        steps: List[Tuple[tuple, Op, dict, List[tuple]]] = []
+        outputs = {style: self._compile_style(style, keys, steps, quality) for style in styles}
+        consumers: Dict[tuple, int] = {}
+        for _, _, _, input_keys in steps:
+            for input_key in input_keys:
+                consumers[input_key] = consumers.get(input_key, 0) + 1
+
+        plan = Plan(steps, outputs, consumers)
+        with self._lock:
+            self._plans[cache_key] = plan
+            while len(self._plans) > PLAN_CACHE_SIZE:
+                self._plans.popitem(last=False)
+        return plan
+
+    @staticmethod
+    def _execute_step(primitive: Op, params: dict, inputs: List[np.ndarray], ctx: RenderContext) -> np.ndarray:
+        """Run one node, downscaling scalable ops whose cost exceeds the node budget"""
+        h, w = inputs[0].shape[:2]
+        budget = ctx.node_budget
+        if budget and primitive.scalable and primitive.cost * h * w > budget:
+            arena = ctx.arena
+            factor = math.sqrt(budget / (primitive.cost * h * w))
+            small_w, small_h = max(1, int(w * factor)), max(1, int(h * factor))
+            small_inputs = [
+                cv2.resize(i, (small_w, small_h), dst=arena.acquire((small_h, small_w) + i.shape[2:], i.dtype),
+                           interpolation=cv2.INTER_AREA)
+                for i in inputs
+            ]
+            small_result = primitive(ctx, params, small_inputs)
+            result = cv2.resize(small_result, (w, h),
+                                dst=arena.acquire((h, w) + small_result.shape[2:], small_result.dtype),
+                                interpolation=cv2.INTER_LINEAR)
+            for buffer in small_inputs + [small_result]:
+                arena.release(buffer)
+            return result
+        return primitive(ctx, params, inputs)
+
+    def run(self, image: np.ndarray, styles: List[str], ctx: RenderContext) -> Dict[str, np.ndarray]:
+        """
+        Render styles from one image. Shared nodes run once; an intermediate goes
+        back to the shared buffer arena as soon as its last consumer has run.
+        The returned outputs belong to the caller.
+        """
+        plan = self.compile(styles, ctx.quality)
+        pinned = set(plan.outputs.values())
+        remaining = dict(plan.consumers)
+        values: Dict[tuple, np.ndarray] = {IMAGE_KEY: image}
+        arena = ctx.arena
+
+        for key, primitive, params, input_keys in plan.steps:
+            values[key] = self._execute_step(primitive, params, [values[k] for k in input_keys], ctx)
+            for input_key in input_keys:
+                remaining[input_key] -= 1
+                if remaining[input_key] == 0 and input_key not in pinned and input_key != IMAGE_KEY:
+                    arena.release(values.pop(input_key))
+
+        return {style: values[key] for style, key in plan.outputs.items()}
+
+
+def load_style_graph(path=None) -> StyleGraph:
+    """Load the configured style definitions"""
+    path = Path(path or getattr(settings, "STYLE_GRAPH_PATH", settings.BASE_DIR / "config" / "styles.json"))
+    return StyleGraph.from_file(path)
+
+
+# Global style graph instance
+style_graph = load_style_graph()
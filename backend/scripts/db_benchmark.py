@@ -0,0 +1,224 @@
+"""
+Database load benchmark
+Replays the dashboard, gallery, download and admin query mix against a seeded
+database at a given concurrency and reports per-query latency percentiles.
+
+    python scripts/seed_data.py --users 10000 --history 500000
+    python scripts/db_benchmark.py --concurrency 8 --duration 30
+    python scripts/db_benchmark.py --seed --users 2000 --history 50000 --requests 5000
+    python scripts/db_benchmark.py --database-url postgresql://localhost/toonify_dev --mix dashboard=1,admin=1
+
+Users are picked in proportion to their history, so power users dominate the
+traffic as they do in production.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+DEFAULT_MIX = "dashboard=50,gallery=30,download=15,admin=5"
+
+
+def _timed(samples, name, call):
+    start = time.perf_counter()
+    result = call()
+    samples[name].append((time.perf_counter() - start) * 1000)
+    return result
+
+
+def dashboard(db, target, samples, rng):
+    """Dashboard load: recent history, stats and the last-active heartbeat"""
+    user_id = target.pick_user(rng)
+    _timed(samples, "get_user_history", lambda: db.get_user_history(user_id, 10))
+    _timed(samples, "get_user_stats", lambda: db.get_user_stats(user_id))
+    _timed(samples, "update_last_active", lambda: db.update_last_active(user_id))
+
+
+def gallery(db, target, samples, rng):
+    """Gallery: the first page, then the next one for most visits"""
+    user_id = target.pick_user(rng)
+    page = _timed(samples, "get_gallery_page", lambda: db.get_gallery_page(user_id, include_total=True))
+    if page["next_cursor"] and rng.random() < 0.6:
+        _timed(samples, "get_gallery_page(next)",
+               lambda: db.get_gallery_page(user_id, cursor_token=page["next_cursor"]))
+
+
+def download(db, target, samples, rng):
+    """Download: the purchase check for one of the user's images"""
+    user_id, filename = rng.choice(target.purchases)
+    _timed(samples, "get_transaction_by_filename", lambda: db.get_transaction_by_filename(user_id, filename))
+
+
+def admin(db, target, samples, rng):
+    """Admin dashboard: cached stats, first user and transaction pages, recent logs"""
+    _timed(samples, "admin_dashboard_stats", target.analytics.dashboard_stats)
+    _timed(samples, "list_users_admin", lambda: db.list_users_admin(limit=50))
+    _timed(samples, "list_transactions_admin", lambda: db.list_transactions_admin(limit=50))
+    _timed(samples, "get_recent_activity_logs", lambda: db.get_recent_activity_logs(100))
+
+
+SCENARIOS = {"dashboard": dashboard, "gallery": gallery, "download": download, "admin": admin}
+
+
+class Target:
+    """Users weighted by activity and purchased images, read once from the database"""
+
+    def __init__(self, db, analytics):
+        self.analytics = analytics
+        conn = db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT user_id, COUNT(*) as total FROM processing_history GROUP BY user_id")
+        rows = cursor.fetchall()
+        self.users = [row['user_id'] for row in rows]
+        self.weights = [row['total'] for row in rows]
+        cursor.execute("SELECT user_id, image_filename FROM transactions WHERE image_filename IS NOT NULL LIMIT 10000")
+        self.purchases = [(row['user_id'], row['image_filename']) for row in cursor.fetchall()]
+        conn.close()
+        if not self.users:
+            raise SystemExit("❌ No processing history to replay: run scripts/seed_data.py or pass --seed")
+        if not self.purchases:
+            self.purchases = [(user_id, "missing.jpg") for user_id in self.users[:100]]
+
+    def pick_user(self, rng):
+        return rng.choices(self.users, self.weights)[0]
+
+
+def parse_mix(text: str) -> dict:
+    """'dashboard=50,admin=5' -> {'dashboard': 50.0, 'admin': 5.0}"""
+    mix = {}
+    for part in filter(None, (part.strip() for part in text.split(","))):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario '{name}' (choose from {', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("The mix needs at least one scenario with a positive weight")
+    return mix
+
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile of values, which must be sorted"""
+    if not values:
+        return 0.0
+    rank = max(1, min(len(values), int(round(pct / 100 * len(values) + 0.5))))
+    return values[rank - 1]
+
+
+def run(db, target, mix: dict, concurrency: int = 4, requests: int = 1000, duration: float = None,
+        seed: int = 7) -> dict:
+    """
+    Replay the mix from `concurrency` threads until `requests` scenarios have run
+    (or `duration` seconds have passed, when given).
+    Returns {"samples": {query: [ms, ...]}, "scenarios": {name: [ms, ...]}, "errors": {name: count}, "elapsed"}
+    """
+    names, weights = list(mix), list(mix.values())
+    lock = threading.Lock()
+    remaining = [requests]
+    deadline = time.perf_counter() + duration if duration else None
+    results = []
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        samples, scenarios, errors = defaultdict(list), defaultdict(list), defaultdict(int)
+        while True:
+            if deadline:
+                if time.perf_counter() >= deadline:
+                    break
+            else:
+                with lock:
+                    if remaining[0] <= 0:
+                        break
+                    remaining[0] -= 1
+            name = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                SCENARIOS[name](db, target, samples, rng)
+                scenarios[name].append((time.perf_counter() - start) * 1000)
+            except Exception as e:
+                errors[f"{name}: {type(e).__name__}"] += 1
+        with lock:
+            results.append((samples, scenarios, errors))
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(max(1, concurrency))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    merged = {"samples": defaultdict(list), "scenarios": defaultdict(list), "errors": defaultdict(int),
+              "elapsed": elapsed}
+    for samples, scenarios, errors in results:
+        for key, values in samples.items():
+            merged["samples"][key].extend(values)
+        for key, values in scenarios.items():
+            merged["scenarios"][key].extend(values)
+        for key, count in errors.items():
+            merged["errors"][key] += count
+    return merged
+
+
+def report(result: dict):
+    def table(title, groups):
+        print(f"\n{title:<30} {'count':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}  (ms)")
+        for name in sorted(groups):
+            values = sorted(groups[name])
+            print(f"{name:<30} {len(values):>7} {percentile(values, 50):>8.2f} {percentile(values, 95):>8.2f} "
+                  f"{percentile(values, 99):>8.2f} {values[-1]:>8.2f}")
+
+    table("Query", result["samples"])
+    table("Scenario", result["scenarios"])
+    completed = sum(len(values) for values in result["scenarios"].values())
+    print(f"\n{completed} scenarios in {result['elapsed']:.1f}s ({completed / result['elapsed']:.0f}/s)")
+    for name, count in sorted(result["errors"].items()):
+        print(f"❌ {name}: {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db-path", default=str(Path(__file__).parent.parent / "data" / "seed.db"))
+    parser.add_argument("--database-url", help="local Postgres database to benchmark instead of SQLite")
+    parser.add_argument("--concurrency", type=int, default=4, help="worker threads")
+    parser.add_argument("--requests", type=int, default=2000, help="scenarios to run in total")
+    parser.add_argument("--duration", type=float, help="run for this many seconds instead of --requests")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"scenario weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--seed", action="store_true", help="seed the database first (see scripts/seed_data.py)")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--history", type=int, default=20000)
+    args = parser.parse_args()
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    # Point the app's settings at the target before anything opens the default database
+    os.environ.pop("DATABASE_URI", None)
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        os.environ.pop("DATABASE_URL", None)
+        os.environ["DATABASE_PATH"] = args.db_path
+    from modules.database import db
+    from modules.admin_analytics import AdminAnalytics
+
+    if args.seed:
+        from scripts.seed_data import seed
+        print(f"🌱 Seeding {args.users} users and {args.history} history rows...")
+        seed(db, users=args.users, history=args.history, transactions=args.history // 20, logs=args.history // 2)
+
+    target = Target(db, AdminAnalytics(db))
+    print(f"🏁 {len(target.users)} active users, mix {args.mix}, concurrency {args.concurrency}, "
+          + (f"{args.duration:g}s" if args.duration else f"{args.requests} scenarios"))
+    report(run(db, target, mix, args.concurrency, args.requests, args.duration))
+
+
+if __name__ == "__main__":
+    main()
@@ -17,10 +17,10 @@ def initialize_database():
     print("🔧 Initializing Toonify database...")
     print(f"📁 Database location: {settings.DATABASE_PATH}")
     
-    # Database is automatically initialized in Database.__init__()
+    # Database is automatically migrated in Database.__init__()
     # This script confirms it and shows the structure
     
-    print("\n✅ Database initialized successfully!")
+    print(f"\n✅ Database initialized successfully! (schema version {db.init_database()})")
     print("\n📊 Database Tables Created:")
     print("  - users: User accounts and authentication")
     print("  - transactions: Payment records")
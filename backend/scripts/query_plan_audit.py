@@ -0,0 +1,285 @@
+"""
+Query plan audit
+Seeds a scratch database, exercises every Database query, and flags full table
+scans and sorts in their plans (EXPLAIN QUERY PLAN on SQLite, EXPLAIN ANALYZE on Postgres).
+
+    python scripts/query_plan_audit.py                       # temporary SQLite file
+    python scripts/query_plan_audit.py --database-url URL    # scratch Postgres database
+
+Sorts (temp B-trees) are reported but only unexpected scans fail the audit
+(exit status 1).
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scripts.seed_data import seed
+
+# Tables that stay small whatever the traffic; scanning them is fine
+SMALL_TABLES = {"schema_version", "admin_daily_rollups", "verification_codes", "style_dna_presets", "jobs"}
+
+class _RecordingCursor:
+    """Cursor proxy that records each statement with the label of the step that issued it"""
+
+    def __init__(self, cursor, log, label):
+        self._cursor, self._log, self._label = cursor, log, label
+
+    def execute(self, sql, params=None):
+        self._log.append((self._label[0], sql, tuple(params or ())))
+        return self._cursor.execute(sql, params) if params is not None else self._cursor.execute(sql)
+
+    def executemany(self, sql, rows):
+        rows = list(rows)
+        if rows:
+            self._log.append((self._label[0], sql, tuple(rows[0])))
+        return self._cursor.executemany(sql, rows)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class _RecordingConnection:
+    def __init__(self, conn, log, label):
+        self._conn, self._log, self._label = conn, log, label
+
+    def cursor(self, *args, **kwargs):
+        return _RecordingCursor(self._conn.cursor(*args, **kwargs), self._log, self._label)
+
+    def execute(self, sql, params=()):
+        self._log.append((self._label[0], sql, tuple(params)))
+        return self._conn.execute(sql, params)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def exercise(db, user_ids):
+    """
+    (label, call) for every Database query path, reads before writes. Plain
+    INSERTs run but have no plan to explain; the lookups and stats updates the
+    insert paths issue are audited. Left out: init_database and the migrations
+    (schema changes run once at startup, not per request).
+    """
+    # The busiest seeded user, so history and transaction lookups hit real rows
+    marks = ", ".join([db.placeholder] * len(user_ids))
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT user_id, COUNT(*) as total FROM processing_history WHERE user_id IN ({marks})
+        GROUP BY user_id ORDER BY total DESC LIMIT 1
+    """, tuple(user_ids))
+    user_id = cursor.fetchone()['user_id']
+    cursor.execute(f"SELECT processed_filename, id FROM processing_history WHERE user_id = {db.placeholder} LIMIT 1",
+                   (user_id,))
+    row = cursor.fetchone()
+    filename, history_id = row['processed_filename'], row['id']
+    cursor.execute("SELECT transaction_id FROM transactions LIMIT 1")
+    row = cursor.fetchone()
+    transaction_id = row['transaction_id'] if row else "pay_missing"
+    conn.close()
+
+    page = db.get_gallery_page(user_id, limit=5)
+    users_page = db.list_users_admin(limit=5)
+    transactions_page = db.list_transactions_admin(limit=5)
+    expires = datetime.utcnow() + timedelta(minutes=10)
+    # Rows created by one step and used by a later one
+    created = {}
+    return [
+        ("get_user_by_username", lambda: db.get_user_by_username(f"seed_{user_id}")),
+        ("get_user_by_email", lambda: db.get_user_by_email(f"seed_{user_id}@example.com")),
+        ("get_user_by_id", lambda: db.get_user_by_id(user_id)),
+        ("get_user_transactions", lambda: db.get_user_transactions(user_id)),
+        ("get_transaction_by_filename", lambda: db.get_transaction_by_filename(user_id, filename)),
+        ("get_transaction_by_id", lambda: db.get_transaction_by_id(transaction_id)),
+        ("get_processing_time_samples", lambda: db.get_processing_time_samples()),
+        ("get_user_history", lambda: db.get_user_history(user_id)),
+        ("get_advanced_history", lambda: db.get_advanced_history(user_id, style="anime", limit=20, offset=20)),
+        ("get_gallery_page", lambda: db.get_gallery_page(user_id, limit=5, cursor_token=page["next_cursor"],
+                                                         include_total=True)),
+        ("get_gallery_page(style)", lambda: db.get_gallery_page(user_id, limit=5, style="sketch")),
+        ("list_dna_presets", lambda: db.list_dna_presets(user_id)),
+        ("get_user_stats", lambda: db.get_user_stats(user_id)),
+        ("rebuild_user_stats", lambda: db.rebuild_user_stats(user_id)),
+        ("get_user_usage_24h", lambda: db.get_user_usage_24h(user_id)),
+        ("get_hourly_usage", lambda: db.get_hourly_usage(24)),
+        ("prune_quota_buckets", lambda: db.prune_quota_buckets(24)),
+        ("get_admin_rollups", lambda: db.get_admin_rollups(30)),
+        ("refresh_admin_rollups(incremental)", lambda: db.refresh_admin_rollups(2)),
+        ("get_admin_dashboard_stats", lambda: db.get_admin_dashboard_stats()),
+        ("get_recent_activity_logs", lambda: db.get_recent_activity_logs(100)),
+        ("get_user_activity_logs_admin", lambda: db.get_user_activity_logs_admin(user_id)),
+        ("list_users_admin", lambda: db.list_users_admin(limit=5, cursor_token=users_page["next_cursor"])),
+        ("list_transactions_admin", lambda: db.list_transactions_admin(limit=5,
+                                                                       cursor_token=transactions_page["next_cursor"])),
+        ("reserve_quota", lambda: db.reserve_quota(user_id, 1, 10 ** 6)),
+        ("release_quota", lambda: db.release_quota(user_id, 1)),
+        ("create_job", lambda: db.create_job("audit", user_id)),
+        ("update_job", lambda: db.update_job("audit", "done", {"ok": True}, finished_at=0)),
+        ("get_job", lambda: db.get_job("audit")),
+        ("prune_jobs", lambda: db.prune_jobs(3600)),
+        ("update_last_login", lambda: db.update_last_login(user_id)),
+        ("update_last_active", lambda: db.update_last_active(user_id)),
+        ("update_user_lockout", lambda: db.update_user_lockout(user_id, 0)),
+        ("update_user_plan", lambda: db.update_user_plan(user_id, "pro")),
+        ("store_verification_code", lambda: db.store_verification_code(f"seed_{user_id}@example.com", "123456", expires)),
+        ("get_verification_code", lambda: db.get_verification_code(f"seed_{user_id}@example.com")),
+        ("verify_user_email", lambda: db.verify_user_email(f"seed_{user_id}@example.com")),
+        ("create_user", lambda: created.update(user=db.create_user("audit_user", "audit_user@example.com", "hash"))),
+        ("update_user_profile", lambda: db.update_user_profile(created["user"], full_name="Audit User")),
+        ("change_password", lambda: db.change_password(created["user"], "new_hash")),
+        ("update_last_logout", lambda: db.update_last_logout(user_id)),
+        ("create_dna_preset", lambda: created.update(preset=db.create_dna_preset(user_id, "audit", {"edge_weight": 1.0}))),
+        ("get_dna_preset", lambda: db.get_dna_preset(created["preset"], user_id)),
+        ("delete_dna_preset", lambda: db.delete_dna_preset(created["preset"], user_id)),
+        ("create_transaction", lambda: db.create_transaction(user_id, "pay_audit", 28.0, filename, "razorpay")),
+        ("update_transaction_status", lambda: db.update_transaction_status("pay_audit", "completed")),
+        ("add_processing_history", lambda: db.add_processing_history(user_id, "in.jpg", "audit.jpg", "anime", 0.1)),
+        ("add_processing_history_bulk", lambda: db.add_processing_history_bulk(
+            [(user_id, "in.jpg", f"audit_{i}.jpg", style, 0.1, 640 * 480, "standard")
+             for i, style in enumerate(("anime", "anime", "sketch"))])),
+        ("log_user_activity", lambda: db.log_user_activity(user_id, "audit", "single")),
+        ("log_user_activity_bulk", lambda: db.log_user_activity_bulk([(user_id, "audit", "bulk")] * 3)),
+        ("repair_legacy_razorpay_amounts", lambda: db.repair_legacy_razorpay_amounts()),
+        ("refresh_admin_rollups(full)", lambda: db.refresh_admin_rollups()),
+        ("delete_user_history", lambda: db.delete_user_history(user_id, history_id)),
+        ("update_user_settings", lambda: db.update_user_settings(user_id, 30)),
+        ("cleanup_old_history", lambda: db.cleanup_old_history(user_id)),
+        ("prune_activity_logs", lambda: db.prune_activity_logs(90)),
+    ]
+
+
+def _explainable(sql: str) -> bool:
+    head = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+    return head in ("SELECT", "UPDATE", "DELETE", "WITH")
+
+
+def _sqlite_findings(db, sql, params):
+    conn = db.get_connection()
+    try:
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    finally:
+        conn.close()
+    details = [row[3] for row in rows]
+    findings = []
+    for detail in details:
+        words = detail.split()
+        if words[:1] == ["SCAN"] and len(words) >= 2 and "USING" not in words and words[1] not in SMALL_TABLES:
+            findings.append(("scan", f"full scan of {words[1]}"))
+        elif detail.startswith("USE TEMP B-TREE"):
+            findings.append(("sort", detail.lower()))
+    return details, findings
+
+
+def _postgres_findings(db, sql, params):
+    conn = db.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()
+        plan = plan["QUERY PLAN"] if isinstance(plan, dict) else plan[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+    finally:
+        # EXPLAIN ANALYZE executes the statement; never keep its writes
+        conn.rollback()
+        conn.close()
+
+    details, findings = [], []
+
+    def walk(node, depth=0):
+        relation = node.get("Relation Name")
+        details.append("  " * depth + node["Node Type"] + (f" on {relation}" if relation else "")
+                       + f" (rows={node.get('Actual Rows')}, {node.get('Actual Total Time')} ms)")
+        if node["Node Type"] == "Seq Scan" and relation not in SMALL_TABLES:
+            findings.append(("scan", f"sequential scan of {relation}"))
+        elif node["Node Type"] in ("Sort", "Incremental Sort"):
+            findings.append(("sort", f"sort on {', '.join(node.get('Sort Key', []))}"))
+        for child in node.get("Plans", []):
+            walk(child, depth + 1)
+
+    walk(plan[0]["Plan"])
+    return details, findings
+
+
+# Scans that are inherent to the query (whole-table aggregates), not missing indexes
+EXPECTED = {
+    "get_processing_time_samples": "newest samples across all users, read by id",
+    "repair_legacy_razorpay_amounts": "one-off migration over every transaction",
+    "refresh_admin_rollups(full)": "rebuilds every day from the whole tables",
+}
+
+
+def audit(db, user_ids, verbose: bool = False) -> int:
+    """Run the exercise, explain each distinct statement, print findings; returns the unexpected count"""
+    log, label = [], [None]
+    original = db.get_connection
+    db.get_connection = lambda: _RecordingConnection(original(), log, label)
+    try:
+        for name, call in exercise(db, user_ids):
+            label[0] = name
+            call()
+    finally:
+        db.get_connection = original
+
+    seen, unexpected, sorts = set(), 0, 0
+    for name, sql, params in log:
+        key = " ".join(sql.split())
+        # Unlabelled statements come from the exercise setup, not a Database method
+        if name is None or key in seen or not _explainable(sql):
+            continue
+        seen.add(key)
+        explain = _postgres_findings if db.is_postgres else _sqlite_findings
+        details, findings = explain(db, sql, params)
+        scans = [text for kind, text in findings if kind == "scan"]
+        if scans and name not in EXPECTED:
+            unexpected += 1
+            status = "SCAN"
+        elif scans:
+            status = "EXP "
+        elif findings:
+            sorts += 1
+            status = "SORT"
+        else:
+            status = "OK  "
+        print(f"[{status}] {name}: {key[:110]}")
+        for kind, text in findings:
+            note = f" (expected: {EXPECTED[name]})" if kind == "scan" and name in EXPECTED else ""
+            print(f"         {'⚠️ ' if kind == 'scan' else '· '} {text}{note}")
+        if verbose:
+            for detail in details:
+                print(f"         {detail}")
+    print(f"\n{len(seen)} statements audited: {unexpected} with unexpected scans, {sorts} with sorts only")
+    return unexpected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", help="scratch Postgres database (default: temporary SQLite file)")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--history", type=int, default=20000, help="processing_history rows to seed")
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args()
+
+    # Point the app's settings at the scratch database before anything opens the default one
+    os.environ.pop("DATABASE_URI", None)
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        os.environ.pop("DATABASE_URL", None)
+        os.environ["DATABASE_PATH"] = str(Path(tempfile.mkdtemp()) / "audit.db")
+    from modules.database import db
+
+    user_ids = seed(db, users=args.users, history=args.history, transactions=args.history // 20,
+                    logs=args.history // 2)
+    sys.exit(1 if audit(db, user_ids, args.verbose) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Synthetic data seeder
+Generates users, processing history, transactions and activity logs with
+production-like distributions, for load testing and query plan work.
+
+    python scripts/seed_data.py --users 10000 --history 500000 --transactions 20000 --logs 200000
+    python scripts/seed_data.py --database-url postgresql://localhost/toonify_dev ...
+
+SQLite output goes to data/seed.db by default; run the app against it with
+DATABASE_PATH=data/seed.db. Seeded users log in with the password "seedpass".
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Relative popularity of styles and plans
+STYLE_WEIGHTS = {
+    "cartoon": 24, "anime": 20, "ghibli": 14, "sketch": 10, "comic_book": 8, "pencil_color": 7,
+    "oil_painting": 6, "watercolor": 5, "pop_art": 3, "vintage": 3,
+}
+# Per-megapixel render cost is much higher for the heavy styles (see ImageProcessor.HEAVY_STYLES)
+HEAVY_STYLES = {"cartoon", "oil_painting", "watercolor", "anime", "ghibli", "comic_book"}
+PLAN_WEIGHTS = {"starter": 85, "pro": 12, "elite": 3}
+# Output frame sizes (pixels) from draft previews up to 4K
+FRAME_PIXELS = [640 * 360, 1280 * 720, 1920 * 1080, 2560 * 1440, 3840 * 2160]
+FRAME_WEIGHTS = [10, 30, 40, 15, 5]
+ACTION_WEIGHTS = {"stylize": 50, "login": 28, "logout": 14, "payment": 5, "subscription": 2, "dna_preset": 1}
+# Share of traffic per UTC hour: quiet nights, busy evenings
+HOUR_WEIGHTS = [2, 1, 1, 1, 1, 2, 3, 4, 5, 6, 6, 6, 7, 7, 7, 7, 8, 9, 10, 10, 9, 7, 5, 3]
+TRANSACTION_STATUS_WEIGHTS = {"completed": 80, "pending": 15, "failed": 5}
+
+CHUNK_SIZE = 10000
+
+
+class _Clock:
+    """Timestamps after a lower bound, following the hourly traffic curve"""
+
+    def __init__(self, rng: random.Random, now: datetime):
+        self.rng, self.now = rng, now
+
+    def after(self, start: datetime) -> datetime:
+        span_days = max(0, (self.now - start).days)
+        day = start.date() + timedelta(days=self.rng.randint(0, span_days))
+        hour = self.rng.choices(range(24), HOUR_WEIGHTS)[0]
+        moment = datetime(day.year, day.month, day.day, hour, self.rng.randint(0, 59), self.rng.randint(0, 59))
+        return min(max(moment, start), self.now)
+
+
+def _fmt(moment: datetime) -> str:
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def seed(db, users: int = 1000, history: int = 20000, transactions: int = 1000, logs: int = 10000,
+         days: int = 180, seed: int = 42, verbose: bool = False) -> list:
+    """
+    Insert synthetic rows into db and return the new user ids.
+    Activity is heavy-tailed (Zipf-like: a few power users make most images),
+    signups grow toward the present, timestamps follow a daily traffic curve,
+    and transactions are purchases of seeded history images.
+    """
+    import bcrypt
+    rng = random.Random(seed)
+    clock = _Clock(rng, datetime.utcnow().replace(microsecond=0))
+    password_hash = bcrypt.hashpw(b"seedpass", bcrypt.gensalt(rounds=4)).decode('utf-8')
+
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT COALESCE(MAX(id), 0) as top FROM users")
+    first = cursor.fetchone()['top'] + 1
+    cursor.execute("SELECT COUNT(*) as total FROM processing_history")
+    batch_tag = f"{first}_{cursor.fetchone()['total']}"
+
+    def insert(table, columns, rows):
+        for start in range(0, len(rows), CHUNK_SIZE):
+            db._insert_many(cursor, table, columns, rows[start:start + CHUNK_SIZE])
+        conn.commit()
+        if verbose:
+            print(f"  {table}: {len(rows)} rows")
+
+    # Users: signup age skewed toward recent days
+    user_ids = list(range(first, first + users))
+    signups = {}
+    rows = []
+    for uid in user_ids:
+        signups[uid] = clock.now - timedelta(seconds=int(days * 86400 * (rng.random() ** 1.6)))
+        last_login = clock.after(signups[uid])
+        rows.append((uid, f"seed_{uid}", f"seed_{uid}@example.com", password_hash, f"Seed User {uid}",
+                     rng.choices(list(PLAN_WEIGHTS), list(PLAN_WEIGHTS.values()))[0], 1 if not db.is_postgres else True,
+                     _fmt(signups[uid]), _fmt(last_login), _fmt(last_login)))
+    insert("users", ("id", "username", "email", "password_hash", "full_name", "plan", "is_verified",
+                     "created_at", "last_login", "last_active"), rows)
+
+    # Zipf-like weights over a shuffled user order: rank r makes ~1/r^1.1 of the images
+    ranked = user_ids[:]
+    rng.shuffle(ranked)
+    activity = [1.0 / math.pow(rank + 1, 1.1) for rank in range(len(ranked))]
+    styles, style_weights = list(STYLE_WEIGHTS), list(STYLE_WEIGHTS.values())
+
+    # History, with the purchased subset recorded for the transactions pass
+    purchased = set(rng.sample(range(history), min(transactions, history))) if history else set()
+    history_rows, purchases = [], []
+    owners = rng.choices(ranked, activity, k=history) if users else []
+    for n, uid in enumerate(owners):
+        style = rng.choices(styles, style_weights)[0]
+        pixels = rng.choices(FRAME_PIXELS, FRAME_WEIGHTS)[0]
+        per_megapixel = 0.45 if style in HEAVY_STYLES else 0.06
+        proc_time = round(rng.lognormvariate(0, 0.35) * (0.02 + per_megapixel * pixels / 1e6), 3)
+        created = clock.after(signups[uid])
+        filename = f"processed_seed_{batch_tag}_{n}.jpg"
+        history_rows.append((uid, f"upload_{n}.jpg", filename, style, proc_time, pixels, _fmt(created)))
+        if n in purchased:
+            purchases.append((uid, filename, created))
+    insert("processing_history", ("user_id", "original_filename", "processed_filename", "style",
+                                  "processing_time", "pixels", "created_at"), history_rows)
+    del history_rows
+
+    import config.settings as settings
+    statuses, status_weights = list(TRANSACTION_STATUS_WEIGHTS), list(TRANSACTION_STATUS_WEIGHTS.values())
+    insert("transactions", ("user_id", "transaction_id", "amount", "currency", "status", "payment_method",
+                            "image_filename", "created_at"), [
+        (uid, f"pay_seed_{batch_tag}_{n}", float(settings.DOWNLOAD_PRICE), "inr",
+         rng.choices(statuses, status_weights)[0], "razorpay", filename,
+         _fmt(min(created + timedelta(seconds=rng.randint(30, 1800)), clock.now)))
+        for n, (uid, filename, created) in enumerate(purchases)])
+
+    actions, action_weights = list(ACTION_WEIGHTS), list(ACTION_WEIGHTS.values())
+    log_owners = rng.choices(ranked, activity, k=logs) if users else []
+    insert("user_logs", ("user_id", "action", "details", "created_at"), [
+        (uid, rng.choices(actions, action_weights)[0], None, _fmt(clock.after(signups[uid])))
+        for uid in log_owners])
+
+    if db.is_postgres:
+        cursor.execute("SELECT setval(pg_get_serial_sequence('users', 'id'), (SELECT MAX(id) FROM users))")
+    # Seeded rows bypass the incremental stats and rollups: rebuild them lazily
+    cursor.execute("DELETE FROM user_stats")
+    cursor.execute("DELETE FROM admin_daily_rollups")
+    cursor.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+    return user_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--history", type=int, default=20000, help="processing_history rows")
+    parser.add_argument("--transactions", type=int, default=1000)
+    parser.add_argument("--logs", type=int, default=10000, help="user_logs rows")
+    parser.add_argument("--days", type=int, default=180, help="span of the generated timestamps")
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+    parser.add_argument("--db-path", default=str(Path(__file__).parent.parent / "data" / "seed.db"))
+    parser.add_argument("--database-url", help="local Postgres database to seed instead of SQLite")
+    args = parser.parse_args()
+
+    # Point the app's settings at the target before anything opens the default database
+    os.environ.pop("DATABASE_URI", None)
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        os.environ.pop("DATABASE_URL", None)
+        os.environ["DATABASE_PATH"] = args.db_path
+    from modules.database import db
+
+    print(f"🌱 Seeding {args.users} users, {args.history} history rows, "
+          f"{args.transactions} transactions and {args.logs} logs...")
+    start = time.perf_counter()
+    seed(db, args.users, args.history, args.transactions, args.logs, args.days, args.seed, verbose=True)
+    print(f"✅ Done in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Unit tests for the buffered activity log pipeline
+"""
+import sys
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+from modules.database import Database
+from modules.activity_log import ActivityLog
+
+
+@pytest.fixture
+def database(tmp_path):
+    return Database(db_path=str(tmp_path / "logs.db"))
+
+
+def _actions(database):
+    conn = database.get_connection()
+    rows = conn.execute("SELECT action FROM user_logs ORDER BY id").fetchall()
+    conn.close()
+    return [row[0] for row in rows]
+
+
+def test_writer_drains_in_background(database):
+    """Test entries reach user_logs without an explicit flush"""
+    sink = ActivityLog(database, batch_size=2, flush_seconds=0.05)
+    for i in range(5):
+        assert sink.log(1, f"action_{i}")
+    deadline = time.time() + 5
+    while len(_actions(database)) < 5 and time.time() < deadline:
+        time.sleep(0.02)
+    assert _actions(database) == [f"action_{i}" for i in range(5)]
+    sink.close()
+    assert sink.stats()["written"] == 5
+
+
+@pytest.mark.parametrize("policy, expected, dropped", [
+    ("drop_oldest", ["action_2", "action_3", "action_4"], 2),
+    ("drop_newest", ["action_0", "action_1", "action_2"], 2),
+    ("sync", ["action_3", "action_4", "action_0", "action_1", "action_2"], 0),
+])
+def test_overflow_policies(database, policy, expected, dropped):
+    """Test a full buffer drops or writes inline according to the policy"""
+    sink = ActivityLog(database, capacity=3, batch_size=100, flush_seconds=60, overflow=policy)
+    for i in range(5):
+        sink.log(1, f"action_{i}")
+    sink.close()
+    assert _actions(database) == expected
+    assert sink.stats()["dropped"] == dropped
+
+
+def test_close_flushes_and_writes_late_entries(database):
+    """Test shutdown drains the buffer and later entries are written inline"""
+    sink = ActivityLog(database, batch_size=100, flush_seconds=60)
+    sink.log(1, "before")
+    sink.close()
+    sink.log(1, "after")
+    assert _actions(database) == ["before", "after"]
+
+
+def test_forked_worker_starts_its_own_writer(database):
+    """Test a process that inherited a started writer (gunicorn --preload) runs its own"""
+    sink = ActivityLog(database, batch_size=2, flush_seconds=60)
+    sink.log(1, "parent")
+    inherited = sink._writer
+    # What a forked worker sees: a writer recorded under its parent's pid
+    sink._writer_pid = -1
+    sink.log(2, "child_0")
+    sink.log(2, "child_1")
+    assert sink._writer is not inherited and sink._writer.is_alive()
+    deadline = time.time() + 5
+    while sink.stats()["written"] < 2 and time.time() < deadline:
+        time.sleep(0.02)
+    sink.close()
+    assert _actions(database) == ["child_0", "child_1"]
+
+
+def test_unknown_policy(database):
+    """Test an unknown overflow policy is rejected"""
+    with pytest.raises(ValueError):
+        ActivityLog(database, overflow="block")
+
+
+def test_retention_prunes_old_logs(database):
+    """Test logs past the retention period are deleted in chunks"""
+    database.log_user_activity_bulk([(1, "old", None)] * 7 + [(1, "new", None)])
+    conn = database.get_connection()
+    conn.execute("UPDATE user_logs SET created_at = datetime('now', '-100 days') WHERE action = 'old'")
+    conn.commit()
+    conn.close()
+    assert database.prune_activity_logs(90, chunk_size=3) == 7
+    assert _actions(database) == ["new"]
+
+    sink = ActivityLog(database, retention_days=90)
+    sink.maybe_prune(now=sink.pruned_at + sink.prune_seconds)
+    assert _actions(database) == ["new"]
+
+
+if __name__ == "__main__":
+    import tempfile
+    print("Running activity log tests...")
+
+    def fresh():
+        return Database(db_path=str(Path(tempfile.mkdtemp()) / "logs.db"))
+
+    test_writer_drains_in_background(fresh())
+    test_overflow_policies(fresh(), "drop_oldest", ["action_2", "action_3", "action_4"], 2)
+    test_overflow_policies(fresh(), "drop_newest", ["action_0", "action_1", "action_2"], 2)
+    test_overflow_policies(fresh(), "sync", ["action_3", "action_4", "action_0", "action_1", "action_2"], 0)
+    print("✅ Buffer and overflow tests passed")
+
+    test_close_flushes_and_writes_late_entries(fresh())
+    test_forked_worker_starts_its_own_writer(fresh())
+    test_unknown_policy(fresh())
+    test_retention_prunes_old_logs(fresh())
+    print("✅ Shutdown and retention tests passed")
+
+    print("\n🎉 All activity log tests passed!")
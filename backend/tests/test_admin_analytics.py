@@ -0,0 +1,151 @@
+"""
+Unit tests for admin rollups and the paginated admin listings
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+from modules.database import Database
+from modules.admin_analytics import AdminAnalytics
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = Database(db_path=str(tmp_path / "admin.db"))
+    for i in range(4):
+        user_id = database.create_user(f"user{i}", f"user{i}@example.com", "hash")
+        for j in range(i):
+            database.add_processing_history(user_id, "in.jpg", f"out_{i}_{j}.jpg", "anime", 0.1)
+        database.log_user_activity(user_id, "login")
+    return database
+
+
+def _complete(database, user_id, transaction_id, amount, payment_method="stripe"):
+    database.create_transaction(user_id, transaction_id, amount, payment_method=payment_method)
+    database.update_transaction_status(transaction_id, "completed")
+
+
+def _shift_history_days(database, days):
+    conn = database.get_connection()
+    conn.execute(f"UPDATE processing_history SET created_at = datetime(created_at, '-{days} days')")
+    conn.commit()
+    conn.close()
+
+
+def test_dashboard_totals_from_rollups(database):
+    """Test the rollup totals match the base tables"""
+    users = database.list_users_admin(limit=10)["items"]
+    _complete(database, users[0]["id"], "tx_1", 28.0)
+    _complete(database, users[0]["id"], "order_legacy", 28.0, payment_method="razorpay")
+
+    analytics = AdminAnalytics(database, refresh_seconds=0)
+    stats = analytics.dashboard_stats()
+    assert stats["total_users"] == 5  # including the default admin
+    assert stats["total_creations"] == 6
+    assert stats["total_revenue"] == 28.0
+    assert len(stats["daily"]) == 1
+    assert stats["daily"][0]["active_users"] == 4
+
+
+def test_incremental_refresh_keeps_settled_days(database):
+    """Test a lookback refresh rewrites recent days only and a rebuild catches up"""
+    _shift_history_days(database, 10)
+    assert database.refresh_admin_rollups() == 2
+    database.add_processing_history(1, "in.jpg", "today.jpg", "sketch", 0.1)
+    conn = database.get_connection()
+    conn.execute("DELETE FROM processing_history WHERE processed_filename = 'out_3_0.jpg'")
+    conn.commit()
+    conn.close()
+
+    database.refresh_admin_rollups(lookback_days=2)
+    assert database.get_admin_dashboard_stats()["total_creations"] == 7
+    database.refresh_admin_rollups()
+    assert database.get_admin_dashboard_stats()["total_creations"] == 6
+    assert [row["creations"] for row in database.get_admin_rollups(30)] == [5, 1]
+
+
+def test_rebuild_keeps_active_users_of_pruned_logs(database):
+    """Test a full rebuild keeps the active user counts of days whose logs were pruned"""
+    conn = database.get_connection()
+    conn.execute("UPDATE user_logs SET created_at = datetime(created_at, '-10 days')")
+    conn.commit()
+    conn.close()
+    database.refresh_admin_rollups()
+    old_day = database.get_admin_rollups(30)[0]
+    assert old_day["active_users"] == 4
+
+    conn = database.get_connection()
+    conn.execute("DELETE FROM user_logs")
+    conn.commit()
+    conn.close()
+    database.log_user_activity(1, "login")
+    database.refresh_admin_rollups()
+    rows = {row["day"]: row["active_users"] for row in database.get_admin_rollups(30)}
+    assert rows[old_day["day"]] == 4
+    assert sum(rows.values()) == 5
+
+
+def test_razorpay_currency(database):
+    """Test Razorpay transactions are recorded in INR and others keep the USD default"""
+    database.create_transaction(1, "pay_1", 28.0, payment_method="razorpay")
+    database.create_transaction(1, "cs_1", 0.33, payment_method="stripe")
+    conn = database.get_connection()
+    currencies = dict(conn.execute("SELECT transaction_id, currency FROM transactions").fetchall())
+    conn.close()
+    assert currencies == {"pay_1": "inr", "cs_1": "usd"}
+
+
+def test_user_pages(database):
+    """Test walking the user cursor returns every user once with page totals"""
+    users, cursor_token = [], None
+    while True:
+        page = database.list_users_admin(limit=2, cursor_token=cursor_token)
+        users.extend(page["items"])
+        cursor_token = page["next_cursor"]
+        if cursor_token is None:
+            break
+    assert len(users) == len({user["id"] for user in users}) == 5
+    assert {user["username"]: user["total_creations"] for user in users}["user3"] == 3
+    assert all("password_hash" not in user for user in users)
+
+
+def test_transaction_pages(database):
+    """Test transaction pages hide unverified Razorpay orders"""
+    user_id = database.list_users_admin(limit=1)["items"][0]["id"]
+    for i in range(3):
+        _complete(database, user_id, f"tx_{i}", 10.0)
+    _complete(database, user_id, "order_legacy", 28.0, payment_method="razorpay")
+    first = database.list_transactions_admin(limit=2)
+    second = database.list_transactions_admin(limit=2, cursor_token=first["next_cursor"])
+    ids = [t["transaction_id"] for t in first["items"] + second["items"]]
+    assert ids == ["tx_2", "tx_1", "tx_0"]
+    assert second["next_cursor"] is None
+    with pytest.raises(ValueError):
+        database.list_transactions_admin(cursor_token="bogus")
+
+
+if __name__ == "__main__":
+    import tempfile
+    print("Running admin analytics tests...")
+
+    def fresh():
+        database = Database(db_path=str(Path(tempfile.mkdtemp()) / "admin.db"))
+        for i in range(4):
+            user_id = database.create_user(f"user{i}", f"user{i}@example.com", "hash")
+            for j in range(i):
+                database.add_processing_history(user_id, "in.jpg", f"out_{i}_{j}.jpg", "anime", 0.1)
+            database.log_user_activity(user_id, "login")
+        return database
+
+    test_dashboard_totals_from_rollups(fresh())
+    test_incremental_refresh_keeps_settled_days(fresh())
+    test_rebuild_keeps_active_users_of_pruned_logs(fresh())
+    print("✅ Rollup tests passed")
+
+    test_user_pages(fresh())
+    test_transaction_pages(fresh())
+    test_razorpay_currency(fresh())
+    print("✅ Admin listing tests passed")
+
+    print("\n🎉 All admin analytics tests passed!")
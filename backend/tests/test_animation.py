@@ -0,0 +1,86 @@
+"""
+Unit tests for the animation engine
+"""
+import io
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+import numpy as np
+import cv2
+from PIL import Image
+from modules.animation import Animator, breathing_curve
+
+
+def _image(h=160, w=200):
+    img = np.random.default_rng(2).integers(0, 255, (h, w, 3), dtype=np.uint8)
+    cv2.circle(img, (w // 2, h // 2), h // 3, (40, 200, 90), -1)
+    return img
+
+
+def test_breathing_curve():
+    """Test one full period of zoom and brightness starting at rest"""
+    curve = breathing_curve(15)
+    assert len(curve) == 15
+    assert curve[0] == (1.0, 1.0)
+    assert max(s for s, _ in curve) <= 1.03 + 1e-9
+    assert breathing_curve(15) is curve
+
+
+def test_gif_loop():
+    """Test GIF output has every frame, loops and keeps the frame size"""
+    data = Animator(frame_count=5).animate(_image(), "gif")
+    gif = Image.open(io.BytesIO(data))
+    assert gif.format == "GIF"
+    assert gif.n_frames == 5
+    assert gif.size == (200, 160)
+    assert gif.info.get("loop") == 0
+
+
+def test_gif_size_cap():
+    """Test oversized GIFs are re-rendered smaller"""
+    img = _image(400, 500)
+    uncapped = Animator(frame_count=6).animate(img, "gif")
+    capped = Animator(frame_count=6, gif_max_bytes=len(uncapped) // 3).animate(img, "gif")
+    assert len(capped) < len(uncapped)
+    assert Image.open(io.BytesIO(capped)).size[0] < 500
+
+
+def test_webp_and_mp4():
+    """Test animated WebP and MP4 encoders"""
+    animator = Animator(frame_count=4)
+    webp = Image.open(io.BytesIO(animator.animate(_image(), "webp")))
+    assert webp.format == "WEBP"
+    try:
+        mp4 = animator.animate(_image(161, 201), "mp4")
+    except RuntimeError:
+        pytest.skip("No MP4 encoder in this OpenCV build")
+    assert len(mp4) > 0
+
+
+def test_unknown_format():
+    """Test unsupported formats are rejected"""
+    with pytest.raises(ValueError):
+        Animator().animate(_image(), "avi")
+
+
+if __name__ == "__main__":
+    print("Running animation tests...")
+
+    test_breathing_curve()
+    print("✅ Curve test passed")
+
+    test_gif_loop()
+    print("✅ GIF test passed")
+
+    test_gif_size_cap()
+    print("✅ GIF size cap test passed")
+
+    test_webp_and_mp4()
+    print("✅ WebP/MP4 test passed")
+
+    test_unknown_format()
+    print("✅ Format validation test passed")
+
+    print("\n🎉 All animation tests passed!")
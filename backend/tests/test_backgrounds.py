@@ -0,0 +1,100 @@
+"""
+Unit tests for the background asset registry
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+import cv2
+import pytest
+from modules.backgrounds import BackgroundRegistry, background_registry
+from modules.image_processing import ImageProcessor
+
+
+def _write_background(directory: Path, name: str, color):
+    image = np.full((64, 96, 3), color, np.uint8)
+    cv2.imwrite(str(directory / f"{name}.png"), image)
+
+
+def test_preload_and_variants(tmp_path):
+    """Test backgrounds are decoded once and resized variants are cached"""
+    _write_background(tmp_path, "beach", (200, 150, 50))
+    registry = BackgroundRegistry([tmp_path], variant_cache_size=2)
+    assert registry.names() == ["beach"]
+
+    variant = registry.get("beach", 40, 30)
+    assert variant.shape == (30, 40, 3)
+    assert registry.get("beach", 40, 30) is variant
+    assert not variant.flags.writeable
+    assert registry.get("missing", 40, 30) is None
+
+
+def test_new_files_picked_up(tmp_path):
+    """Test a background added to a registered directory is found without a restart"""
+    registry = BackgroundRegistry([tmp_path], rescan_seconds=0)
+    assert registry.get("space", 10, 10) is None
+    _write_background(tmp_path, "space", (10, 10, 10))
+    assert registry.get("space", 10, 10).shape == (10, 10, 3)
+
+
+def test_misses_do_not_rescan(tmp_path, monkeypatch):
+    """Test unknown names are answered from the last scan until it goes stale or refresh() runs"""
+    registry = BackgroundRegistry([tmp_path], rescan_seconds=60)
+    scans = []
+    original_scan = registry._scan
+    monkeypatch.setattr(registry, "_scan", lambda dirs: scans.append(dirs) or original_scan(dirs))
+    _write_background(tmp_path, "space", (10, 10, 10))
+    for name in ("bogus", "space", "other"):
+        assert registry.get(name, 10, 10) is None
+    assert scans == []
+
+    assert registry.refresh() == ["space"]
+    assert registry.get("space", 10, 10) is not None
+    registry.scanned_at -= 60
+    assert registry.get("bogus", 10, 10) is None
+    assert len(scans) == 2
+
+
+def test_bundled_backgrounds_preloaded():
+    """Test the shipped teleport backgrounds load regardless of working directory"""
+    assert {"tokyo", "cyberpunk", "forest"} <= set(background_registry.names())
+
+
+def test_teleport_uses_registry(tmp_path):
+    """Test teleport composites over a registered background"""
+    _write_background(tmp_path, "plain", (0, 255, 0))
+    processor = ImageProcessor()
+    processor.backgrounds = BackgroundRegistry([tmp_path])
+    img = np.full((120, 160, 3), 128, np.uint8)
+    cv2.circle(img, (80, 60), 30, (0, 0, 255), -1)
+
+    result = processor.teleport_background(img, "plain")
+    assert result.shape == img.shape
+    assert processor.teleport_background(img, "unknown") is img
+
+
+if __name__ == "__main__":
+    import tempfile
+    print("Running background registry tests...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        test_preload_and_variants(Path(tmp))
+    print("✅ Preload/variant test passed")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        test_new_files_picked_up(Path(tmp))
+    print("✅ New file test passed")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        test_misses_do_not_rescan(Path(tmp), pytest.MonkeyPatch())
+    print("✅ Miss caching test passed")
+
+    test_bundled_backgrounds_preloaded()
+    print("✅ Bundled backgrounds test passed")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        test_teleport_uses_registry(Path(tmp))
+    print("✅ Teleport test passed")
+
+    print("\n🎉 All background registry tests passed!")
@@ -0,0 +1,110 @@
+"""
+Unit tests for the shared buffer arena
+"""
+import sys
+import threading
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+from modules.buffer_arena import BufferArena, get_arena
+from modules.image_processing import ImageProcessor
+
+
+def test_acquire_reuses_released_buffer():
+    """Test a released buffer is handed out again for the same shape and dtype"""
+    arena = BufferArena(max_bytes=1 << 20)
+    first = arena.acquire((10, 20, 3), np.uint8)
+    arena.release(first)
+    assert arena.acquire((10, 20, 3), np.uint8) is first
+    assert arena.acquire((10, 20, 3), np.float64) is not first
+    assert arena.stats()["reuses"] == 1
+
+
+def test_release_ignores_views_and_respects_cap():
+    """Test views are never recycled and idle memory stays under the cap"""
+    arena = BufferArena(max_bytes=1000)
+    buffer = np.empty((20, 20), np.uint8)
+    arena.release(buffer[:10])
+    assert arena.stats()["idle_buffers"] == 0
+
+    for _ in range(4):
+        arena.release(np.empty((20, 20), np.uint8))
+    assert arena.idle_bytes <= 1000
+
+
+def test_arena_is_shared_across_threads():
+    """Test buffers released by one thread are reused by a later one"""
+    arena = get_arena()
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(get_arena()))
+    thread.start()
+    thread.join()
+    assert seen[0] is arena
+
+    shape = (13, 17, 3)
+    thread = threading.Thread(target=lambda: arena.release(arena.acquire(shape)))
+    thread.start()
+    thread.join()
+    reuses = arena.stats()["reuses"]
+    thread = threading.Thread(target=lambda: arena.acquire(shape))
+    thread.start()
+    thread.join()
+    assert arena.stats()["reuses"] == reuses + 1
+
+
+def test_concurrent_use_respects_cap():
+    """Test many threads never hand out one buffer twice or exceed the total cap"""
+    arena = BufferArena(max_bytes=64 * 1024)
+    held, errors, lock = set(), [], threading.Lock()
+
+    def work():
+        for _ in range(200):
+            buffer = arena.acquire((64, 64, 3))
+            with lock:
+                if id(buffer) in held:
+                    errors.append("handed out twice")
+                held.add(id(buffer))
+            with lock:
+                held.discard(id(buffer))
+            arena.release(buffer)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert arena.idle_bytes <= 64 * 1024
+
+
+def test_steady_state_render_allocations():
+    """Test repeated renders only allocate their outputs"""
+    processor = ImageProcessor()
+    img = np.random.default_rng(3).integers(0, 255, (240, 320, 3), dtype=np.uint8)
+    styles = ["cartoon", "anime", "vintage", "comic_book"]
+    processor.render_styles(img, styles)
+
+    arena = get_arena()
+    before = arena.stats()["allocations"]
+    processor.render_styles(img, styles)
+    assert arena.stats()["allocations"] - before == len(styles)
+
+
+if __name__ == "__main__":
+    print("Running buffer arena tests...")
+
+    test_acquire_reuses_released_buffer()
+    print("✅ Reuse test passed")
+
+    test_release_ignores_views_and_respects_cap()
+    print("✅ Release policy test passed")
+
+    test_arena_is_shared_across_threads()
+    test_concurrent_use_respects_cap()
+    print("✅ Shared arena tests passed")
+
+    test_steady_state_render_allocations()
+    print("✅ Steady-state allocation test passed")
+
+    print("\n🎉 All buffer arena tests passed!")
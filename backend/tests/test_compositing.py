@@ -0,0 +1,99 @@
+"""
+Unit tests for compositing primitives
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+import numpy as np
+from modules.compositing import apply_vignette, composite, vignette_mask
+
+
+@pytest.fixture
+def frames():
+    rng = np.random.default_rng(5)
+    fg = rng.integers(0, 256, (90, 120, 3), dtype=np.uint8)
+    bg = rng.integers(0, 256, (90, 120, 3), dtype=np.uint8)
+    alpha = rng.integers(0, 256, (90, 120), dtype=np.uint8)
+    return fg, bg, alpha
+
+
+def test_matches_float_blend(frames):
+    """Test the single-channel blend matches the float reference within rounding"""
+    fg, bg, alpha = frames
+    weight = (alpha / 255.0)[:, :, np.newaxis]
+    expected = np.round(fg * weight + bg * (1.0 - weight))
+    result = composite(fg, bg, alpha)
+    assert result.dtype == np.uint8
+    assert np.abs(result - expected).max() <= 1
+
+
+def test_float_alpha_and_dst(frames):
+    """Test float alpha gives the same result and dst is written in place"""
+    fg, bg, alpha = frames
+    dst = np.empty_like(fg)
+    result = composite(fg, bg, (alpha / 255.0).astype(np.float32), dst=dst)
+    assert result is dst
+    assert np.abs(result.astype(np.int16) - composite(fg, bg, alpha)).max() <= 1
+
+
+def test_extreme_alpha(frames):
+    """Test opaque and transparent alpha select one layer exactly"""
+    fg, bg, alpha = frames
+    assert np.array_equal(composite(fg, bg, np.full_like(alpha, 255)), fg)
+    assert np.array_equal(composite(fg, bg, np.zeros_like(alpha)), bg)
+
+
+def test_shape_mismatch(frames):
+    """Test mismatched inputs are rejected"""
+    fg, bg, alpha = frames
+    with pytest.raises(ValueError):
+        composite(fg, bg[:10], alpha)
+    with pytest.raises(ValueError):
+        composite(fg, bg, alpha[:10])
+
+
+def test_vignette_mask_cached():
+    """Test vignette masks are cached per size/strength and fade toward the corners"""
+    mask = vignette_mask(90, 120, 1.0)
+    assert mask.shape == (90, 120, 3) and mask.dtype == np.uint8
+    assert vignette_mask(90, 120, 1.0) is mask
+    assert mask[45, 60, 0] == 255 and mask[0, 0, 0] < 150
+    assert (vignette_mask(90, 120, 0.0) == 255).all()
+
+
+def test_vignette_matches_float(frames):
+    """Test the fixed-point vignette matches the float falloff within rounding"""
+    fg, _, _ = frames
+    rows, cols = fg.shape[:2]
+    kernel = np.outer(np.exp(-((np.arange(rows) - (rows - 1) / 2) ** 2) / (2 * (rows / 2) ** 2)),
+                      np.exp(-((np.arange(cols) - (cols - 1) / 2) ** 2) / (2 * (cols / 2) ** 2)))
+    expected = fg * (kernel / kernel.max())[:, :, np.newaxis]
+    assert np.abs(apply_vignette(fg) - expected).max() <= 1.5
+
+
+if __name__ == "__main__":
+    print("Running compositing tests...")
+    rng = np.random.default_rng(5)
+    sample = (rng.integers(0, 256, (90, 120, 3), dtype=np.uint8),
+              rng.integers(0, 256, (90, 120, 3), dtype=np.uint8),
+              rng.integers(0, 256, (90, 120), dtype=np.uint8))
+
+    test_matches_float_blend(sample)
+    print("✅ Float reference test passed")
+
+    test_float_alpha_and_dst(sample)
+    print("✅ Float alpha / dst test passed")
+
+    test_extreme_alpha(sample)
+    print("✅ Extreme alpha test passed")
+
+    test_shape_mismatch(sample)
+    print("✅ Shape validation test passed")
+
+    test_vignette_mask_cached()
+    test_vignette_matches_float(sample)
+    print("✅ Vignette tests passed")
+
+    print("\n🎉 All compositing tests passed!")
@@ -0,0 +1,93 @@
+"""
+Unit tests for the processing cost model
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+from modules.cost_model import CostModel
+
+
+def test_fit_per_style():
+    """Test per-style linear fit against megapixels"""
+    model = CostModel()
+    samples = [
+        {"style": "cartoon", "pixels": mp * 1_000_000, "processing_time": 0.1 + 0.5 * mp}
+        for mp in (0.5, 1.0, 1.5, 2.0, 2.5)
+    ]
+    model.fit(samples)
+
+    intercept, slope, count = model.coefficients[("cartoon", None)]
+    assert count == 5
+    assert slope == pytest.approx(0.5, rel=1e-6)
+    assert intercept == pytest.approx(0.1, rel=1e-6)
+    # 1000x700 fits inside the free plan limits, so 0.7 MP is processed
+    assert model.estimate_seconds("cartoon", 1000, 700) == pytest.approx(0.1 + 0.5 * 0.7, rel=1e-6)
+
+
+def test_fit_per_quality():
+    """Test each quality tier gets its own fit, falling back to the style-wide fit"""
+    model = CostModel()
+    samples = [
+        {"style": "cartoon", "quality": quality, "pixels": mp * 1_000_000, "processing_time": per_mp * mp}
+        for quality, per_mp in (("draft", 0.1), ("max", 0.9))
+        for mp in (0.5, 1.0, 1.5, 2.0, 2.5)
+    ]
+    model.fit(samples)
+
+    assert model.coefficients[("cartoon", "draft")][1] == pytest.approx(0.1, rel=1e-6)
+    assert model.coefficients[("cartoon", "max")][1] == pytest.approx(0.9, rel=1e-6)
+    assert model.coefficients[("cartoon", None)][2] == 10
+    draft = model.estimate_seconds("cartoon", 1000, 700, quality="draft")
+    best = model.estimate_seconds("cartoon", 1000, 700, quality="max", is_premium=True)
+    assert draft == pytest.approx(0.07, rel=1e-6)
+    assert best == pytest.approx(0.63, rel=1e-6)
+    # No 'standard' samples yet: use the style's fit over every tier
+    assert draft < model.estimate_seconds("cartoon", 1000, 700, True, "standard") < best
+    assert model.estimate("cartoon", 1000, 700, quality="draft")["quality"] == "draft"
+
+
+def test_prior_without_samples():
+    """Test styles without history use heavy/light priors"""
+    model = CostModel()
+    model.fit([])
+    heavy = model.estimate_seconds("oil_painting", 1000, 700)
+    light = model.estimate_seconds("sketch", 1000, 700)
+    assert heavy > light > 0
+
+
+def test_route_threshold():
+    """Test slow estimates are routed to the background"""
+    model = CostModel()
+    model.background_seconds = 2.0
+    assert model.route(0.5) == "inline"
+    assert model.route(2.5) == "background"
+
+
+def test_schedule_longest_first():
+    """Test LPT ordering and makespan"""
+    order, makespan = CostModel.schedule([1.0, 4.0, 2.0, 3.0], workers=2)
+    assert order == [1, 3, 2, 0]
+    assert makespan == pytest.approx(5.0)
+
+
+if __name__ == "__main__":
+    print("Running cost model tests...")
+
+    test_fit_per_style()
+    print("✅ Per-style fit test passed")
+
+    test_fit_per_quality()
+    print("✅ Per-quality fit test passed")
+
+    test_prior_without_samples()
+    print("✅ Prior test passed")
+
+    test_route_threshold()
+    print("✅ Routing test passed")
+
+    test_schedule_longest_first()
+    print("✅ Scheduling test passed")
+
+    print("\n🎉 All cost model tests passed!")
@@ -0,0 +1,57 @@
+"""
+Unit tests for saved Style DNA presets
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+from modules.database import Database
+
+DNA = {"mean": [120.0, 140.0, 110.0], "std": [50.0, 10.0, 12.0],
+       "chroma_boost": 1.5, "clahe": {"clip_limit": 3.0, "tile_grid": 8}}
+
+
+@pytest.fixture
+def database(tmp_path):
+    return Database(db_path=str(tmp_path / "presets.db"))
+
+
+def test_create_and_get(database):
+    """Test a saved preset round-trips its DNA"""
+    preset_id = database.create_dna_preset(1, "Neon", DNA)
+    preset = database.get_dna_preset(preset_id, 1)
+    assert preset["name"] == "Neon"
+    assert preset["dna"] == DNA
+    assert preset["is_public"] is False
+
+
+def test_visibility(database):
+    """Test private presets are owner-only and public ones are shared"""
+    private_id = database.create_dna_preset(1, "Mine", DNA)
+    public_id = database.create_dna_preset(1, "Shared", DNA, is_public=True)
+    assert database.get_dna_preset(private_id, 2) is None
+    assert database.get_dna_preset(public_id, 2)["name"] == "Shared"
+    assert [p["name"] for p in database.list_dna_presets(2)] == ["Shared"]
+    database.create_dna_preset(2, "Own", DNA)
+    assert [p["name"] for p in database.list_dna_presets(2)] == ["Own", "Shared"]
+
+
+def test_delete(database):
+    """Test only owners (or admins) can delete presets"""
+    preset_id = database.create_dna_preset(1, "Neon", DNA, is_public=True)
+    assert database.delete_dna_preset(preset_id, 2) is False
+    assert database.delete_dna_preset(preset_id, 2, is_admin=True) is True
+    assert database.get_dna_preset(preset_id, 1) is None
+
+
+if __name__ == "__main__":
+    import tempfile
+    print("Running Style DNA preset tests...")
+
+    for test in (test_create_and_get, test_visibility, test_delete):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Database(db_path=str(Path(tmp) / "presets.db")))
+        print(f"✅ {test.__name__} passed")
+
+    print("\n🎉 All Style DNA preset tests passed!")
@@ -0,0 +1,83 @@
+"""
+Unit tests for the shared edge/mask primitives
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+import numpy as np
+import cv2
+from modules.edges import apply_mask, multiply_mask, scaled_odd, thicken, canny_edges
+from modules.style_graph import style_graph
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(9)
+    image = rng.integers(0, 256, (64, 80, 3), dtype=np.uint8)
+    binary = np.where(rng.random((64, 80)) > 0.5, 255, 0).astype(np.uint8)
+    soft = rng.integers(0, 256, (64, 80), dtype=np.uint8)
+    return image, binary, soft
+
+
+def test_apply_mask_matches_bitwise_and(frame):
+    """Test single-channel masking equals AND with the expanded mask"""
+    image, binary, _ = frame
+    expanded = cv2.cvtColor(binary, cv2.COLOR_GRAY2BGR)
+    stale = np.full_like(image, 77)
+    assert np.array_equal(apply_mask(image, binary, dst=stale), cv2.bitwise_and(image, expanded))
+    assert np.array_equal(apply_mask(image, binary, invert=True),
+                          cv2.bitwise_and(image, cv2.bitwise_not(expanded)))
+
+
+def test_multiply_mask_matches_expanded(frame):
+    """Test soft masking equals the 3-channel multiply it replaces"""
+    image, _, soft = frame
+    expected = cv2.multiply(image, cv2.cvtColor(soft, cv2.COLOR_GRAY2BGR), scale=1 / 255)
+    assert np.array_equal(multiply_mask(image, soft), expected)
+
+
+def test_resolution_aware_kernels():
+    """Test kernel sizes scale with width, stay odd and never drop below 3"""
+    assert scaled_odd(9, 1280) == 9
+    assert scaled_odd(9, 2560) == 19
+    assert scaled_odd(9, 200) == 3
+
+
+def test_edge_helpers(frame):
+    """Test Canny and thickening produce binary single-channel masks"""
+    image, _, _ = frame
+    edges = thicken(canny_edges(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), 100, 200))
+    assert edges.shape == image.shape[:2]
+    assert set(np.unique(edges)) <= {0, 255}
+
+
+def test_styles_skip_mask_expansion():
+    """Test inked styles no longer expand masks to 3 channels"""
+    for style in ("cartoon", "anime", "pop_art", "ghibli", "comic_book"):
+        plan = style_graph.compile([style])
+        ops = [primitive.name for _, primitive, _, _ in plan.steps]
+        assert "bitwise_and" not in ops
+        assert ops.count("gray_to_bgr") <= (1 if style == "comic_book" else 0)
+
+
+if __name__ == "__main__":
+    print("Running edge primitive tests...")
+    rng = np.random.default_rng(9)
+    sample = (rng.integers(0, 256, (64, 80, 3), dtype=np.uint8),
+              np.where(rng.random((64, 80)) > 0.5, 255, 0).astype(np.uint8),
+              rng.integers(0, 256, (64, 80), dtype=np.uint8))
+
+    test_apply_mask_matches_bitwise_and(sample)
+    test_multiply_mask_matches_expanded(sample)
+    print("✅ Masking tests passed")
+
+    test_resolution_aware_kernels()
+    test_edge_helpers(sample)
+    print("✅ Edge helper tests passed")
+
+    test_styles_skip_mask_expansion()
+    print("✅ Style definition test passed")
+
+    print("\n🎉 All edge primitive tests passed!")
@@ -0,0 +1,102 @@
+"""
+Unit tests for the keyset-paginated gallery API
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+from modules.database import Database
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = Database(db_path=str(tmp_path / "gallery.db"))
+    # Rows inserted within the same second share created_at; id breaks the tie
+    for i in range(25):
+        database.add_processing_history(1, f"in_{i}.jpg", f"out_{i}.jpg", "anime" if i % 3 else "sketch", 0.1)
+    database.add_processing_history(2, "other.jpg", "out_3.jpg", "anime", 0.1)
+    return database
+
+
+def _walk(database, **kwargs):
+    pages, cursor_token = [], None
+    while True:
+        page = database.get_gallery_page(1, cursor_token=cursor_token, **kwargs)
+        pages.append(page)
+        cursor_token = page["next_cursor"]
+        if cursor_token is None:
+            return pages
+
+
+def test_pages_cover_history_once(database):
+    """Test walking the cursor returns every row once, newest first"""
+    pages = _walk(database, limit=10)
+    ids = [item["id"] for page in pages for item in page["items"]]
+    assert [len(page["items"]) for page in pages] == [10, 10, 5]
+    assert ids == sorted(ids, reverse=True)
+    assert len(set(ids)) == 25
+
+
+def test_style_filter_and_total(database):
+    """Test style filtering and the approximate total"""
+    pages = _walk(database, limit=4, style="sketch", include_total=True)
+    items = [item for page in pages for item in page["items"]]
+    assert {item["style"] for item in items} == {"sketch"}
+    assert len(items) == pages[0]["total"] == 9
+
+
+def test_paid_status_is_per_user(database):
+    """Test another user's payment for the same filename does not mark a row paid"""
+    database.create_transaction(2, "tx_other", 28.0, image_filename="out_3.jpg")
+    database.update_transaction_status("tx_other", "completed")
+    database.create_transaction(1, "tx_mine", 28.0, image_filename="out_5.jpg")
+    database.update_transaction_status("tx_mine", "completed")
+
+    items = _walk(database, limit=30)[0]["items"]
+    paid = {item["processed_filename"] for item in items if item["is_paid"]}
+    assert paid == {"out_5.jpg"}
+    assert len(items) == 25
+
+
+def test_invalid_cursor(database):
+    """Test malformed cursors are rejected"""
+    with pytest.raises(ValueError):
+        database.get_gallery_page(1, cursor_token="not-a-cursor")
+
+
+def test_page_uses_keyset_index(database):
+    """Test deep pages seek through the composite index instead of scanning"""
+    conn = database.get_connection()
+    plan = conn.execute("""
+        EXPLAIN QUERY PLAN SELECT id FROM processing_history ph
+        WHERE ph.user_id = ? AND (ph.created_at, ph.id) < (?, ?)
+        ORDER BY ph.created_at DESC, ph.id DESC LIMIT 25
+    """, (1, "2100-01-01 00:00:00", 10)).fetchall()
+    conn.close()
+    detail = " ".join(row[3] for row in plan)
+    assert "idx_history_user_created" in detail
+    assert "TEMP B-TREE" not in detail
+
+
+if __name__ == "__main__":
+    import tempfile
+    print("Running gallery API tests...")
+
+    def fresh():
+        database = Database(db_path=str(Path(tempfile.mkdtemp()) / "gallery.db"))
+        for i in range(25):
+            database.add_processing_history(1, f"in_{i}.jpg", f"out_{i}.jpg", "anime" if i % 3 else "sketch", 0.1)
+        database.add_processing_history(2, "other.jpg", "out_3.jpg", "anime", 0.1)
+        return database
+
+    test_pages_cover_history_once(fresh())
+    test_style_filter_and_total(fresh())
+    print("✅ Keyset pagination tests passed")
+
+    test_paid_status_is_per_user(fresh())
+    test_invalid_cursor(fresh())
+    test_page_uses_keyset_index(fresh())
+    print("✅ Paid status and index tests passed")
+
+    print("\n🎉 All gallery API tests passed!")
@@ -0,0 +1,121 @@
+"""
+Unit tests for the background job queue
+"""
+import sys
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+from modules.database import Database
+from modules.jobs import JobQueue
+
+
+def wait_for(queue, job_id, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+
+def test_job_result():
+    """Test a finished job exposes its result"""
+    queue = JobQueue(max_workers=1)
+    job_id = queue.submit(lambda a, b: {"sum": a + b}, 2, 3, owner_id=7)
+    job = wait_for(queue, job_id)
+
+    assert job["status"] == "done"
+    assert job["result"] == {"sum": 5}
+    assert job["owner_id"] == 7
+    queue.shutdown()
+
+
+def test_job_failure():
+    """Test exceptions mark the job failed instead of escaping"""
+    def boom():
+        raise ValueError("bad frame")
+
+    queue = JobQueue(max_workers=1)
+    job = wait_for(queue, queue.submit(boom))
+
+    assert job["status"] == "failed"
+    assert "bad frame" in job["error"]
+    assert queue.get("missing") is None
+    queue.shutdown()
+
+
+def test_job_state_shared_through_database(tmp_path):
+    """Test a job queued by one worker can be polled from another"""
+    database = Database(db_path=str(tmp_path / "jobs.db"))
+    worker, other = JobQueue(max_workers=1, database=database), JobQueue(max_workers=1, database=database)
+    job_id = worker.submit(lambda: {"processed_url": "/data/processed/x.jpg"}, owner_id=7, job_id="a" * 32)
+    assert job_id == "a" * 32
+    job = wait_for(other, job_id)
+
+    assert job["status"] == "done"
+    assert job["result"] == {"processed_url": "/data/processed/x.jpg"}
+    assert job["owner_id"] == 7
+    worker.shutdown()
+    other.shutdown()
+
+
+def test_orphaned_job_reported_failed(tmp_path):
+    """Test a job left running by a dead process stops looking active"""
+    database = Database(db_path=str(tmp_path / "jobs.db"))
+    database.create_job("orphan", owner_id=1)
+    database.update_job("orphan", status="running")
+    queue = JobQueue(max_workers=1, database=database, stale_seconds=60)
+    assert queue.get("orphan")["status"] == "running"
+
+    conn = database.get_connection()
+    conn.execute("UPDATE jobs SET created_at = created_at - 3600")
+    conn.commit()
+    conn.close()
+    assert queue.get("orphan")["status"] == "failed"
+    assert database.prune_jobs(60) == ["orphan"]
+    assert queue.get("orphan") is None
+    queue.shutdown()
+
+
+def test_discard_on_finish_and_prune(tmp_path):
+    """Test scratch cleanup runs when a job finishes and when a dead process's job is pruned"""
+    database = Database(db_path=str(tmp_path / "jobs.db"))
+    discarded = []
+    queue = JobQueue(max_workers=1, database=database, retention_seconds=60, on_discard=discarded.append)
+    job_id = queue.submit(lambda: {}, job_id="b" * 32)
+    wait_for(queue, job_id)
+    queue.shutdown()
+    assert discarded == [job_id]
+
+    database.create_job("orphan", owner_id=1)
+    conn = database.get_connection()
+    conn.execute("UPDATE jobs SET created_at = created_at - 3600, finished_at = finished_at - 3600")
+    conn.commit()
+    conn.close()
+    queue.pruned_at = 0.0
+    queue._prune()
+    assert sorted(discarded) == sorted([job_id, job_id, "orphan"])
+    assert database.get_job("orphan") is None
+
+
+if __name__ == "__main__":
+    import tempfile
+    print("Running job queue tests...")
+
+    test_job_result()
+    print("✅ Job result test passed")
+
+    test_job_failure()
+    print("✅ Job failure test passed")
+
+    test_job_state_shared_through_database(Path(tempfile.mkdtemp()))
+    test_orphaned_job_reported_failed(Path(tempfile.mkdtemp()))
+    print("✅ Shared job state tests passed")
+
+    test_discard_on_finish_and_prune(Path(tempfile.mkdtemp()))
+    print("✅ Job cleanup test passed")
+
+    print("\n🎉 All job queue tests passed!")
@@ -0,0 +1,115 @@
+"""
+Unit tests for the versioned schema migration runner
+"""
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+from modules.database import Database
+from modules import migrations
+from modules.migrations import LATEST_VERSION, migrate
+
+
+def _versions(database):
+    conn = database.get_connection()
+    rows = conn.execute("SELECT version FROM schema_version ORDER BY version").fetchall()
+    conn.close()
+    return [row[0] for row in rows]
+
+
+def test_fresh_database_is_current(tmp_path):
+    """Test a new database records every migration once"""
+    database = Database(db_path=str(tmp_path / "fresh.db"))
+    assert _versions(database) == list(range(1, LATEST_VERSION + 1))
+    assert database.get_user_by_username("admin")["role"] == "admin"
+
+
+def test_current_database_skips_migrations(tmp_path, monkeypatch):
+    """Test startup on an up-to-date database applies nothing"""
+    database = Database(db_path=str(tmp_path / "current.db"))
+
+    def fail(db, cursor):
+        raise AssertionError("migration re-applied")
+    monkeypatch.setattr(migrations, "MIGRATIONS", [(n, name, fail) for n, name, _ in migrations.MIGRATIONS])
+    assert database.init_database() == LATEST_VERSION
+
+
+def test_unversioned_database_is_adopted(tmp_path):
+    """Test a database created before versioning gains missing columns and keeps its rows"""
+    path = tmp_path / "legacy.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username VARCHAR(50) UNIQUE NOT NULL, email VARCHAR(100) UNIQUE NOT NULL, password_hash TEXT NOT NULL, full_name VARCHAR(100), created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, last_login TIMESTAMP, is_active BOOLEAN DEFAULT 1)")
+    conn.execute("INSERT INTO users (username, email, password_hash) VALUES ('old', 'old@example.com', 'hash')")
+    conn.execute("CREATE TABLE transactions (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, transaction_id VARCHAR(100) UNIQUE NOT NULL, amount DOUBLE PRECISION NOT NULL, currency VARCHAR(10) DEFAULT 'usd', status VARCHAR(30) DEFAULT 'pending', payment_method VARCHAR(50), image_filename TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+    conn.execute("INSERT INTO transactions (user_id, transaction_id, amount, status, payment_method) VALUES (1, 'pay_1', 0.33, 'completed', 'razorpay')")
+    conn.commit()
+    conn.close()
+
+    database = Database(db_path=str(path))
+    assert _versions(database) == list(range(1, LATEST_VERSION + 1))
+    user = database.get_user_by_username("old")
+    assert user["plan"] == "starter"
+    transaction = database.get_transaction_by_id("pay_1")
+    assert transaction["amount"] >= 1 and transaction["currency"] == "inr"
+
+
+def test_failed_migration_rolls_back(tmp_path):
+    """Test a failing step leaves the version and earlier steps of the run unapplied"""
+    database = Database(db_path=str(tmp_path / "failed.db"))
+
+    def create(db, cursor):
+        cursor.execute("CREATE TABLE extra (id INTEGER)")
+
+    def fail(db, cursor):
+        raise RuntimeError("boom")
+    steps = migrations.MIGRATIONS + [(LATEST_VERSION + 1, "extra", create), (LATEST_VERSION + 2, "fail", fail)]
+    with pytest.raises(RuntimeError):
+        migrate(database, steps)
+    assert _versions(database)[-1] == LATEST_VERSION
+    conn = database.get_connection()
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'extra'").fetchone() is None
+    conn.close()
+
+
+def test_concurrent_startup_migrates_once(tmp_path):
+    """Test processes starting together apply each migration exactly once"""
+    path = str(tmp_path / "race.db")
+    barrier = threading.Barrier(4)
+    errors = []
+
+    def start():
+        barrier.wait()
+        try:
+            Database(db_path=path)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=start) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    database = Database(db_path=path)
+    assert _versions(database) == list(range(1, LATEST_VERSION + 1))
+    conn = database.get_connection()
+    assert conn.execute("SELECT COUNT(*) FROM users WHERE username = 'admin'").fetchone()[0] == 1
+    conn.close()
+
+
+if __name__ == "__main__":
+    import tempfile
+    print("Running migration tests...")
+
+    test_fresh_database_is_current(Path(tempfile.mkdtemp()))
+    test_unversioned_database_is_adopted(Path(tempfile.mkdtemp()))
+    print("✅ Versioning tests passed")
+
+    test_failed_migration_rolls_back(Path(tempfile.mkdtemp()))
+    test_concurrent_startup_migrates_once(Path(tempfile.mkdtemp()))
+    print("✅ Rollback and locking tests passed")
+
+    print("\n🎉 All migration tests passed!")
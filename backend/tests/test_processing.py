@@ -96,6 +96,182 @@ def test_image_conversion(test_image):
     assert cv2_img.shape == test_image.shape
 
 
+def test_multi_style_matches_single(test_image):
+    """Test shared-intermediate fan-out matches per-style processing"""
+    processor = ImageProcessor()
+    styles = ["cartoon", "anime", "pop_art", "ghibli", "comic_book", "sketch"]
+    results = processor.process_multi_style(test_image, styles)
+
+    assert [style for style, _, _ in results] == styles
+    for style, processed, proc_time in results:
+        expected, _ = processor.process_image(test_image, style)
+        assert np.array_equal(processed, expected)
+        assert proc_time > 0
+
+
+def test_render_preview(test_image):
+    """Test progressive preview renders at preview width"""
+    processor = ImageProcessor()
+    large = cv2.resize(test_image, (1600, 1200))
+    preview, proc_time = processor.render_preview(large, "cartoon", max_width=480)
+
+    assert preview.shape[1] <= 480
+    assert preview.dtype == np.uint8
+    assert proc_time > 0
+
+
+def test_vignette_leaves_input_untouched(test_image):
+    """Test the public vignette returns a new array unless dst is given"""
+    processor = ImageProcessor()
+    original = test_image.copy()
+    shaded = processor.apply_vignette(test_image, 1.0)
+    assert np.array_equal(test_image, original)
+    assert not np.array_equal(shaded, original)
+
+    in_place = processor.apply_vignette(test_image, 1.0, dst=test_image)
+    assert in_place is test_image and np.array_equal(test_image, shaded)
+
+    image = original.copy()
+    processed, _ = processor.process_image(image, "sketch", vignette=0.5)
+    assert np.array_equal(image, original)
+
+
+def test_video_segment_plan():
+    """Test segment boundaries follow the key-frame cadence"""
+    segments = ImageProcessor._plan_video_segments(1000, cadence=2, workers=4, min_frames=96)
+    assert len(segments) == 4
+    assert segments[0][0] == 0 and segments[-1][1] == 1000
+    for (_, end), (begin, _) in zip(segments, segments[1:]):
+        assert end == begin
+        assert begin % 2 == 0
+
+    # Short clips stay on the sequential path
+    assert ImageProcessor._plan_video_segments(100, cadence=2, workers=4, min_frames=96) == [(0, 100)]
+
+
+def test_segmented_video_processing(tmp_path, monkeypatch):
+    """Test segment-parallel rendering writes every frame"""
+    import config.settings as settings
+    monkeypatch.setattr(settings, "VIDEO_MIN_SEGMENT_FRAMES", 8)
+    monkeypatch.setattr(settings, "VIDEO_SEGMENT_WORKERS", 3)
+
+    input_path = str(tmp_path / "input.avi")
+    writer = cv2.VideoWriter(input_path, cv2.VideoWriter_fourcc(*"MJPG"), 12, (64, 48))
+    for i in range(30):
+        writer.write(np.full((48, 64, 3), i * 8, dtype=np.uint8))
+    writer.release()
+
+    output_path = str(tmp_path / "output.mp4")
+    processor = ImageProcessor()
+    success, proc_time, frames, message = processor.process_video_file(input_path, output_path, "sketch")
+
+    assert success, message
+    assert frames == 30
+    assert proc_time > 0
+    cap = cv2.VideoCapture(output_path)
+    assert int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) == 30
+    cap.release()
+    assert [p.name for p in tmp_path.iterdir() if p.name.startswith("segments_")] == []
+
+
+def test_overestimated_frame_count(tmp_path, monkeypatch):
+    """Test segments planned past the real last frame are left out of the join"""
+    import config.settings as settings
+    monkeypatch.setattr(settings, "VIDEO_MIN_SEGMENT_FRAMES", 8)
+    monkeypatch.setattr(settings, "VIDEO_SEGMENT_WORKERS", 4)
+
+    input_path = str(tmp_path / "input.avi")
+    writer = cv2.VideoWriter(input_path, cv2.VideoWriter_fourcc(*"MJPG"), 12, (64, 48))
+    for i in range(20):
+        writer.write(np.full((48, 64, 3), i * 8, dtype=np.uint8))
+    writer.release()
+
+    real_capture = cv2.VideoCapture
+
+    class OvercountingCapture:
+        def __init__(self, *args):
+            self._capture = real_capture(*args)
+
+        def get(self, prop):
+            value = self._capture.get(prop)
+            return value * 4 if prop == cv2.CAP_PROP_FRAME_COUNT else value
+
+        def __getattr__(self, name):
+            return getattr(self._capture, name)
+
+    joined = []
+    concat = ImageProcessor._concat_video_segments
+
+    def record_concat(paths, *args):
+        joined.extend(paths)
+        return concat(paths, *args)
+
+    monkeypatch.setattr(cv2, "VideoCapture", OvercountingCapture)
+    monkeypatch.setattr(ImageProcessor, "_concat_video_segments", staticmethod(record_concat))
+    output_path = str(tmp_path / "output.mp4")
+    success, _, frames, message = ImageProcessor().process_video_file(input_path, output_path, "sketch")
+    monkeypatch.setattr(cv2, "VideoCapture", real_capture)
+
+    assert success, message
+    assert frames == 20
+    assert len(joined) == 1
+    cap = cv2.VideoCapture(output_path)
+    assert int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) == 20
+    cap.release()
+
+
+def test_segment_start_is_frame_exact(tmp_path, monkeypatch):
+    """Test a segment starts on its first frame even when seeking would land early"""
+    input_path = str(tmp_path / "input.avi")
+    writer = cv2.VideoWriter(input_path, cv2.VideoWriter_fourcc(*"MJPG"), 12, (64, 48))
+    for i in range(30):
+        frame = np.full((48, 64, 3), 255, dtype=np.uint8)
+        cv2.rectangle(frame, (i * 2, 10), (i * 2 + 8, 30), (0, 0, 0), -1)
+        writer.write(frame)
+    writer.release()
+
+    class FrameList:
+        def __init__(self):
+            self.frames = []
+
+        def write(self, frame):
+            self.frames.append(frame.copy())
+
+    real_capture = cv2.VideoCapture
+
+    class KeyFrameSeekCapture:
+        """Seeks land on the previous multiple of 8 but report the requested frame"""
+        def __init__(self, *args):
+            self._capture = real_capture(*args)
+            self._requested = None
+
+        def set(self, prop, value):
+            if prop == cv2.CAP_PROP_POS_FRAMES:
+                self._requested = value
+                return self._capture.set(prop, value - value % 8)
+            return self._capture.set(prop, value)
+
+        def get(self, prop):
+            if prop == cv2.CAP_PROP_POS_FRAMES and self._requested is not None:
+                return self._requested
+            return self._capture.get(prop)
+
+        def __getattr__(self, name):
+            return getattr(self._capture, name)
+
+    processor = ImageProcessor()
+    sequential = FrameList()
+    processor._render_video_segment(input_path, sequential, "sketch", False, (64, 48), 2)
+
+    monkeypatch.setattr(cv2, "VideoCapture", KeyFrameSeekCapture)
+    segment = FrameList()
+    written = processor._render_video_segment(input_path, segment, "sketch", False, (64, 48), 2, 10, 20)
+    monkeypatch.setattr(cv2, "VideoCapture", real_capture)
+
+    assert written == 10
+    assert all(np.array_equal(a, b) for a, b in zip(segment.frames, sequential.frames[10:20]))
+
+
 if __name__ == "__main__":
     print("Running image processing tests...")
     
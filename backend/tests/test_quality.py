@@ -0,0 +1,108 @@
+"""
+Unit tests for per-request quality tiers
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+import numpy as np
+import cv2
+from modules.image_processing import ImageProcessor
+from modules.quality import resolve_quality
+from modules.style_graph import StyleGraph, StyleGraphError, style_graph
+
+
+@pytest.fixture
+def processor():
+    processor = ImageProcessor()
+    processor.fast_processing = True
+    return processor
+
+
+@pytest.fixture
+def test_image():
+    rng = np.random.default_rng(3)
+    img = cv2.GaussianBlur(rng.integers(0, 255, (540, 1280, 3), dtype=np.uint8), (9, 9), 0)
+    cv2.circle(img, (640, 270), 120, (255, 255, 255), -1)
+    return img
+
+
+def test_plan_defaults_and_ceilings():
+    """Test plan defaults and that requests are capped at the plan's highest tier"""
+    assert resolve_quality(None, is_premium=False) == "draft"
+    assert resolve_quality("max", is_premium=False) == "draft"
+    assert resolve_quality(None, is_premium=True) == "standard"
+    assert resolve_quality("MAX", is_premium=True) == "max"
+    assert resolve_quality("draft", is_premium=True) == "draft"
+    with pytest.raises(ValueError):
+        resolve_quality("ultra", is_premium=True)
+
+
+def test_standard_matches_untiered_plan(processor, test_image):
+    """Test the standard tier renders exactly as the base style definitions"""
+    ctx = processor.render_contexts["standard"]
+    assert style_graph.compile(["cartoon"], "standard").steps == style_graph.compile(["cartoon"]).steps
+    tiered = processor.render_styles(test_image, ["cartoon"], "standard")["cartoon"]
+    base = style_graph.run(test_image, ["cartoon"], processor.render_context)["cartoon"]
+    assert ctx is processor.render_context
+    assert np.array_equal(tiered, base)
+
+
+def test_tier_parameter_overrides():
+    """Test per-node tier overrides reach the compiled plan"""
+    def params(style, quality, name):
+        return [p for _, primitive, p, _ in style_graph.compile([style], quality).steps if primitive.name == name]
+
+    assert params("cartoon", "draft", "median_blur")[0]["ksize"] == 3
+    assert params("cartoon", "standard", "median_blur")[0]["ksize"] == 5
+    assert params("comic_book", "max", "dilate")[0]["iterations"] == 2
+
+
+def test_internal_frame_per_tier(processor, test_image):
+    """Test heavy styles run narrower in draft and at full size in max"""
+    assert processor._internal_frame(test_image, "draft").shape[1] == 640
+    assert processor._internal_frame(test_image, "standard").shape[1] == processor.fast_style_max_width
+    assert processor._internal_frame(test_image, "max") is test_image
+
+    for quality in ("draft", "max"):
+        processed, _ = processor.process_image(test_image, "cartoon", is_premium=True, quality=quality)
+        assert processed.shape == test_image.shape
+
+
+def test_kmeans_palette(processor, test_image):
+    """Test sampled k-means quantization keeps at most num_colors colors"""
+    dst = np.empty_like(test_image)
+    quantized = processor._quantize_colors(test_image, num_colors=6, dst=dst, method="kmeans")
+    assert quantized is dst
+    assert len(np.unique(quantized.reshape(-1, 3), axis=0)) <= 6
+    assert np.abs(quantized.astype(np.int16) - test_image).mean() < 40
+
+
+def test_invalid_quality_overrides():
+    """Test malformed tier overrides are rejected"""
+    with pytest.raises(StyleGraphError):
+        StyleGraph({"bad": {"nodes": {"a": {"op": "gray", "quality": {"draft": 3}}}, "output": "a"}})
+
+
+if __name__ == "__main__":
+    print("Running quality tier tests...")
+
+    proc = ImageProcessor()
+    proc.fast_processing = True
+    rng = np.random.default_rng(3)
+    img = cv2.GaussianBlur(rng.integers(0, 255, (540, 1280, 3), dtype=np.uint8), (9, 9), 0)
+
+    test_plan_defaults_and_ceilings()
+    print("✅ Plan tier test passed")
+
+    test_standard_matches_untiered_plan(proc, img)
+    test_tier_parameter_overrides()
+    test_invalid_quality_overrides()
+    print("✅ Tier override tests passed")
+
+    test_internal_frame_per_tier(proc, img)
+    test_kmeans_palette(proc, img)
+    print("✅ Tier rendering tests passed")
+
+    print("\n🎉 All quality tier tests passed!")
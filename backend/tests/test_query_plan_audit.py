@@ -0,0 +1,50 @@
+"""
+Unit tests for the query plan audit
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from modules.database import Database
+from scripts.query_plan_audit import audit, seed
+
+
+def test_no_unexpected_scans(tmp_path, capsys):
+    """Test every Database query on a seeded dataset is served by an index"""
+    database = Database(db_path=str(tmp_path / "audit.db"))
+    user_ids = seed(database, users=200, history=4000, transactions=200, logs=2000)
+    assert audit(database, user_ids) == 0
+    report = capsys.readouterr().out
+    assert "get_transaction_by_id" in report
+    assert "[SCAN]" not in report
+
+
+def test_composite_indexes_are_used(tmp_path):
+    """Test the audit indexes serve their queries"""
+    database = Database(db_path=str(tmp_path / "plans.db"))
+    conn = database.get_connection()
+
+    def plan(sql, params):
+        return " ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall())
+
+    assert "idx_transactions_user_file_status" in plan(
+        "SELECT 1 FROM transactions WHERE user_id = ? AND image_filename = ? AND status = 'completed'", (1, "a.jpg"))
+    assert "TEMP B-TREE" not in plan(
+        "SELECT * FROM transactions WHERE user_id = ? ORDER BY created_at DESC", (1,))
+    assert "idx_verification_email_created" in plan(
+        "SELECT * FROM verification_codes WHERE email = ? ORDER BY created_at DESC LIMIT 1", ("a@b.c",))
+    conn.close()
+
+
+if __name__ == "__main__":
+    import tempfile
+    print("Running query plan audit tests...")
+
+    test_composite_indexes_are_used(Path(tempfile.mkdtemp()))
+    print("✅ Index tests passed")
+
+    database = Database(db_path=str(Path(tempfile.mkdtemp()) / "audit.db"))
+    assert audit(database, seed(database, users=200, history=4000, transactions=200, logs=2000)) == 0
+    print("✅ Audit tests passed")
+
+    print("\n🎉 All query plan audit tests passed!")
@@ -0,0 +1,151 @@
+"""
+Unit tests for the sliding-window usage quota
+"""
+import sys
+import threading
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+from modules.database import Database
+from modules.quota import QuotaCounter
+
+
+@pytest.fixture
+def counter():
+    counter = QuotaCounter(window_hours=24, resync_seconds=0)
+    counter.rebuild()
+    return counter
+
+
+def test_reserve_is_atomic(counter):
+    """Test concurrent reservations cannot exceed the limit together"""
+    granted = []
+    barrier = threading.Barrier(20)
+
+    def reserve():
+        barrier.wait()
+        granted.append(counter.try_reserve(1, 1, limit=5))
+
+    threads = [threading.Thread(target=reserve) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert granted.count(True) == 5
+    assert counter.usage(1) == 5
+
+
+def test_settle_returns_unused_units(counter):
+    """Test failed work hands its reservation back"""
+    assert counter.try_reserve(1, 4, limit=5)
+    assert not counter.try_reserve(1, 2, limit=5)
+    counter.settle(1, reserved=4, used=1)
+    assert counter.usage(1) == 1
+    assert counter.try_reserve(1, 4, limit=5)
+
+
+def test_window_slides(counter):
+    """Test usage older than the window stops counting"""
+    now = time.time()
+    counter.record(1, 3, now=now - 25 * 3600)
+    counter.record(1, 2, now=now - 2 * 3600)
+    assert counter.usage(1, now=now) == 2
+    assert counter.try_reserve(1, 3, limit=5, now=now)
+
+
+def test_rebuild_from_history(tmp_path):
+    """Test recorded usage is rebuilt from history, keeping reservations in flight"""
+    database = Database(db_path=str(tmp_path / "quota.db"))
+    for i in range(3):
+        database.add_processing_history(1, "in.jpg", f"out_{i}.jpg", "anime", 0.1)
+    database.add_processing_history(2, "in.jpg", "other.jpg", "anime", 0.1)
+
+    counter = QuotaCounter(database, resync_seconds=0)
+    assert counter.usage(1) == database.get_user_usage_24h(1) == 3
+    assert counter.try_reserve(2, 2, limit=5)
+    counter.rebuild()
+    assert counter.usage(2) == 3
+
+
+def test_workers_share_the_limit(tmp_path):
+    """Test counters in separate workers cannot together exceed the limit"""
+    database = Database(db_path=str(tmp_path / "quota.db"))
+    database.add_processing_history(1, "in.jpg", "old.jpg", "anime", 0.1)
+    workers = [QuotaCounter(database, resync_seconds=0) for _ in range(4)]
+    granted = []
+    barrier = threading.Barrier(8)
+
+    def reserve(counter):
+        barrier.wait()
+        granted.append(counter.try_reserve(1, 1, limit=5))
+
+    threads = [threading.Thread(target=reserve, args=(workers[i % 4],)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert granted.count(True) == 4
+
+    # A used unit moves from the reservation into history; an unused one frees up
+    database.add_processing_history(1, "in.jpg", "new.jpg", "anime", 0.1)
+    workers[0].settle(1, reserved=1, used=1)
+    assert not workers[1].try_reserve(1, 1, limit=5)
+    workers[2].settle(1, reserved=1, used=0)
+    assert workers[3].try_reserve(1, 1, limit=5)
+
+
+def test_stale_reservations_expire(tmp_path):
+    """Test units held by a worker that never settled stop counting after the TTL"""
+    database = Database(db_path=str(tmp_path / "quota.db"))
+    assert QuotaCounter(database, resync_seconds=0).try_reserve(1, 5, limit=5)
+    assert not database.reserve_quota(1, 1, 5, stale_seconds=600)
+    conn = database.get_connection()
+    conn.execute("UPDATE quota_reservations SET reserved_at = datetime('now', '-1 hour')")
+    conn.commit()
+    conn.close()
+    assert database.reserve_quota(1, 1, 5, stale_seconds=600)
+
+
+def test_reservations_sum_hourly_buckets(tmp_path):
+    """Test reservations read the hourly quota_buckets, not processing_history, and drop expired buckets"""
+    database = Database(db_path=str(tmp_path / "quota.db"))
+    for i in range(3):
+        database.add_processing_history(1, "in.jpg", f"out_{i}.jpg", "anime", 0.1)
+    conn = database.get_connection()
+    conn.execute("DELETE FROM processing_history")
+    conn.execute("INSERT INTO quota_buckets (user_id, bucket, uses) VALUES (1, ?, 9)",
+                 (QuotaCounter.bucket() - 24,))
+    conn.commit()
+    conn.close()
+
+    assert database.reserve_quota(1, 2, 5)
+    assert not database.reserve_quota(1, 1, 5)
+    conn = database.get_connection()
+    rows = conn.execute("SELECT bucket, uses FROM quota_buckets WHERE user_id = 1").fetchall()
+    conn.close()
+    assert [tuple(row) for row in rows] == [(QuotaCounter.bucket(), 3)]
+
+
+if __name__ == "__main__":
+    import tempfile
+    print("Running quota tests...")
+
+    def fresh():
+        counter = QuotaCounter(window_hours=24, resync_seconds=0)
+        counter.rebuild()
+        return counter
+
+    test_reserve_is_atomic(fresh())
+    test_settle_returns_unused_units(fresh())
+    print("✅ Reservation tests passed")
+
+    test_window_slides(fresh())
+    test_rebuild_from_history(Path(tempfile.mkdtemp()))
+    test_workers_share_the_limit(Path(tempfile.mkdtemp()))
+    test_stale_reservations_expire(Path(tempfile.mkdtemp()))
+    test_reservations_sum_hourly_buckets(Path(tempfile.mkdtemp()))
+    print("✅ Window and rebuild tests passed")
+
+    print("\n🎉 All quota tests passed!")
@@ -0,0 +1,100 @@
+"""
+Unit tests for the synthetic data seeder and the database load benchmark
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+from modules.database import Database
+from modules.admin_analytics import AdminAnalytics
+from scripts.seed_data import seed
+from scripts import db_benchmark
+
+
+@pytest.fixture
+def seeded(tmp_path):
+    database = Database(db_path=str(tmp_path / "seed.db"))
+    return database, seed(database, users=100, history=3000, transactions=150, logs=1000)
+
+
+def _scalar(database, sql):
+    conn = database.get_connection()
+    value = conn.execute(sql).fetchone()[0]
+    conn.close()
+    return value
+
+
+def test_seed_row_counts(seeded):
+    """Test the requested rows are inserted alongside the default admin"""
+    database, user_ids = seeded
+    assert len(user_ids) == 100
+    assert _scalar(database, "SELECT COUNT(*) FROM users") == 101
+    assert _scalar(database, "SELECT COUNT(*) FROM processing_history") == 3000
+    assert _scalar(database, "SELECT COUNT(*) FROM transactions") == 150
+    assert _scalar(database, "SELECT COUNT(*) FROM user_logs") == 1000
+
+
+def test_seed_rows_are_consistent(seeded):
+    """Test history follows signup and every purchase matches its owner's image"""
+    database, _ = seeded
+    assert _scalar(database, """
+        SELECT COUNT(*) FROM processing_history ph JOIN users u ON u.id = ph.user_id
+        WHERE ph.created_at < u.created_at
+    """) == 0
+    assert _scalar(database, """
+        SELECT COUNT(*) FROM transactions t LEFT JOIN processing_history ph
+          ON ph.user_id = t.user_id AND ph.processed_filename = t.image_filename
+        WHERE ph.id IS NULL
+    """) == 0
+    stats = database.get_user_stats(seeded[1][0])
+    assert stats["total_processed"] == _scalar(
+        database, f"SELECT COUNT(*) FROM processing_history WHERE user_id = {seeded[1][0]}")
+
+
+def test_seed_activity_is_heavy_tailed(seeded):
+    """Test the busiest tenth of users makes far more than a tenth of the images"""
+    database, _ = seeded
+    conn = database.get_connection()
+    counts = sorted((row[0] for row in conn.execute(
+        "SELECT COUNT(*) FROM processing_history GROUP BY user_id")), reverse=True)
+    conn.close()
+    assert sum(counts[:10]) > 0.4 * 3000
+
+
+def test_benchmark_replays_mix(seeded):
+    """Test every scenario runs without errors and percentiles come out ordered"""
+    database, _ = seeded
+    target = db_benchmark.Target(database, AdminAnalytics(database))
+    result = db_benchmark.run(database, target, db_benchmark.parse_mix(db_benchmark.DEFAULT_MIX),
+                              concurrency=2, requests=200)
+    assert not result["errors"]
+    assert sum(len(values) for values in result["scenarios"].values()) == 200
+    values = sorted(result["samples"]["get_user_history"])
+    assert db_benchmark.percentile(values, 50) <= db_benchmark.percentile(values, 99) <= values[-1]
+
+
+def test_unknown_scenario():
+    """Test the mix rejects scenarios that do not exist"""
+    with pytest.raises(ValueError):
+        db_benchmark.parse_mix("dashboard=1,checkout=2")
+
+
+if __name__ == "__main__":
+    import tempfile
+    print("Running seeder and benchmark tests...")
+
+    def fresh():
+        database = Database(db_path=str(Path(tempfile.mkdtemp()) / "seed.db"))
+        return database, seed(database, users=100, history=3000, transactions=150, logs=1000)
+
+    test_seed_row_counts(fresh())
+    test_seed_rows_are_consistent(fresh())
+    test_seed_activity_is_heavy_tailed(fresh())
+    print("✅ Seeder tests passed")
+
+    test_benchmark_replays_mix(fresh())
+    test_unknown_scenario()
+    print("✅ Benchmark tests passed")
+
+    print("\n🎉 All seeder and benchmark tests passed!")
@@ -0,0 +1,66 @@
+"""
+Unit tests for foreground segmentation
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+import cv2
+from modules.segmentation import Segmenter, guided_upsample
+
+
+def _portrait(h=480, w=640):
+    """Noisy background with a solid subject in the middle"""
+    img = np.random.default_rng(1).integers(100, 140, (h, w, 3), dtype=np.uint8)
+    cv2.ellipse(img, (w // 2, h // 2), (w // 5, h // 3), 0, 0, 360, (30, 60, 200), -1)
+    return img
+
+
+def test_multires_matches_full_resolution():
+    """Test the downscaled mask stays close to full-resolution GrabCut"""
+    img = _portrait()
+    full = Segmenter(max_side=0, cache_size=0).foreground_alpha(img)
+    fast = Segmenter(max_side=160, cache_size=0).foreground_alpha(img)
+    assert fast.shape == full.shape and fast.dtype == np.uint8
+    diff = np.abs(full.astype(np.int16) - fast)
+    assert diff.mean() < 8
+    assert fast[240, 320] > 200 and fast[10, 10] < 50
+
+
+def test_mask_cache():
+    """Test masks are reused per source key and size"""
+    segmenter = Segmenter(max_side=160, cache_size=2)
+    img = _portrait()
+    first = segmenter.foreground_alpha(img, cache_key="a.jpg")
+    assert segmenter.foreground_alpha(img, cache_key="a.jpg") is first
+    assert segmenter.foreground_alpha(img) is not first
+    segmenter.foreground_alpha(img, cache_key="b.jpg")
+    segmenter.foreground_alpha(img, cache_key="c.jpg")
+    assert segmenter.foreground_alpha(img, cache_key="a.jpg") is not first
+
+
+def test_guided_upsample_follows_edges():
+    """Test upsampled mask edges snap to the full-resolution guide"""
+    guide = np.zeros((200, 200), np.uint8)
+    guide[:, 100:] = 255
+    mask_small = np.zeros((25, 25), np.float32)
+    mask_small[:, 13:] = 1.0
+    mask = guided_upsample(guide, mask_small, radius=2)
+    assert mask.shape == (200, 200)
+    assert mask[100, 90] < 0.2 and mask[100, 110] > 0.8
+
+
+if __name__ == "__main__":
+    print("Running segmentation tests...")
+
+    test_multires_matches_full_resolution()
+    print("✅ Multi-resolution test passed")
+
+    test_mask_cache()
+    print("✅ Mask cache test passed")
+
+    test_guided_upsample_follows_edges()
+    print("✅ Guided upsample test passed")
+
+    print("\n🎉 All segmentation tests passed!")
@@ -0,0 +1,183 @@
+"""
+Unit tests for the SQLite WAL engine: pragmas, per-thread connections and the single writer
+"""
+import sys
+import threading
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import sqlite3
+import pytest
+from modules.database import Database
+from modules.sqlite_engine import SQLiteEngine
+
+
+@pytest.fixture
+def database(tmp_path):
+    return Database(db_path=str(tmp_path / "wal.db"), sqlite_mode="wal")
+
+
+def _count(database, sql):
+    conn = database.get_connection()
+    value = conn.execute(sql).fetchone()[0]
+    conn.close()
+    return value
+
+
+def test_pragmas(database):
+    """Test connections use WAL, synchronous=NORMAL and a busy timeout"""
+    conn = database.get_connection()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] > 0
+    conn.close()
+
+
+def test_connection_per_thread(database):
+    """Test a thread reuses its connection and other threads get their own"""
+    first, second = database.get_connection(), database.get_connection()
+    assert first._conn is second._conn
+    other = []
+    thread = threading.Thread(target=lambda: other.append(database.get_connection()._conn))
+    thread.start()
+    thread.join()
+    assert other[0] is not first._conn
+
+
+def test_close_releases_uncommitted_work(database):
+    """Test closing a thread connection rolls back what the caller left open"""
+    conn = database.get_connection()
+    conn.execute("INSERT INTO user_logs (user_id, action) VALUES (1, 'uncommitted')")
+    conn.close()
+    assert not conn.in_transaction
+    assert _count(database, "SELECT COUNT(*) FROM user_logs") == 0
+
+
+def test_concurrent_writes_are_batched(database):
+    """Test writers on many threads never see a locked database and share commits"""
+    errors = []
+
+    def work():
+        for _ in range(50):
+            try:
+                database.update_last_active(1)
+                database.log_user_activity(1, "ping")
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert _count(database, "SELECT COUNT(*) FROM user_logs WHERE action = 'ping'") == 400
+    stats = database.sqlite_engine.stats()
+    assert stats["jobs"] >= 800 and stats["batches"] < stats["jobs"]
+
+
+def test_failed_write_rolls_back_alone(database):
+    """Test a write that raises leaves no rows and later writes still commit"""
+    def insert_then_fail():
+        conn = database.get_connection()
+        conn.execute("INSERT INTO user_logs (user_id, action) VALUES (1, 'doomed')")
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        database.sqlite_engine.write(insert_then_fail)
+    assert database.create_user("dup", "dup@example.com", "hash")
+    assert database.create_user("dup", "dup@example.com", "hash") is None
+    database.update_last_login(database.get_user_by_username("dup")["id"])
+    assert _count(database, "SELECT COUNT(*) FROM user_logs WHERE action = 'doomed'") == 0
+    assert _count(database, "SELECT COUNT(*) FROM user_logs WHERE action = 'login'") == 1
+
+
+def test_locked_database_fails_waiting_writes(tmp_path):
+    """Test writes fail, not hang, when another process holds the write lock"""
+    Database(db_path=str(tmp_path / "locked.db"), sqlite_mode="wal")
+    engine = SQLiteEngine(str(tmp_path / "locked.db"), busy_timeout_ms=100, write_timeout=10)
+    other = sqlite3.connect(str(tmp_path / "locked.db"), isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+
+    def insert():
+        engine.connection().execute("INSERT INTO user_logs (user_id, action) VALUES (1, 'queued')")
+
+    errors = []
+
+    def work():
+        try:
+            engine.write(insert)
+        except sqlite3.OperationalError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    assert not any(thread.is_alive() for thread in threads)
+    assert len(errors) == 4 and all("locked" in str(e) for e in errors)
+
+    other.execute("ROLLBACK")
+    engine.write(insert)
+    assert other.execute("SELECT COUNT(*) FROM user_logs").fetchone()[0] == 1
+
+
+def test_write_timeout(tmp_path):
+    """Test a caller stops waiting on a writer that does not answer in time"""
+    engine = SQLiteEngine(str(tmp_path / "slow.db"), write_timeout=0.2)
+    release = threading.Event()
+    blocker = threading.Thread(target=lambda: pytest.raises(sqlite3.OperationalError, engine.write, release.wait))
+    blocker.start()
+    with pytest.raises(sqlite3.OperationalError):
+        engine.write(lambda: None)
+    release.set()
+    blocker.join()
+    assert engine.write(lambda: "ok") == "ok"
+
+
+def test_unit_of_work_and_chunked_prune(database):
+    """Test multi-statement writes go through the writer in WAL mode"""
+    with database.unit_of_work() as work:
+        for i in range(5):
+            work.add_processing_history(1, f"in_{i}.jpg", f"out_{i}.jpg", "anime", 0.1)
+            work.log_user_activity(1, "old")
+    assert _count(database, "SELECT COUNT(*) FROM processing_history") == 5
+    conn = database.get_connection()
+    conn.execute("UPDATE user_logs SET created_at = datetime('now', '-100 days')")
+    conn.commit()
+    conn.close()
+    assert database.prune_activity_logs(90, chunk_size=2) == 5
+
+
+def test_legacy_mode(tmp_path):
+    """Test legacy mode keeps a connection per call and rejects unknown modes"""
+    database = Database(db_path=str(tmp_path / "legacy.db"), sqlite_mode="legacy")
+    assert database.sqlite_engine is None
+    database.log_user_activity(1, "legacy")
+    assert _count(database, "SELECT COUNT(*) FROM user_logs") == 1
+    with pytest.raises(ValueError):
+        Database(db_path=str(tmp_path / "bad.db"), sqlite_mode="memory")
+
+
+if __name__ == "__main__":
+    import tempfile
+    print("Running SQLite engine tests...")
+
+    def fresh():
+        return Database(db_path=str(Path(tempfile.mkdtemp()) / "wal.db"), sqlite_mode="wal")
+
+    test_pragmas(fresh())
+    test_connection_per_thread(fresh())
+    test_close_releases_uncommitted_work(fresh())
+    print("✅ Connection tests passed")
+
+    test_concurrent_writes_are_batched(fresh())
+    test_failed_write_rolls_back_alone(fresh())
+    test_locked_database_fails_waiting_writes(Path(tempfile.mkdtemp()))
+    test_write_timeout(Path(tempfile.mkdtemp()))
+    test_unit_of_work_and_chunked_prune(fresh())
+    test_legacy_mode(Path(tempfile.mkdtemp()))
+    print("✅ Writer tests passed")
+
+    print("\n🎉 All SQLite engine tests passed!")
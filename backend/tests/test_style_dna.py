@@ -0,0 +1,105 @@
+"""
+Unit tests for Style DNA transfer
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+import numpy as np
+import cv2
+from modules.style_dna import StyleDNA, lab_stats, validate_dna
+
+
+def _gradient(h, w, tint):
+    ramp = np.tile(np.linspace(0, 1, w, dtype=np.float32), (h, 1))[:, :, np.newaxis]
+    return np.clip(ramp * np.array(tint, np.float32), 0, 255).astype(np.uint8)
+
+
+def legacy_transfer(target, reference):
+    """Original float implementation (reference resized to the target)"""
+    h, w = target.shape[:2]
+    reference = cv2.resize(reference, (w, h))
+    t = cv2.split(cv2.cvtColor(target, cv2.COLOR_BGR2LAB).astype("float32"))
+    r = cv2.split(cv2.cvtColor(reference, cv2.COLOR_BGR2LAB).astype("float32"))
+    boosts = (1.0, 1.5, 1.5)
+    out = [np.clip(((c - c.mean()) / (c.std() + 1e-5)) * (rc.std() * k) + rc.mean(), 0, 255)
+           for c, rc, k in zip(t, r, boosts)]
+    transfer = cv2.cvtColor(cv2.merge(out).astype("uint8"), cv2.COLOR_LAB2BGR)
+    l, a, b = cv2.split(cv2.cvtColor(transfer, cv2.COLOR_BGR2LAB))
+    l = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8)).apply(l)
+    return cv2.cvtColor(cv2.merge([l, a, b]), cv2.COLOR_LAB2BGR)
+
+
+def test_matches_legacy_transfer():
+    """Test the LUT transfer stays close to the original float pipeline"""
+    target = _gradient(240, 320, (200, 160, 90))
+    reference = _gradient(300, 400, (60, 120, 240))
+    engine = StyleDNA()
+    result = engine.apply(target, engine.from_image(reference))
+    diff = np.abs(result.astype(np.int16) - legacy_transfer(target, reference))
+    assert diff.mean() < 3
+
+
+def test_reference_cache():
+    """Test repeat references are served from the cache"""
+    engine = StyleDNA(cache_size=4)
+    reference = _gradient(100, 120, (10, 200, 90))
+    ok, encoded = cv2.imencode(".png", reference)
+    first = engine.from_bytes(encoded.tobytes())
+    assert engine.from_bytes(encoded.tobytes()) is first
+    assert engine.from_image(reference) is engine.from_image(reference.copy())
+    assert engine.from_bytes(b"not an image") is None
+
+
+def test_downsampled_stats_close():
+    """Test statistics from the small sample match the full-resolution ones"""
+    reference = cv2.GaussianBlur(np.random.default_rng(4).integers(0, 255, (900, 1200, 3), dtype=np.uint8), (15, 15), 0)
+    dna = StyleDNA(sample_side=128).extract(reference)
+    full = lab_stats(reference)
+    assert np.allclose(dna["mean"], full["mean"], atol=1.0)
+    assert np.allclose(dna["std"], full["std"], atol=1.5)
+
+
+def test_validate_dna():
+    """Test malformed DNA is rejected and defaults are filled in"""
+    dna = validate_dna({"mean": [120, 130, 125], "std": [40, 8, 9]})
+    assert dna["clahe"] == {"clip_limit": 3.0, "tile_grid": 8}
+    with pytest.raises(ValueError):
+        validate_dna({"mean": [1, 2], "std": [1, 2, 3]})
+    with pytest.raises(ValueError):
+        validate_dna({"mean": [1, 2, 3], "std": [1, 2, 3], "clahe": {"tile_grid": 0}})
+
+
+@pytest.mark.parametrize("extra", [
+    {"chroma_boost": None},
+    {"chroma_boost": "strong"},
+    {"clahe": [1, 2]},
+    {"clahe": {"clip_limit": None}},
+    {"clahe": {"tile_grid": "8x8"}},
+])
+def test_validate_dna_wrong_types(extra):
+    """Test JSON values of the wrong type are rejected with ValueError (a 400), not TypeError"""
+    with pytest.raises(ValueError):
+        validate_dna(dict({"mean": [120, 130, 125], "std": [40, 8, 9]}, **extra))
+
+
+if __name__ == "__main__":
+    print("Running style DNA tests...")
+
+    test_matches_legacy_transfer()
+    print("✅ Legacy parity test passed")
+
+    test_reference_cache()
+    print("✅ Reference cache test passed")
+
+    test_downsampled_stats_close()
+    print("✅ Downsampled statistics test passed")
+
+    test_validate_dna()
+    for extra in ({"chroma_boost": None}, {"chroma_boost": "strong"}, {"clahe": [1, 2]},
+                  {"clahe": {"clip_limit": None}}, {"clahe": {"tile_grid": "8x8"}}):
+        test_validate_dna_wrong_types(extra)
+    print("✅ Validation test passed")
+
+    print("\n🎉 All style DNA tests passed!")
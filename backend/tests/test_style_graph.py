@@ -0,0 +1,268 @@
+"""
+Unit tests for the declarative style graph engine
+"""
+import itertools
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+import numpy as np
+import cv2
+from modules.buffer_arena import BufferArena
+from modules.image_processing import ImageProcessor
+from modules.style_graph import PLAN_CACHE_SIZE, StyleGraph, StyleGraphError, RenderContext, style_graph
+
+
+# --- Reference implementations of the original hand-written styles ---
+
+def _odd(base, w):
+    size = int(base * (w / 1280.0))
+    if size % 2 == 0:
+        size += 1
+    return max(3, size)
+
+
+def _hsv(image, s=1.0, v=1.0):
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    hsv[:, :, 1] = np.clip(hsv[:, :, 1] * s, 0, 255)
+    hsv[:, :, 2] = np.clip(hsv[:, :, 2] * v, 0, 255)
+    return cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+
+
+def legacy_cartoon(p, image):
+    smooth = cv2.edgePreservingFilter(image, flags=1, sigma_s=60, sigma_r=0.4)
+    gray = cv2.medianBlur(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), 5)
+    edges = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                  cv2.THRESH_BINARY, blockSize=_odd(9, image.shape[1]), C=2)
+    quantized = p._quantize_colors(smooth, num_colors=8)
+    cartoon = cv2.bitwise_and(quantized, cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR))
+    return _hsv(cartoon, s=1.2)
+
+
+def legacy_sketch(p, image):
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    blurred = cv2.GaussianBlur(cv2.bitwise_not(gray), (21, 21), 0)
+    sketch = cv2.divide(gray, cv2.bitwise_not(blurred), scale=256.0)
+    return cv2.cvtColor(sketch, cv2.COLOR_GRAY2BGR)
+
+
+def legacy_pencil_color(p, image):
+    return cv2.pencilSketch(image, sigma_s=60, sigma_r=0.07, shade_factor=0.05)[1]
+
+
+def legacy_oil_painting(p, image):
+    stylized = cv2.stylization(image, sigma_s=100, sigma_r=0.45)
+    smooth = cv2.edgePreservingFilter(stylized, flags=1, sigma_s=60, sigma_r=0.4)
+    return _hsv(smooth, s=1.3, v=1.1)
+
+
+def legacy_watercolor(p, image):
+    watercolor = cv2.stylization(image, sigma_s=60, sigma_r=0.6)
+    smooth = cv2.edgePreservingFilter(watercolor, flags=1, sigma_s=50, sigma_r=0.3)
+    return _hsv(smooth, s=1.4, v=1.05)
+
+
+def legacy_pop_art(p, image):
+    quantized = p._quantize_colors(image, num_colors=6)
+    edges = cv2.Canny(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), 100, 200)
+    edges = cv2.dilate(edges, np.ones((2, 2), np.uint8), iterations=1)
+    pop = _hsv(quantized, s=1.8, v=1.2)
+    return cv2.bitwise_and(pop, cv2.bitwise_not(cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)))
+
+
+def legacy_vintage(p, image):
+    kernel = np.array([[0.272, 0.534, 0.131],
+                       [0.349, 0.686, 0.168],
+                       [0.393, 0.769, 0.189]])
+    sepia = np.clip(cv2.transform(image, kernel), 0, 255).astype(np.uint8)
+    vintage = cv2.GaussianBlur(sepia, (3, 3), 0)
+    rows, cols = vintage.shape[:2]
+    kernel = cv2.getGaussianKernel(rows, rows / 2) * cv2.getGaussianKernel(cols, cols / 2).T
+    mask = kernel / kernel.max()
+    for i in range(3):
+        vintage[:, :, i] = vintage[:, :, i] * mask
+    return cv2.convertScaleAbs(vintage, alpha=0.9, beta=10)
+
+
+def legacy_anime(p, image):
+    w = image.shape[1]
+    smooth = cv2.edgePreservingFilter(image, flags=1, sigma_s=60, sigma_r=0.45)
+    quantized = p._quantize_colors(smooth, num_colors=12)
+    gray = cv2.medianBlur(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), 5)
+    mask = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                 cv2.THRESH_BINARY, blockSize=_odd(7, w), C=4)
+    anime = cv2.bitwise_and(quantized, cv2.cvtColor(mask, cv2.COLOR_GRAY2BGR))
+    blur = _odd(15, w)
+    anime = cv2.addWeighted(anime, 0.8, cv2.GaussianBlur(anime, (blur, blur), 0), 0.4, 0)
+    return _hsv(anime, s=1.6)
+
+
+def legacy_ghibli(p, image):
+    smooth = cv2.edgePreservingFilter(image, flags=1, sigma_s=50, sigma_r=0.4)
+    quantized = p._quantize_colors(smooth, num_colors=16)
+    ghibli = cv2.addWeighted(quantized, 0.85, cv2.GaussianBlur(quantized, (31, 31), 0), 0.15, 0)
+    table = np.array([((i / 255.0) ** (1.0 / 1.2)) * 255 for i in np.arange(0, 256)]).astype("uint8")
+    ghibli = cv2.LUT(ghibli, table)
+    edges = cv2.GaussianBlur(cv2.Canny(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), 100, 200), (3, 3), 0)
+    return cv2.multiply(ghibli, cv2.cvtColor(cv2.bitwise_not(edges), cv2.COLOR_GRAY2BGR), scale=1/255)
+
+
+def legacy_comic_book(p, image):
+    h, w = image.shape[:2]
+    scale_factor = w / 1280.0
+    quantized = p._quantize_colors(cv2.medianBlur(image, 5), num_colors=8)
+    gray = cv2.GaussianBlur(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+    edges = cv2.dilate(cv2.Canny(gray, 50, 150), np.ones((2, 2), np.uint8), iterations=1)
+    halftone = np.zeros((h, w), dtype=np.uint8)
+    spacing, radius = max(4, int(6 * scale_factor)), max(1, int(2 * scale_factor))
+    for i in range(0, h, spacing):
+        for j in range(0, w, spacing):
+            cv2.circle(halftone, (j, i), radius, 255, -1)
+    comic = _hsv(quantized, s=1.6)
+    comic = cv2.addWeighted(comic, 0.9, cv2.cvtColor(halftone, cv2.COLOR_GRAY2BGR), 0.1, 0)
+    return cv2.bitwise_and(comic, cv2.bitwise_not(cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)))
+
+
+LEGACY_STYLES = {
+    "cartoon": legacy_cartoon,
+    "sketch": legacy_sketch,
+    "pencil_color": legacy_pencil_color,
+    "oil_painting": legacy_oil_painting,
+    "watercolor": legacy_watercolor,
+    "pop_art": legacy_pop_art,
+    "vintage": legacy_vintage,
+    "anime": legacy_anime,
+    "ghibli": legacy_ghibli,
+    "comic_book": legacy_comic_book,
+}
+
+
+@pytest.fixture
+def processor():
+    processor = ImageProcessor()
+    processor.fast_processing = True  # deterministic posterization
+    return processor
+
+
+@pytest.fixture(params=[(300, 400), (720, 1300)])
+def test_image(request):
+    """Textured test image at two resolutions (exercises resolution-aware params)"""
+    h, w = request.param
+    rng = np.random.default_rng(7)
+    img = cv2.GaussianBlur(rng.integers(0, 255, (h, w, 3), dtype=np.uint8), (9, 9), 0)
+    cv2.rectangle(img, (w // 8, h // 6), (w // 2, h // 2), (255, 128, 0), -1)
+    cv2.circle(img, (w // 2, h // 2), h // 5, (255, 255, 255), -1)
+    return img
+
+
+@pytest.mark.parametrize("style", sorted(LEGACY_STYLES))
+def test_graph_matches_legacy(processor, test_image, style):
+    """Test every ported style matches its original implementation"""
+    expected = LEGACY_STYLES[style](processor, test_image)
+    actual = processor.render_styles(test_image, [style])[style]
+    assert actual.dtype == expected.dtype
+    if style == "vintage":
+        # Fixed-point vignette rounds where the float original truncated
+        assert np.abs(actual.astype(np.int16) - expected).max() <= 1
+    else:
+        assert np.array_equal(actual, expected)
+
+
+def test_shared_nodes_run_once():
+    """Test common subexpressions are merged across styles"""
+    single = sum(len(style_graph.compile([s]).steps) for s in ("cartoon", "anime", "pop_art"))
+    shared = style_graph.compile(["cartoon", "anime", "pop_art"])
+    assert len(shared.steps) < single
+    assert len({key for key, _, _, _ in shared.steps}) == len(shared.steps)
+
+
+class TrackingArena(BufferArena):
+    """Arena that remembers which of its buffers are still checked out"""
+
+    def __init__(self):
+        super().__init__(max_bytes=1 << 30, max_per_key=64)
+        self.checked_out = {}
+
+    def acquire(self, shape, dtype=np.uint8):
+        buffer = super().acquire(shape, dtype)
+        self.checked_out[id(buffer)] = buffer
+        return buffer
+
+    def release(self, buffer):
+        if buffer is not None:
+            self.checked_out.pop(id(buffer), None)
+        super().release(buffer)
+
+
+def test_intermediates_released(processor, test_image):
+    """Test every intermediate goes back to the arena and only style outputs stay checked out"""
+    arena = TrackingArena()
+    ctx = RenderContext(quantize=processor._quantize_colors, arena=arena)
+    outputs = style_graph.run(test_image, ["cartoon", "sketch"], ctx)
+    assert set(outputs) == {"cartoon", "sketch"}
+
+    output_ids = {id(output) for output in outputs.values()}
+    assert set(arena.checked_out) <= output_ids
+    assert arena.stats()["idle_buffers"] > 0
+    idle = [buffer for free in arena._free.values() for buffer in free]
+    assert not any(id(buffer) in output_ids for buffer in idle)
+    # The context keeps no buffers between runs
+    assert not any(isinstance(value, np.ndarray) for value in vars(ctx).values())
+
+
+def test_plan_cache_key_and_bound():
+    """Test style order does not split the plan cache and old plans are evicted"""
+    graph = StyleGraph(style_graph.definitions)
+    assert graph.compile(["sketch", "cartoon"]) is graph.compile(["cartoon", "sketch", "cartoon"])
+    for pair in list(itertools.combinations(graph.styles, 2))[:PLAN_CACHE_SIZE + 5]:
+        graph.compile(list(pair))
+    assert len(graph._plans) == PLAN_CACHE_SIZE
+
+
+def test_node_budget_downscales(processor, test_image):
+    """Test per-node downscaling keeps the output size"""
+    ctx = RenderContext(quantize=processor._quantize_colors, node_budget=40.0 * 100 * 100)
+    outputs = style_graph.run(test_image, ["oil_painting"], ctx)
+    assert outputs["oil_painting"].shape == test_image.shape
+
+
+def test_invalid_definitions():
+    """Test unknown ops, missing inputs and cycles are rejected"""
+    with pytest.raises(StyleGraphError):
+        StyleGraph({"bad": {"nodes": {"a": {"op": "nope"}}, "output": "a"}})
+    with pytest.raises(StyleGraphError):
+        StyleGraph({"bad": {"nodes": {"a": {"op": "gray", "inputs": ["missing"]}}, "output": "a"}})
+    with pytest.raises(StyleGraphError):
+        StyleGraph({"bad": {"nodes": {
+            "a": {"op": "bitwise_not", "inputs": ["b"]},
+            "b": {"op": "bitwise_not", "inputs": ["a"]}
+        }, "output": "a"}})
+
+
+if __name__ == "__main__":
+    print("Running style graph tests...")
+
+    proc = ImageProcessor()
+    proc.fast_processing = True
+    rng = np.random.default_rng(7)
+    img = cv2.GaussianBlur(rng.integers(0, 255, (300, 400, 3), dtype=np.uint8), (9, 9), 0)
+
+    for name in sorted(LEGACY_STYLES):
+        test_graph_matches_legacy(proc, img, name)
+    print("✅ Legacy parity test passed")
+
+    test_shared_nodes_run_once()
+    print("✅ Shared node test passed")
+
+    test_plan_cache_key_and_bound()
+    print("✅ Plan cache test passed")
+
+    test_intermediates_released(proc, img)
+    test_node_budget_downscales(proc, img)
+    print("✅ Execution tests passed")
+
+    test_invalid_definitions()
+    print("✅ Validation test passed")
+
+    print("\n🎉 All style graph tests passed!")
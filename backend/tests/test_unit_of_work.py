@@ -0,0 +1,78 @@
+"""
+Unit tests for batched history and activity-log writes
+"""
+import sys
+import threading
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+from modules.database import Database
+
+
+@pytest.fixture
+def database(tmp_path):
+    return Database(db_path=str(tmp_path / "work.db"))
+
+
+def _count(database, table):
+    conn = database.get_connection()
+    total = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    conn.close()
+    return total
+
+
+def test_writes_commit_together(database):
+    """Test queued rows land on exit, including from worker threads"""
+    database.get_user_stats(1)
+    with database.unit_of_work() as work:
+        threads = [threading.Thread(target=work.add_processing_history,
+                                    args=(1, "in.jpg", f"out_{i}.jpg", "anime" if i % 3 else "sketch", 0.2, 100))
+                   for i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        work.log_user_activity(1, "stylize", "Processed 6 images in a batch")
+        assert _count(database, "processing_history") == 0
+
+    assert _count(database, "processing_history") == 6
+    assert _count(database, "user_logs") == 1
+    stats = database.get_user_stats(1)
+    assert stats["total_processed"] == 6
+    assert stats == database.rebuild_user_stats(1)
+
+
+def test_failed_block_writes_nothing(database):
+    """Test an exception inside the block discards the queued rows"""
+    with pytest.raises(RuntimeError):
+        with database.unit_of_work() as work:
+            work.add_processing_history(1, "in.jpg", "out.jpg", "anime")
+            raise RuntimeError("render failed")
+    assert _count(database, "processing_history") == 0
+
+
+def test_bulk_insert_without_unit_of_work(database):
+    """Test the bulk helpers commit on their own connection"""
+    database.add_processing_history_bulk([(2, "in.jpg", f"out_{i}.jpg", "anime", 0.1, None, None) for i in range(3)])
+    database.log_user_activity_bulk([(2, "login", None), (2, "logout", None)])
+    assert database.get_user_usage_24h(2) == 3
+    assert len(database.get_user_activity_logs_admin(2)) == 0  # user 2 has no users row to join
+    assert _count(database, "user_logs") == 2
+
+
+if __name__ == "__main__":
+    import tempfile
+    print("Running unit of work tests...")
+
+    def fresh():
+        return Database(db_path=str(Path(tempfile.mkdtemp()) / "work.db"))
+
+    test_writes_commit_together(fresh())
+    test_failed_block_writes_nothing(fresh())
+    print("✅ Unit of work tests passed")
+
+    test_bulk_insert_without_unit_of_work(fresh())
+    print("✅ Bulk insert tests passed")
+
+    print("\n🎉 All unit of work tests passed!")
@@ -0,0 +1,129 @@
+"""
+Unit tests for materialized per-user dashboard stats
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+from modules.database import Database
+
+
+@pytest.fixture
+def database(tmp_path):
+    return Database(db_path=str(tmp_path / "stats.db"))
+
+
+def _add(database, style, user_id=1):
+    return database.add_processing_history(user_id, "in.jpg", f"out_{style}.jpg", style, 0.1)
+
+
+def _aggregate(database, user_id=1):
+    """Stats recomputed from scratch, for comparison"""
+    conn = database.get_connection()
+    conn.execute("DELETE FROM user_stats WHERE user_id = ?", (user_id,))
+    conn.commit()
+    conn.close()
+    return database.get_user_stats(user_id)
+
+
+def test_built_on_first_write(database):
+    """Test the row is built from history on a write and reads without a row never store one"""
+    for style in ("anime", "anime", "sketch"):
+        _add(database, style)
+    conn = database.get_connection()
+    assert conn.execute("SELECT total_processed FROM user_stats WHERE user_id = 1").fetchone()[0] == 3
+    # A user whose history predates the table
+    conn.execute("DELETE FROM user_stats")
+    conn.execute("DELETE FROM user_style_counts")
+    conn.commit()
+    conn.close()
+
+    stats = database.get_user_stats(1)
+    assert stats == {"total_processed": 3, "total_transactions": 0, "total_spent": 0.0, "favorite_style": "anime"}
+    conn = database.get_connection()
+    assert conn.execute("SELECT COUNT(*) FROM user_stats").fetchone()[0] == 0
+    conn.close()
+
+    _add(database, "sketch")
+    conn = database.get_connection()
+    assert conn.execute("SELECT total_processed FROM user_stats WHERE user_id = 1").fetchone()[0] == 4
+    conn.close()
+
+
+def test_rebuild_holds_the_write_lock(tmp_path):
+    """Test a rebuild on a connection-per-call database counts under the write lock"""
+    database = Database(db_path=str(tmp_path / "legacy.db"), sqlite_mode="legacy")
+    _add(database, "anime")
+    conn = database.get_connection()
+    cursor = conn.cursor()
+    database._lock_user_stats(cursor, 1)
+    assert conn.in_transaction
+    other = database.get_connection()
+    other.execute("PRAGMA busy_timeout = 0")
+    with pytest.raises(Exception, match="locked"):
+        other.execute("INSERT INTO processing_history (user_id, original_filename, processed_filename, style) "
+                      "VALUES (1, 'a', 'b', 'anime')")
+    other.close()
+    conn.rollback()
+    conn.close()
+
+
+def test_incremental_history_updates(database):
+    """Test inserts and deletes keep totals and the favorite style current"""
+    _add(database, "anime")
+    database.get_user_stats(1)
+    sketch_ids = [_add(database, "sketch") for _ in range(2)]
+    assert database.get_user_stats(1)["favorite_style"] == "sketch"
+    assert database.get_user_stats(1)["total_processed"] == 3
+
+    database.delete_user_history(1, sketch_ids[0])
+    database.delete_user_history(1, sketch_ids[0])  # already gone: no double count
+    database.delete_user_history(1, sketch_ids[1])
+    stats = database.get_user_stats(1)
+    assert stats["total_processed"] == 1
+    assert stats["favorite_style"] == "anime"
+    assert stats == _aggregate(database)
+
+
+def test_spend_counted_once(database):
+    """Test repeated completions count once and refunds are subtracted"""
+    database.get_user_stats(1)
+    database.create_transaction(1, "tx_1", 28.0, image_filename="out.jpg")
+    database.update_transaction_status("tx_1", "completed")
+    database.update_transaction_status("tx_1", "completed")
+    stats = database.get_user_stats(1)
+    assert (stats["total_transactions"], stats["total_spent"]) == (1, 28.0)
+
+    database.update_transaction_status("tx_1", "refunded")
+    stats = database.get_user_stats(1)
+    assert (stats["total_transactions"], stats["total_spent"]) == (0, 0.0)
+    assert stats == _aggregate(database)
+
+
+def test_bulk_delete_rebuilds(database):
+    """Test clearing history resets the stats"""
+    _add(database, "anime")
+    database.get_user_stats(1)
+    database.delete_user_history(1)
+    assert database.get_user_stats(1)["total_processed"] == 0
+    assert database.get_user_stats(1)["favorite_style"] == "None"
+
+
+if __name__ == "__main__":
+    import tempfile
+    print("Running user stats tests...")
+
+    def fresh():
+        return Database(db_path=str(Path(tempfile.mkdtemp()) / "stats.db"))
+
+    test_built_on_first_write(fresh())
+    test_rebuild_holds_the_write_lock(Path(tempfile.mkdtemp()))
+    test_incremental_history_updates(fresh())
+    print("✅ History stats tests passed")
+
+    test_spend_counted_once(fresh())
+    test_bulk_delete_rebuilds(fresh())
+    print("✅ Spend and rebuild tests passed")
+
+    print("\n🎉 All user stats tests passed!")
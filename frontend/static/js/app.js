@@ -849,6 +849,10 @@ document.addEventListener('DOMContentLoaded', () => {
                 return;
             }
             if (batchQueue.length === 0) return;
+            if (batchQueue.length === 1) {
+                await processSingleImage(batchQueue[0]);
+                return;
+            }
 
             const batchQueue_at_start = [...batchQueue];
 
@@ -1385,6 +1389,113 @@ document.addEventListener('DOMContentLoaded', () => {
             if (loader) loader.style.display = 'none';
         }
     }
+    function showSingleResult(path, originalSrc, result) {
+        document.querySelector('.main-stage').classList.add('main-stage--active');
+        if (document.getElementById('placeholder')) document.getElementById('placeholder').style.display = 'none';
+        if (document.getElementById('cropBoxView')) document.getElementById('cropBoxView').style.display = 'none';
+        if (document.getElementById('batchResultsView')) document.getElementById('batchResultsView').style.display = 'none';
+        if (document.getElementById('videoResultView')) document.getElementById('videoResultView').style.display = 'none';
+        if (document.getElementById('batchSuccessBanner')) document.getElementById('batchSuccessBanner').style.display = 'none';
+        if (document.getElementById('backToBatchBtn')) document.getElementById('backToBatchBtn').style.display = 'none';
+        const isDynamic = document.getElementById('tabDynamic').classList.contains('active');
+        if (isDynamic) {
+            if (sliderView) sliderView.style.display = 'block';
+            if (resultView) resultView.style.display = 'none';
+        } else {
+            if (resultView) resultView.style.display = 'grid';
+            if (sliderView) sliderView.style.display = 'none';
+        }
+
+        if (document.getElementById('viewOriginal')) document.getElementById('viewOriginal').src = originalSrc;
+        if (document.getElementById('viewProcessed')) document.getElementById('viewProcessed').src = path;
+        if (document.getElementById('sliderOriginal')) document.getElementById('sliderOriginal').src = originalSrc;
+        if (document.getElementById('sliderProcessed')) document.getElementById('sliderProcessed').src = path;
+
+        // Downloads and stats only once the full-resolution render exists
+        if (document.getElementById('downloadArea')) document.getElementById('downloadArea').style.display = result ? 'block' : 'none';
+        const statsPanel = document.getElementById('statsPanel');
+        if (statsPanel) statsPanel.style.display = result && result.stats ? 'block' : 'none';
+        if (!result || !result.stats) return;
+
+        const s = result.stats;
+        if (document.getElementById('origBright')) document.getElementById('origBright').innerText = s.original.brightness;
+        if (document.getElementById('procBright')) document.getElementById('procBright').innerText = s.processed.brightness;
+        if (document.getElementById('origContrast')) document.getElementById('origContrast').innerText = s.original.contrast;
+        if (document.getElementById('procContrast')) document.getElementById('procContrast').innerText = s.processed.contrast;
+        if (document.getElementById('procTimeLabel')) document.getElementById('procTimeLabel').innerText = `${result.proc_time.toFixed(2)}s`;
+        if (document.getElementById('origR')) document.getElementById('origR').style.width = `${s.original.colors.r}%`;
+        if (document.getElementById('origG')) document.getElementById('origG').style.width = `${s.original.colors.g}%`;
+        if (document.getElementById('origB')) document.getElementById('origB').style.width = `${s.original.colors.b}%`;
+        if (document.getElementById('procR')) document.getElementById('procR').style.width = `${s.processed.colors.r}%`;
+        if (document.getElementById('procG')) document.getElementById('procG').style.width = `${s.processed.colors.g}%`;
+        if (document.getElementById('procB')) document.getElementById('procB').style.width = `${s.processed.colors.b}%`;
+    }
+
+    async function pollProcessJob(statusUrl, intervalMs = 1000) {
+        while (true) {
+            await new Promise(resolve => setTimeout(resolve, intervalMs));
+            const res = await fetch(statusUrl);
+            const job = await res.json();
+            if (!res.ok || !job.success) throw new Error(job.message || 'Full-resolution render failed');
+            if (job.status === 'done') return job;
+        }
+    }
+
+    // Single image: request a progressive render, show the draft preview right away,
+    // then poll the job and swap in the full-resolution result when it is done.
+    async function processSingleImage(item) {
+        if (loader) {
+            loader.style.display = 'flex';
+            const statusTxt = loader.querySelector('h3');
+            if (statusTxt) statusTxt.innerText = "Neural Artist at Work...";
+        }
+
+        try {
+            const imageToSend = item.cropData ? await window.cropImageFile(item.file, item.cropData) : item.file;
+            const formData = new FormData();
+            formData.append('image', imageToSend);
+            formData.append('style', item.style);
+            formData.append('progressive', '1');
+
+            const response = await fetch('/api/process', {
+                method: 'POST',
+                body: formData
+            });
+
+            const data = await response.json();
+            if (response.status === 402) {
+                alert(data.message);
+                if (typeof window.upgradeToPro === 'function') {
+                    window.upgradeToPro();
+                }
+                return;
+            }
+            if (!response.ok || !data.success) {
+                throw new Error(data.message || 'Processing failed');
+            }
+
+            batchQueue = [];
+            selectedBatchItemId = null;
+            updateBatchUI();
+            resetAdjustments();
+            window.originalPreviewMap[item.file.name] = item.preview;
+
+            let result = data;
+            if (data.progressive) {
+                showSingleResult(data.preview_url, item.preview, null);
+                if (loader) loader.style.display = 'none';
+                result = await pollProcessJob(data.status_url);
+            }
+            window.currentImage = result.image_filename;
+            showSingleResult(`${result.processed_url}?t=${Date.now()}`, item.preview, result);
+        } catch (err) {
+            console.error(err);
+            alert(`❌ ${err.message}`);
+        } finally {
+            if (loader) loader.style.display = 'none';
+        }
+    }
+
     initGoogleAuth();
 
     async function handleCredentialResponse(response) {